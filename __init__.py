@@ -19,20 +19,32 @@ login_manager = LoginManager()
 migrate = Migrate()
 bootstrap = Bootstrap()
 
-def create_app():
+def create_app(config_name=None):
+    """
+    Create the application.
+
+    Args:
+        config_name (str, optional): 'development', 'testing' or 'production';
+            defaults to the FLASK_CONFIG environment variable, then 'development'
+    """
     app = Flask(__name__)
     
     # 配置应用
-    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev')
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['DEBUG'] = True
-    app.config['TESTING'] = False
+    from .config import config
+    config_name = config_name or os.getenv('FLASK_CONFIG', 'default')
+    if config_name not in config:
+        raise ValueError(f'Unknown configuration: {config_name}')
+    app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
+
+    # 异步结构化日志
+    from .utils.log import init_logging
+    init_logging(app)
     
     # 初始化扩展
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
     bootstrap.init_app(app)
     login_manager.login_view = 'auth.login'
     
@@ -60,6 +72,8 @@ def create_app():
     from .routes.member_assistant import assistant_bp
     from .routes.match_performance import match_performance_bp
     from .routes.schedule_assistant import bp as schedule_assistant_bp
+    from .routes.calendar import calendar_bp
+    from .routes.metrics import metrics_bp
     
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -76,7 +90,26 @@ def create_app():
     app.register_blueprint(assistant_bp, url_prefix='/assistant')  # Register member assistant routes blueprint
     app.register_blueprint(match_performance_bp)  # Register match performance routes blueprint
     app.register_blueprint(schedule_assistant_bp)  # Register schedule assistant routes blueprint
-    
+    app.register_blueprint(calendar_bp)  # Register calendar routes blueprint
+    app.register_blueprint(metrics_bp)  # Register metrics endpoint blueprint
+
+    # 统计每个请求的 SQL 查询
+    from .utils.query_counter import init_query_counter
+    init_query_counter(app)
+
+    # 请求、数据库连接池和缓存指标（需在查询统计之后注册）
+    from .utils.metrics import init_metrics
+    init_metrics(app, db)
+
+    # 按需分析单个请求（需在查询统计之后注册）
+    from .utils.profiler import init_profiler
+    init_profiler(app)
+
+    # 注册命令行工具（同时加载技能索引的维护钩子）
+    from .commands import register_commands
+    from .services import skill_index_service
+    register_commands(app)
+
     # 初始化数据库表
     # with app.app_context():
     #     db.create_all()
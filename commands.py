@@ -0,0 +1,43 @@
+"""
+Command line tools for Simply Rugby.
+Run with `flask <command>` once FLASK_APP points at the application.
+"""
+import click
+
+
+def register_commands(app):
+    """Register all custom CLI commands on the application."""
+    app.cli.add_command(rebuild_skill_index)
+    app.cli.add_command(reconcile_unread_counters)
+    app.cli.add_command(resume_fanout_jobs)
+
+
+@click.command('rebuild-skill-index')
+def rebuild_skill_index():
+    """Rebuild the current skill level index from all skill assessments."""
+    from app.services.skill_index_service import SkillIndexService
+
+    count = SkillIndexService.rebuild()
+    click.echo(f'Skill index rebuilt: {count} entries')
+
+
+@click.command('reconcile-unread-counters')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only reconcile these users.')
+def reconcile_unread_counters(user_ids):
+    """Rebuild the unread message counters from the Messages table."""
+    from app.services.unread_counter_service import UnreadCounterService
+
+    count = UnreadCounterService.reconcile(list(user_ids) or None)
+    click.echo(f'Unread counters reconciled: {count} counters')
+
+
+@click.command('resume-fanout-jobs')
+@click.option('--failed', is_flag=True, help='Also retry failed jobs.')
+def resume_fanout_jobs(failed):
+    """Resume notification fan-outs interrupted by a worker restart."""
+    from app.services.fanout_service import FanoutService
+
+    resumed = FanoutService.resume_stalled_jobs(include_failed=failed)
+    for job_id, completed in resumed:
+        click.echo(f'{job_id}: {"done" if completed else "failed"}')
+    click.echo(f'Fan-out jobs resumed: {len(resumed)}')
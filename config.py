@@ -0,0 +1,149 @@
+"""
+Configuration profiles for Simply Rugby.
+
+create_app() loads one of the classes below, chosen by its config_name
+argument or the FLASK_CONFIG environment variable ('development',
+'testing' or 'production'; default 'development'). Most settings can be
+overridden per deployment through environment variables.
+"""
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """
+    Settings shared by every profile.
+    """
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///app.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    DEBUG = False
+    TESTING = False
+
+    # JSON responses
+    JSON_SORT_KEYS = False
+    JSONIFY_PRETTYPRINT_REGULAR = False
+
+    # Caches (seconds)
+    COACH_ACCESS_CACHE_TTL = _env_int('COACH_ACCESS_CACHE_TTL', 60)
+    CALENDAR_CACHE_TTL = _env_int('CALENDAR_CACHE_TTL', 300)
+    ICAL_FEED_CACHE_TTL = _env_int('ICAL_FEED_CACHE_TTL', 3600)
+    ICAL_FEED_PAST_DAYS = _env_int('ICAL_FEED_PAST_DAYS', 90)
+    ICAL_FEED_FUTURE_DAYS = _env_int('ICAL_FEED_FUTURE_DAYS', 365)
+
+    # Notification events
+    EVENT_BUS_URL = os.getenv('EVENT_BUS_URL')
+    EVENT_BUS_BUFFER_SIZE = _env_int('EVENT_BUS_BUFFER_SIZE', 1000)
+    NOTIFICATION_STREAM_HEARTBEAT = _env_int('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    NOTIFICATION_STREAM_MAX_SECONDS = _env_int('NOTIFICATION_STREAM_MAX_SECONDS', 300)
+    # Fan-out jobs that have not progressed for this long can be resumed
+    FANOUT_JOB_STALE_SECONDS = _env_int('FANOUT_JOB_STALE_SECONDS', 300)
+
+    # Instrumentation
+    SQL_QUERY_COUNTER = _env_bool('SQL_QUERY_COUNTER', True)
+    QUERY_REPEAT_THRESHOLD = _env_int('QUERY_REPEAT_THRESHOLD', 5)
+    QUERY_BUDGET_DEFAULT = None
+    QUERY_BUDGET_STRICT = False
+    METRICS_ENABLED = _env_bool('METRICS_ENABLED', True)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_FLUSH_INTERVAL = _env_int('METRICS_FLUSH_INTERVAL', 5)
+    PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    PROFILER_TOKEN = os.getenv('PROFILER_TOKEN')
+    PROFILER_DIR = os.getenv('PROFILER_DIR')
+
+    # Logging
+    LOG_LEVEL = os.getenv('LOG_LEVEL')
+    LOG_LEVELS = {}
+    LOG_DEBUG_SAMPLE_RATE = 1.0
+    LOG_QUEUE_SIZE = _env_int('LOG_QUEUE_SIZE', 10000)
+
+    @classmethod
+    def init_app(cls, app):
+        """Apply settings that need the app instance."""
+        # Flask 2.3+ 不再读取 JSON_* 配置，直接设置 JSON provider
+        json_provider = getattr(app, 'json', None)
+        if json_provider is not None and hasattr(json_provider, 'sort_keys'):
+            json_provider.sort_keys = app.config['JSON_SORT_KEYS']
+            json_provider.compact = not app.config['JSONIFY_PRETTYPRINT_REGULAR']
+
+
+class DevelopmentConfig(Config):
+    """
+    Local development: debugger, template reloading, verbose logs.
+    """
+    DEBUG = True
+    TEMPLATES_AUTO_RELOAD = True
+    JSONIFY_PRETTYPRINT_REGULAR = True
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+
+
+class TestingConfig(Config):
+    """
+    Test runs: in-memory database and strict query budgets.
+    """
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_STRICT = True
+    METRICS_ENABLED = False
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+
+
+class ProductionConfig(Config):
+    """
+    Production: no debug overhead, cached templates and static files, a
+    tuned connection pool and quieter logs.
+    """
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    TEMPLATES_AUTO_RELOAD = False
+    SEND_FILE_MAX_AGE_DEFAULT = _env_int('STATIC_MAX_AGE', 43200)
+    PREFERRED_URL_SCHEME = 'https'
+    SESSION_COOKIE_SECURE = _env_bool('SESSION_COOKIE_SECURE', True)
+
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        # 小于 MySQL wait_timeout，避免使用被服务器关闭的连接
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)
+    }
+
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = {
+        'sqlalchemy.engine': 'WARNING',
+        'werkzeug': 'WARNING'
+    }
+    LOG_DEBUG_SAMPLE_RATE = 0.01
+
+    @classmethod
+    def init_app(cls, app):
+        super().init_app(app)
+        if not app.config.get('SECRET_KEY'):
+            raise RuntimeError('SECRET_KEY must be set in production')
+        if app.config.get('METRICS_ENABLED') and not app.config.get('METRICS_TOKEN'):
+            # /metrics 在未设置令牌时是公开的
+            raise RuntimeError('METRICS_TOKEN must be set in production, or set METRICS_ENABLED=false')
+        if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            # SQLite 不使用连接池参数
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+
+
+config = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+    'default': DevelopmentConfig
+}
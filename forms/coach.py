@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, IntegerField, DateField, TimeField, SelectField, SubmitField
+from wtforms import StringField, TextAreaField, IntegerField, DateField, TimeField, SelectField, SelectMultipleField, SubmitField
 from wtforms.validators import DataRequired, Optional, Length, NumberRange
 from datetime import datetime
 
@@ -23,6 +23,20 @@ class TrainingPlanForm(FlaskForm):
         ('monthly', 'Monthly')
     ], validators=[DataRequired()])
     squad_id = SelectField('Squad', coerce=int, validators=[DataRequired()])
+    # Optional recurrence settings (see app.utils.recurrence)
+    weekdays = SelectMultipleField('Training Days', choices=[
+        ('MO', 'Monday'),
+        ('TU', 'Tuesday'),
+        ('WE', 'Wednesday'),
+        ('TH', 'Thursday'),
+        ('FR', 'Friday'),
+        ('SA', 'Saturday'),
+        ('SU', 'Sunday')
+    ], validators=[Optional()])
+    interval = IntegerField('Repeat Every', validators=[Optional(), NumberRange(min=1)])
+    start_time = TimeField('Start Time', validators=[Optional()], format='%H:%M')
+    end_time = TimeField('End Time', validators=[Optional()], format='%H:%M')
+    exclude_dates = StringField('Excluded Dates', validators=[Optional()])
     submit = SubmitField('Create Plan')
 
 class TrainingSessionForm(FlaskForm):
@@ -0,0 +1,26 @@
+"""Per-user calendar feed token version
+
+Revision ID: 11d7637e5cfb
+Revises: 2c196fe90eaa
+Create Date: 2026-10-18 21:06:52.114870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '11d7637e5cfb'
+down_revision = '2c196fe90eaa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Users') as batch_op:
+        batch_op.add_column(sa.Column('ical_token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('Users') as batch_op:
+        batch_op.drop_column('ical_token_version')
@@ -0,0 +1,52 @@
+"""Game venues and venue bookings for the calendar
+
+Revision ID: 2c196fe90eaa
+Revises: 89cfc1c8a271
+Create Date: 2026-10-18 20:41:08.236715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c196fe90eaa'
+down_revision = '89cfc1c8a271'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Games') as batch_op:
+        # 已有比赛没有场地，保持为空
+        batch_op.add_column(sa.Column('venue_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_games_venue_id', 'Venues', ['venue_id'], ['id'])
+        batch_op.create_index('ix_Games_match_date', ['match_date'])
+
+    op.create_table(
+        'VenueBookings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('squad_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('start_time', sa.Time(), nullable=True),
+        sa.Column('end_time', sa.Time(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['venue_id'], ['Venues.id']),
+        sa.ForeignKeyConstraint(['squad_id'], ['Squads.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_VenueBookings_date', 'VenueBookings', ['date'])
+    op.create_index('ix_venue_booking_venue_date', 'VenueBookings', ['venue_id', 'date'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_booking_venue_date', table_name='VenueBookings')
+    op.drop_index('ix_VenueBookings_date', table_name='VenueBookings')
+    op.drop_table('VenueBookings')
+
+    with op.batch_alter_table('Games') as batch_op:
+        batch_op.drop_index('ix_Games_match_date')
+        batch_op.drop_constraint('fk_games_venue_id', type_='foreignkey')
+        batch_op.drop_column('venue_id')
@@ -0,0 +1,42 @@
+"""Notifications to squads and everyone, and feed indexes
+
+Revision ID: 89cfc1c8a271
+Revises: 9229839a4a50
+Create Date: 2026-10-18 20:12:31.574019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '89cfc1c8a271'
+down_revision = '9229839a4a50'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications') as batch_op:
+        # 已有通知都是发给单个用户的
+        batch_op.add_column(sa.Column('recipient_type', sa.String(length=20), nullable=False,
+                                      server_default='user'))
+        batch_op.add_column(sa.Column('squad_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('recipient_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_foreign_key('fk_notifications_squad_id', 'Squads', ['squad_id'], ['id'])
+        batch_op.create_index('ix_notification_timestamp_id', ['timestamp', 'id'])
+        batch_op.create_index('ix_notification_recipient_created', ['recipient_id', 'timestamp', 'id'])
+        batch_op.create_index('ix_notification_recipient_read', ['recipient_id', 'is_read', 'timestamp', 'id'])
+
+
+def downgrade():
+    # 只有发给单个用户的通知能还原为旧结构
+    op.execute("DELETE FROM notifications WHERE recipient_id IS NULL")
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.drop_index('ix_notification_recipient_read')
+        batch_op.drop_index('ix_notification_recipient_created')
+        batch_op.drop_index('ix_notification_timestamp_id')
+        batch_op.drop_constraint('fk_notifications_squad_id', type_='foreignkey')
+        batch_op.alter_column('recipient_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('squad_id')
+        batch_op.drop_column('recipient_type')
@@ -0,0 +1,46 @@
+"""Store notification fan-out jobs in the database
+
+Revision ID: 9229839a4a50
+Revises: b94c7da528ec
+Create Date: 2026-10-18 19:05:47.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9229839a4a50'
+down_revision = 'b94c7da528ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'FanoutJobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=False),
+        sa.Column('audience', sa.JSON(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('message_type', sa.String(length=20), nullable=False),
+        sa.Column('channel', sa.String(length=100), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('written', sa.Integer(), nullable=False),
+        sa.Column('last_user_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['MemberAssistants.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_fanout_job_status_updated', 'FanoutJobs', ['status', 'updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_fanout_job_status_updated', table_name='FanoutJobs')
+    op.drop_table('FanoutJobs')
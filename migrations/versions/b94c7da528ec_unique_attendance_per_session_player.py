@@ -0,0 +1,35 @@
+"""Unique attendance row per training session and player
+
+Revision ID: b94c7da528ec
+Revises:
+Create Date: 2026-10-18 18:40:12.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.models.training_plan import PlayerAttendance
+
+
+# revision identifiers, used by Alembic.
+revision = 'b94c7da528ec'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    attendance = PlayerAttendance.__table__
+
+    # 删除并发提交产生的重复记录，每个球员每次训练保留最新的一条
+    latest = sa.select(sa.func.max(attendance.c.id)).group_by(
+        attendance.c.session_id, attendance.c.player_id).subquery()
+    op.execute(attendance.delete().where(attendance.c.id.notin_(sa.select(latest.c[0]))))
+
+    with op.batch_alter_table(attendance.name) as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_player_attendance_session_player', ['session_id', 'player_id'])
+
+
+def downgrade():
+    with op.batch_alter_table(PlayerAttendance.__tablename__) as batch_op:
+        batch_op.drop_constraint('uq_player_attendance_session_player', type_='unique')
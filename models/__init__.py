@@ -11,13 +11,23 @@ from app.models.schedule_assistant import ScheduleAssistant
 from app.models.training_record import TrainingRecord
 from .training_plan import TrainingPlan, TrainingSession, PlayerAttendance
 from .skill_assessment import SkillAssessment
+from .player_skill_level import PlayerSkillLevel
 from .message import Message
+from .broadcast import BroadcastMessage, BroadcastReceipt
+from .unread_counter import UnreadCounter
+from .fanout_job import FanoutJob
 from .medical_record import MedicalRecord
 from .game import Game
+from .venue import Venue, VenueBooking
 from .junior_consent_form import JuniorConsentForm
 from .player_profile import PlayerProfile
 from .season import Season
 from .evaluation import Evaluation
+from app import db
+
+# 每个球员每次训练只有一条出勤记录，出勤登记按此键 upsert（迁移 b94c7da528ec）
+PlayerAttendance.__table__.append_constraint(
+    db.UniqueConstraint('session_id', 'player_id', name='uq_player_attendance_session_player'))
 # 为了解决循环导入问题，在这里导入所有模型，这样它们就会在应用启动时被注册 
 
 # 导入其他可能存在的模型
@@ -52,9 +62,16 @@ __all__ = [
     'TrainingSession',
     'PlayerAttendance',
     'SkillAssessment',
+    'PlayerSkillLevel',
     'Message',
+    'BroadcastMessage',
+    'BroadcastReceipt',
+    'UnreadCounter',
+    'FanoutJob',
     'MedicalRecord',
     'Game',
+    'Venue',
+    'VenueBooking',
     'JuniorConsentForm',
     'PlayerProfile',
     'Season',
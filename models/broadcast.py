@@ -0,0 +1,46 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import ForeignKey, Enum
+from sqlalchemy.orm import relationship
+
+class BroadcastMessage(db.Model):
+    """
+    A message stored once for a whole audience.
+
+    Recipients are resolved when inboxes are read, so sending to a squad, a
+    role or the whole club writes one row instead of one Message per user.
+    """
+    __tablename__ = 'BroadcastMessages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.Integer, ForeignKey('MemberAssistants.id'), nullable=False)
+    title = db.Column(db.String(255), nullable=True)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    message_type = db.Column(Enum('training', 'match', 'personal', 'announcement', name='message_type_enum'), default='announcement')
+    # 'all' 全体用户；'role' 时 audience_value 为 user_type；'squad' 时为球队 ID
+    audience_type = db.Column(Enum('all', 'role', 'squad', name='broadcast_audience_enum'), nullable=False)
+    audience_value = db.Column(db.String(50), nullable=False, default='')
+
+    sender = relationship('MemberAssistant', foreign_keys=[sender_id])
+
+    __table_args__ = (
+        db.Index('ix_broadcast_audience_created', 'audience_type', 'audience_value', 'created_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<BroadcastMessage {self.id} to {self.audience_type}:{self.audience_value}>'
+
+
+class BroadcastReceipt(db.Model):
+    """
+    Records that a user has read a broadcast.
+    """
+    __tablename__ = 'BroadcastReceipts'
+
+    broadcast_id = db.Column(db.Integer, ForeignKey('BroadcastMessages.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, ForeignKey('Users.id'), primary_key=True)
+    read_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<BroadcastReceipt {self.broadcast_id} read by {self.user_id}>'
@@ -0,0 +1,58 @@
+from app import db
+from datetime import datetime
+
+class FanoutJob(db.Model):
+    """
+    A message fan-out to a large audience, written in batches.
+
+    Progress is committed together with every batch, so any worker can report
+    it and an interrupted or failed job resumes after the last recipient it
+    delivered to.
+    """
+    __tablename__ = 'FanoutJobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    # {'type': 'squad', 'squad_id': ...}、{'type': 'coaches'} 或 {'type': 'segment', 'segment': {...}, 'today': ...}
+    audience = db.Column(db.JSON, nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('MemberAssistants.id'), nullable=False)
+    title = db.Column(db.String(255), nullable=True)
+    content = db.Column(db.Text, nullable=False)
+    message_type = db.Column(db.String(20), nullable=False)
+    channel = db.Column(db.String(100), nullable=True)  # 为空时通知每一批收件人
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    total = db.Column(db.Integer, nullable=True)
+    written = db.Column(db.Integer, nullable=False, default=0)
+    # Highest recipient user ID already delivered; a retry resumes after it
+    last_user_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Updated with every batch; a running job that stops updating was interrupted
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_fanout_job_status_updated', 'status', 'updated_at'),
+    )
+
+    def is_stalled(self, stale_before):
+        """Whether the job is queued or running but has not progressed since stale_before."""
+        return self.status in ('queued', 'running') and self.updated_at < stale_before
+
+    def to_dict(self, stale_before=None):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'stalled': stale_before is not None and self.is_stalled(stale_before),
+            'total': self.total,
+            'written': self.written,
+            'last_user_id': self.last_user_id,
+            'progress': round(self.written / self.total * 100) if self.total else (100 if self.status == 'done' else 0),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<FanoutJob {self.id} {self.status}>'
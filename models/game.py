@@ -13,7 +13,8 @@ class Game(db.Model):
     # Other columns
     season_id = db.Column(db.Integer, db.ForeignKey('Seasons.id'), nullable=False)
     opponent = db.Column(db.String(100), nullable=False)
-    match_date = db.Column(db.Date, nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venues.id'), nullable=True)  # 比赛场地，可为空
+    match_date = db.Column(db.Date, nullable=False, index=True)
     kickoff_time = db.Column(db.Time, nullable=True)
     location = db.Column(Enum('home', 'away', name='game_location_enum'), nullable=False)
     score_for = db.Column(db.Integer, nullable=True)
@@ -25,6 +26,7 @@ class Game(db.Model):
     # Relationships
     season = db.relationship('Season')
     squad = db.relationship('Squad', backref=db.backref('games', lazy='dynamic'))
+    venue = db.relationship('Venue')
     # Add relationship for Evaluations if needed
 
     def __repr__(self):
@@ -19,5 +19,10 @@ class Message(db.Model):
     sender = relationship('MemberAssistant', foreign_keys=[sender_id], backref='sent_messages') # Changed relationship target
     receiver = relationship('User', foreign_keys=[receiver_id], backref='received_messages')
 
+    __table_args__ = (
+        db.Index('ix_message_receiver_created', 'receiver_id', 'created_at', 'id'),
+        db.Index('ix_message_receiver_read', 'receiver_id', 'is_read', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f'<Message {self.id} from {self.sender_id} to {self.receiver_id}>'
@@ -1,23 +1,37 @@
 from app import db
 from datetime import datetime
 from sqlalchemy import ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, synonym
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
 
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, ForeignKey('Users.id'), nullable=False)
-    recipient_id = db.Column(db.Integer, ForeignKey('Users.id'), nullable=False)
+    recipient_type = db.Column(db.String(20), nullable=False, default='user') # 'user', 'squad' or 'all'
+    recipient_id = db.Column(db.Integer, ForeignKey('Users.id'), nullable=True) # recipient_type == 'user'
+    squad_id = db.Column(db.Integer, ForeignKey('Squads.id'), nullable=True) # recipient_type == 'squad'
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
     notification_type = db.Column(db.String(50), default='general') # e.g., 'general', 'training', 'match', 'urgent'
 
+    # Names used by the notification management dashboard
+    message = synonym('content')
+    type = synonym('notification_type')
+    created_at = synonym('timestamp')
+
     # Relationships (optional but helpful)
     sender = relationship('User', foreign_keys=[sender_id], backref='sent_notifications')
     recipient = relationship('User', foreign_keys=[recipient_id], backref='received_notifications')
+    squad = relationship('Squad', foreign_keys=[squad_id])
+
+    __table_args__ = (
+        db.Index('ix_notification_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_notification_recipient_created', 'recipient_id', 'timestamp', 'id'),
+        db.Index('ix_notification_recipient_read', 'recipient_id', 'is_read', 'timestamp', 'id'),
+    )
 
     def __repr__(self):
         return f'<Notification {self.id} from {self.sender_id} to {self.recipient_id}>'
@@ -0,0 +1,32 @@
+from app import db
+from datetime import datetime
+
+class PlayerSkillLevel(db.Model):
+    """
+    Current skill level per player, skill and sub-skill.
+
+    This table is a materialized index over SkillAssessment: it keeps only the
+    latest assessment for every (player or junior player, skill_type, sub_skill)
+    key, so radar charts and squad averages can be read with one indexed query.
+    Rows are maintained by app.services.skill_index_service.
+    """
+    __tablename__ = 'PlayerSkillLevels'
+
+    id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('Players.id'), nullable=True)
+    junior_player_id = db.Column(db.Integer, db.ForeignKey('JuniorPlayers.id'), nullable=True)
+    skill_type = db.Column(db.String(50), nullable=False)
+    sub_skill = db.Column(db.String(50), nullable=False, default='')  # '' 表示核心技能本身
+    skill_level = db.Column(db.Integer, nullable=False)
+    assessment_id = db.Column(db.Integer, nullable=True)
+    assessment_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('player_id', 'skill_type', 'sub_skill', name='uq_skill_level_player'),
+        db.UniqueConstraint('junior_player_id', 'skill_type', 'sub_skill', name='uq_skill_level_junior'),
+    )
+
+    def __repr__(self):
+        owner = f'Player:{self.player_id}' if self.player_id else f'JuniorPlayer:{self.junior_player_id}'
+        return f'<PlayerSkillLevel {owner} {self.skill_type}/{self.sub_skill or "-"}={self.skill_level}>'
@@ -0,0 +1,20 @@
+from app import db
+from datetime import datetime
+
+class UnreadCounter(db.Model):
+    """
+    Number of unread personal messages per user and message type.
+
+    Maintained in the same transaction as message sends and read-marks by
+    app.services.unread_counter_service; `flask reconcile-unread-counters`
+    rebuilds it from Messages.
+    """
+    __tablename__ = 'UnreadCounters'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), primary_key=True)
+    message_type = db.Column(db.String(20), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UnreadCounter {self.user_id}/{self.message_type}={self.unread_count}>'
@@ -1,7 +1,11 @@
+import logging
 from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+
+logger = logging.getLogger(__name__)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -21,6 +25,8 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(100))
     postcode = db.Column(db.String(20))
     user_type = db.Column(db.Enum('player', 'junior_player', 'non_player_member', 'coach', 'schedule_assistant', 'member_assistant'), nullable=False)
+    # 日历订阅链接的版本，用户重置链接时递增，旧链接随之失效
+    ical_token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def set_password(self, password):
         # Explicitly use pbkdf2:sha256 for better compatibility
@@ -35,7 +41,7 @@ class User(db.Model, UserMixin):
             if 'unsupported hash type scrypt' in str(e):
                 # 处理scrypt哈希失败的情况
                 # 这里直接返回False，让用户重新登录
-                print(f"检测到不支持的哈希算法: {e}")
+                logger.warning("检测到不支持的哈希算法: %s", e)
                 return False
             # 其他错误则继续抛出
             raise
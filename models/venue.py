@@ -16,3 +16,28 @@ class Venue(db.Model):
     
     def __repr__(self):
         return f'<Venue {self.id}: {self.name}>'
+
+
+class VenueBooking(db.Model):
+    """
+    A reservation of a venue outside games and training sessions.
+    """
+    __tablename__ = 'VenueBookings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venues.id'), nullable=False)
+    squad_id = db.Column(db.Integer, db.ForeignKey('Squads.id'), nullable=True)  # 为空表示不属于某个球队
+    title = db.Column(db.String(100), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    start_time = db.Column(db.Time, nullable=True)
+    end_time = db.Column(db.Time, nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+
+    venue = db.relationship('Venue', backref=db.backref('bookings', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_venue_booking_venue_date', 'venue_id', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<VenueBooking {self.id}: Venue {self.venue_id} on {self.date}>'
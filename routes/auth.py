@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
@@ -12,6 +13,9 @@ from app.models.squad import Squad
 from app.utils.player_utils import ensure_player_records
 from datetime import datetime
 
+
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('auth', __name__)
 
 @bp.route('/login', methods=['GET', 'POST'])
@@ -28,7 +32,7 @@ def login():
                 try:
                     ensure_player_records()
                 except Exception as e:
-                    print(f"Warning: Error in ensure_player_records: {str(e)}")
+                    logger.warning("Error in ensure_player_records: %s", e)
             
             login_user(user, remember=form.remember.data)
             
@@ -37,7 +41,7 @@ def login():
             if user.user_type == 'player':
                 return redirect(url_for('player.dashboard'))
             elif user.user_type == 'junior_player':
-                print(f"DEBUG: 重定向到 junior_player.dashboard，用户类型为 {user.user_type}")
+                logger.debug("重定向到 junior_player.dashboard，用户类型为 %s", user.user_type)
                 return redirect(url_for('junior_player.dashboard'))
             elif user.user_type == 'coach':
                 return redirect(url_for('coach.dashboard'))
@@ -105,7 +109,7 @@ def register_coach():
 def register_junior():
     form = JuniorPlayerForm()
     if request.method == 'POST':
-        print(f"DEBUG: Form submitted with data: {request.form}")  # Print form data for debugging
+        logger.debug("Junior registration form submitted", extra={'fields': sorted(request.form)})  # 只记录字段名，不记录密码等内容
         
         if form.validate_on_submit():
             try:
@@ -159,13 +163,13 @@ def register_junior():
             except Exception as e:
                 db.session.rollback()  # 出错时回滚事务
                 flash(f'Registration failed: {str(e)}', 'danger')
-                print(f"ERROR: Registration failed with exception: {str(e)}")  # 打印错误信息进行调试
+                logger.error("Registration failed with exception: %s", e)
         else:
             # 显示表单验证错误
             for field, errors in form.errors.items():
                 for error in errors:
                     flash(f'{getattr(form, field).label.text}: {error}', 'danger')
-                    print(f"VALIDATION ERROR: {field} - {error}")  # 打印验证错误进行调试
+                    logger.debug("Validation error: %s - %s", field, error)
     
     return render_template('auth/register_junior.html', title='Register as Junior Player', form=form)
 
@@ -173,7 +177,7 @@ def register_junior():
 def register_player():
     form = PlayerForm()
     if request.method == 'POST':
-        print(f"DEBUG: Player form submitted with data: {request.form}")  # 打印表单数据进行调试
+        logger.debug("Player registration form submitted", extra={'fields': sorted(request.form)})  # 只记录字段名，不记录密码等内容
         
         if form.validate_on_submit():
             try:
@@ -221,13 +225,13 @@ def register_player():
             except Exception as e:
                 db.session.rollback()  # 出错时回滚事务
                 flash(f'Registration failed: {str(e)}', 'danger')
-                print(f"ERROR: Registration failed with exception: {str(e)}")  # 打印错误信息进行调试
+                logger.error("Registration failed with exception: %s", e)
         else:
             # 显示表单验证错误
             for field, errors in form.errors.items():
                 for error in errors:
                     flash(f'{getattr(form, field).label.text}: {error}', 'danger')
-                    print(f"VALIDATION ERROR: {field} - {error}")  # 打印验证错误进行调试
+                    logger.debug("Validation error: %s - %s", field, error)
     
     return render_template('auth/register_player.html', title='Register as Player', form=form)
 
@@ -235,7 +239,7 @@ def register_player():
 def register_non_player():
     form = NonPlayerMemberForm()
     if request.method == 'POST':
-        print(f"DEBUG: Non-Player form submitted with data: {request.form}")  # 打印表单数据进行调试
+        logger.debug("Non-player registration form submitted", extra={'fields': sorted(request.form)})  # 只记录字段名，不记录密码等内容
         
         if form.validate_on_submit():
             try:
@@ -275,13 +279,13 @@ def register_non_player():
             except Exception as e:
                 db.session.rollback()  # 出错时回滚事务
                 flash(f'Registration failed: {str(e)}', 'danger')
-                print(f"ERROR: Registration failed with exception: {str(e)}")  # 打印错误信息进行调试
+                logger.error("Registration failed with exception: %s", e)
         else:
             # 显示表单验证错误
             for field, errors in form.errors.items():
                 for error in errors:
                     flash(f'{getattr(form, field).label.text}: {error}', 'danger')
-                    print(f"VALIDATION ERROR: {field} - {error}")  # 打印验证错误进行调试
+                    logger.debug("Validation error: %s - %s", field, error)
     
     return render_template('auth/register_non_player.html', title='Register as Non-Player Member', form=form) 
 
@@ -312,16 +316,16 @@ def reset_password():
             # Catch the specific error related to unsupported hash types
             if 'unsupported hash type' in str(e):
                 flash('Could not verify your old password due to a system compatibility issue. Please contact an administrator for help resetting your password.', 'danger')
-                print(f"ERROR: Password check failed for user {user.username} due to unsupported hash: {e}")
+                logger.error("Password check failed for user %s due to unsupported hash: %s", user.username, e)
             else:
                 # Handle other potential ValueErrors during password check
                 flash('An unexpected error occurred while verifying your password.', 'danger')
-                print(f"ERROR: Unexpected ValueError during password check for user {user.username}: {e}")
+                logger.error("Unexpected ValueError during password check for user %s: %s", user.username, e)
         except Exception as e:
             # Catch any other unexpected errors
             db.session.rollback()
             flash('An unexpected error occurred. Please try again.', 'danger')
-            print(f"ERROR: Unexpected exception during password reset for user {user.username}: {e}")
+            logger.error("Unexpected exception during password reset for user %s: %s", user.username, e)
 
     return render_template('auth/reset_password.html', title='Reset Password', form=form)
 
@@ -329,15 +333,16 @@ def reset_password():
 @bp.route('/admin/reset_password', methods=['GET', 'POST'])
 def admin_reset_password():
     # Log user details for debugging
-    print(f"Accessing reset password tool. User authenticated: {current_user.is_authenticated}")
-    if current_user.is_authenticated:
-        print(f"User ID: {current_user.id}")
-        print(f"User Role: {getattr(current_user, 'role', 'N/A')}")
-        print(f"User Type: {getattr(current_user, 'user_type', 'N/A')}")
+    logger.debug("Accessing reset password tool", extra={
+        'authenticated': current_user.is_authenticated,
+        'user_id': getattr(current_user, 'id', None),
+        'role': getattr(current_user, 'role', None),
+        'user_type': getattr(current_user, 'user_type', None)
+    })
 
     # Check if the current user is either an admin or a member assistant
     if not current_user.is_authenticated or (current_user.role != 'admin' and current_user.user_type != 'member_assistant'):
-        print(f"Permission denied for user {getattr(current_user, 'username', 'anonymous')}. Role: {getattr(current_user, 'role', 'N/A')}, Type: {getattr(current_user, 'user_type', 'N/A')}") # Add logging for denial
+        logger.warning("Permission denied for user %s. Role: %s, Type: %s", getattr(current_user, 'username', 'anonymous'), getattr(current_user, 'role', 'N/A'), getattr(current_user, 'user_type', 'N/A'))
         flash('You do not have permission to access this page', 'danger')
         return redirect(url_for('main.index'))
         
@@ -359,7 +364,7 @@ def admin_reset_password():
         except Exception as e:
             db.session.rollback()
             flash(f'An error occurred while resetting password: {str(e)}', 'danger')
-            print(f"ERROR: Password reset failed for user {form.username.data}: {e}")
+            logger.error("Password reset failed for user %s: %s", form.username.data, e)
     
     # Updated title to reflect that both Admin and Member Assistant can use this tool
     return render_template('auth/admin_reset_password.html', title='Password Reset Tool', form=form)
@@ -368,15 +373,16 @@ def admin_reset_password():
 @bp.route('/member_assistant/reset_password', methods=['GET', 'POST'])
 def member_assistant_reset_password():
     # Log user details for debugging
-    print(f"Accessing member assistant reset password tool. User authenticated: {current_user.is_authenticated}")
-    if current_user.is_authenticated:
-        print(f"User ID: {current_user.id}")
-        print(f"User Role: {getattr(current_user, 'role', 'N/A')}")
-        print(f"User Type: {getattr(current_user, 'user_type', 'N/A')}")
+    logger.debug("Accessing member assistant reset password tool", extra={
+        'authenticated': current_user.is_authenticated,
+        'user_id': getattr(current_user, 'id', None),
+        'role': getattr(current_user, 'role', None),
+        'user_type': getattr(current_user, 'user_type', None)
+    })
 
     # Check if the current user is a member assistant
     if not current_user.is_authenticated or current_user.user_type != 'member_assistant':
-        print(f"Permission denied for user {getattr(current_user, 'username', 'anonymous')}. Not a member assistant.")
+        logger.warning("Permission denied for user %s. Not a member assistant.", getattr(current_user, 'username', 'anonymous'))
         flash('只有会员助理可以访问此页面', 'danger')
         return redirect(url_for('main.index'))
         
@@ -398,7 +404,7 @@ def member_assistant_reset_password():
         except Exception as e:
             db.session.rollback()
             flash(f'重置密码时发生错误: {str(e)}', 'danger')
-            print(f"ERROR: Password reset failed for user {form.username.data}: {e}")
+            logger.error("Password reset failed for user %s: %s", form.username.data, e)
     
     # Chinese title for member assistant page
     return render_template('auth/member_assistant_reset_password.html', title='会员助理密码重置工具', form=form)
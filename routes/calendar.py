@@ -0,0 +1,156 @@
+"""
+Routes for the club calendar in the Simply Rugby application.
+"""
+from flask import Blueprint, Response, jsonify, request, url_for
+from flask_login import login_required, current_user
+from app.services.calendar_service import CalendarService
+from app.services.ical_service import ICalService
+from app.models.coach import Coach
+from app.models.player import Player
+from app.models.junior_player import JuniorPlayer
+from datetime import date, datetime, timedelta
+
+# Create a Blueprint for the calendar routes
+calendar_bp = Blueprint('calendar', __name__)
+
+# Longest range a single request may ask for
+MAX_RANGE_DAYS = 400
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@calendar_bp.route('/api/calendar')
+@login_required
+def get_calendar():
+    """
+    Get games, training sessions and venue bookings grouped by day.
+
+    Query parameters:
+    - start / end: Date range as YYYY-MM-DD (inclusive)
+    - view: 'week' or 'month' around date (YYYY-MM-DD, default today),
+      or 'season' with season_id, instead of start / end
+    - squad_id: Only events of these squads (repeatable)
+    - venue_id: Only events at these venues (repeatable); training
+      sessions have no venue and are left out
+
+    Returns JSON with one entry per day in the range.
+    """
+    try:
+        squad_ids = request.args.getlist('squad_id', type=int)
+        venue_ids = request.args.getlist('venue_id', type=int)
+        view = request.args.get('view')
+
+        if view == 'season':
+            season_range = CalendarService.season_range(request.args.get('season_id', type=int))
+            if season_range is None:
+                return jsonify({'success': False, 'message': 'Season not found'}), 404
+            start, end = season_range
+        elif view in ('week', 'month'):
+            anchor = _parse_date(request.args['date']) if request.args.get('date') else date.today()
+            if view == 'week':
+                start, end = CalendarService.week_range(anchor)
+            else:
+                start, end = CalendarService.month_range(anchor.year, anchor.month)
+        elif view is None and request.args.get('start') and request.args.get('end'):
+            start = _parse_date(request.args['start'])
+            end = _parse_date(request.args['end'])
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'Provide start and end, or view=week|month|season'
+            }), 400
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+
+    if end < start or end - start > timedelta(days=MAX_RANGE_DAYS):
+        return jsonify({
+            'success': False,
+            'message': f'Date range must be between 1 and {MAX_RANGE_DAYS + 1} days'
+        }), 400
+
+    buckets = CalendarService.get_day_buckets(start, end, squad_ids or None, venue_ids or None)
+
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': [{'date': day.isoformat(), 'events': events} for day, events in buckets.items()]
+    })
+
+
+@calendar_bp.route('/api/calendar/feeds')
+@login_required
+def get_calendar_feeds():
+    """
+    Get the iCalendar feed URLs available to the current user.
+
+    Returns JSON with subscription URLs for the user's own feed, their
+    squads and, for coaches, their coach feed. URLs stop working when the
+    user rotates them or no longer belongs to the squad or coach.
+    """
+    def feed_url(kind, owner_id):
+        return url_for('calendar.calendar_feed', token=ICalService.make_token(kind, owner_id, current_user),
+                       _external=True)
+
+    feeds = []
+    squad_ids = set()
+
+    for model in (Player, JuniorPlayer):
+        for (squad_id,) in model.query.with_entities(model.squad_id).filter(
+                model.user_id == current_user.id, model.squad_id.isnot(None)):
+            squad_ids.add(squad_id)
+    if squad_ids:
+        feeds.append({'kind': 'member', 'url': feed_url('member', current_user.id)})
+
+    coach = Coach.query.filter_by(user_id=current_user.id).first()
+    if coach:
+        feeds.append({'kind': 'coach', 'url': feed_url('coach', coach.id)})
+        if coach.squad_id:
+            squad_ids.add(coach.squad_id)
+
+    for squad_id in sorted(squad_ids):
+        feeds.append({'kind': 'squad', 'squad_id': squad_id, 'url': feed_url('squad', squad_id)})
+
+    return jsonify({'success': True, 'feeds': feeds})
+
+
+@calendar_bp.route('/api/calendar/feeds/rotate', methods=['POST'])
+@login_required
+def rotate_calendar_feeds():
+    """
+    Invalidate the current user's feed URLs and issue new ones.
+
+    Returns the same JSON as /api/calendar/feeds with the new URLs.
+    """
+    if not ICalService.rotate_tokens(current_user):
+        return jsonify({'success': False, 'message': 'Failed to rotate calendar feeds'}), 500
+    return get_calendar_feeds()
+
+
+@calendar_bp.route('/calendar/feeds/<token>.ics')
+def calendar_feed(token):
+    """
+    Serve an iCalendar feed of games and training sessions.
+
+    Feeds are addressed by a signed token, so calendar apps can subscribe
+    without logging in. The token is checked against its user's current
+    token version and access on every request. Responses carry a strong
+    ETag and Last-Modified; polls with a matching If-None-Match or
+    If-Modified-Since get a 304 from the feed cache.
+    """
+    token_values = ICalService.read_token(token)
+    if token_values is None or not ICalService.is_authorized(*token_values):
+        return Response('Feed not found', status=404, mimetype='text/plain')
+
+    feed = ICalService.get_feed(*token_values[:2])
+    if feed is None:
+        return Response('Feed not found', status=404, mimetype='text/plain')
+
+    response = Response(feed.body, mimetype='text/calendar')
+    response.set_etag(feed.etag)
+    response.last_modified = feed.last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
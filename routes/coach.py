@@ -11,6 +11,15 @@ from app.models.skill_assessment import SkillAssessment
 from app.models.user import User
 from app.models.game import Game
 from app.models.injury import Injury
+from app.services.skill_index_service import SkillIndexService
+from app.services.squad_skill_service import SquadSkillService
+from app.services.coach_access_service import CoachAccessService
+from app.services.roster_service import RosterService
+from app.services.attendance_service import AttendanceService
+from app.services.training_schedule_service import TrainingScheduleService
+from app.utils.pagination import InvalidCursor
+from app.utils.query_counter import query_budget
+from app.utils.recurrence import RecurrenceRule, parse_dates, parse_time
 from datetime import datetime, timedelta
 from sqlalchemy import and_, desc, func
 
@@ -175,51 +184,18 @@ def profile():
     return render_template('coach/profile.html', title='Coach Profile', form=form)
 
 @bp.route('/players-overview')
+@query_budget(10)
 @login_required
 def players_overview():
     if current_user.user_type != 'coach':
         flash('Access denied', 'danger')
         return redirect(url_for('main.index'))
         
-    # Get squads managed by this coach - using the same logic as other functions
-    all_squads = []
-    
-    # Method 1: Direct association through Coach model
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id:
-        direct_squad = Squad.query.get(coach.squad_id)
-        if direct_squad:
-            all_squads.append(direct_squad)
+    # Get squads managed by this coach (direct association and training plans)
+    squads = RosterService.get_squads(CoachAccessService.get_accessible_squad_ids(current_user.id))
     
-    # Method 2: Association through TrainingPlan
-    plan_squads = Squad.query.join(TrainingPlan).filter(
-        TrainingPlan.coach_id == current_user.id
-    ).distinct().all()
-    
-    # Add squads from training plans (avoiding duplicates)
-    for squad in plan_squads:
-        if not any(s.id == squad.id for s in all_squads):
-            all_squads.append(squad)
-            
-    squads = all_squads
-    
-    # Get players for each squad
-    squad_players = {}
-    for squad in squads:
-        players = Player.query.filter_by(squad_id=squad.id).all()
-        player_data = []
-        for player in players:
-            user = User.query.get(player.user_id)
-            # 暂时跳过伤病查询，因为injuries表不存在
-            player_data.append({
-                'id': player.id,
-                'user_id': player.user_id,
-                'name': user.name,
-                'position': player.preferred_positions,
-                'injuries': [],  # 提供空列表作为默认值
-                'has_health_issues': bool(player.health_issues) if hasattr(player, 'health_issues') else False
-            })
-        squad_players[squad.id] = player_data
+    # Get players for every squad in one joined query
+    squad_players = RosterService.get_rosters([squad.id for squad in squads])
     
     return render_template('coach/players_overview.html',
                          title='Players Overview',
@@ -245,11 +221,8 @@ def skill_assessment():
     players = []
     
     if squad:
-        players = Player.query.filter_by(squad_id=squad.id).all()
-        
-        # 为每个球员添加用户信息
-        for player in players:
-            player.user_info = User.query.get(player.user_id)
+        # 一次查询获取球员、用户信息和当前技能等级
+        players = RosterService.get_rosters([squad.id], include_skills=True)[squad.id]
     
     return render_template('coach/skill_assessment.html', 
                           title='Skill Assessment',
@@ -266,35 +239,12 @@ def get_squad_players(squad_id):
         return jsonify({'error': 'Access denied'}), 403
     
     # Verify the coach has access to this squad
-    has_access = False
-    
-    # Check direct association
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == squad_id:
-        has_access = True
-    
-    # Check training plan association
-    if not has_access:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=squad_id
-        ).first()
-        if training_plan:
-            has_access = True
-    
-    if not has_access:
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
         return jsonify({'error': 'Not authorized to view this squad'}), 403
     
     # Get all players in the squad
-    players = Player.query.filter_by(squad_id=squad_id).all()
-    player_list = []
-    
-    for player in players:
-        user = User.query.get(player.user_id)
-        player_list.append({
-            'id': player.id,
-            'name': user.name if user else f'Player #{player.id}'
-        })
+    players = RosterService.get_rosters([squad_id])[squad_id]
+    player_list = [{'id': player.id, 'name': player.name} for player in players]
     
     return jsonify({
         'squad_id': squad_id,
@@ -312,23 +262,7 @@ def get_player_skills(player_id):
     player = Player.query.get_or_404(player_id)
     
     # Verify the coach has access to this player's squad
-    has_access = False
-    
-    # Check direct association
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == player.squad_id:
-        has_access = True
-    
-    # Check training plan association
-    if not has_access and player.squad_id:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=player.squad_id
-        ).first()
-        if training_plan:
-            has_access = True
-    
-    if not has_access:
+    if not CoachAccessService.can_access_squad(current_user.id, player.squad_id):
         return jsonify({'error': 'Not authorized to view this player'}), 403
     
     # Get player information
@@ -338,16 +272,10 @@ def get_player_skills(player_id):
     # Define the 5 core skills
     core_skills = ['Passing', 'Tackling', 'Kicking', 'Running', 'Teamwork']
     
-    # Get the latest assessment for each core skill
-    skill_data = {}
-    for skill in core_skills:
-        # Get the most recent assessment for this skill
-        assessment = SkillAssessment.query.filter_by(
-            player_id=player_id,
-            skill_type=skill
-        ).order_by(SkillAssessment.assessment_date.desc()).first()
-        
-        skill_data[skill] = assessment.skill_level if assessment else 1
+    # Get the latest level for each core skill from the skill index
+    skill_map = SkillIndexService.get_player_skill_map([player_id], skill_types=core_skills)
+    current_levels = skill_map.get(player_id, {}).get('skills', {})
+    skill_data = {skill: current_levels.get(skill, 1) for skill in core_skills}
     
     return jsonify({
         'player_id': player_id,
@@ -356,6 +284,104 @@ def get_player_skills(player_id):
         'core_skills': core_skills
     })
 
+# Maximum number of players returned by one batch skills request
+MAX_BATCH_PLAYERS = 300
+
+@bp.route('/api/player-skills', methods=['GET'])
+@login_required
+def get_players_skills():
+    """API endpoint to get skill data for many players at once
+    
+    Query parameters:
+    - ids: comma separated player IDs (at most MAX_BATCH_PLAYERS)
+    """
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        player_ids = list(dict.fromkeys(
+            int(value) for value in request.args.get('ids', '').split(',') if value.strip()
+        ))
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of player IDs'}), 400
+    
+    if not player_ids:
+        return jsonify({'error': 'At least one player ID is required'}), 400
+    if len(player_ids) > MAX_BATCH_PLAYERS:
+        return jsonify({'error': f'At most {MAX_BATCH_PLAYERS} players can be requested at once'}), 400
+    
+    players = db.session.query(Player.id, Player.squad_id, User.name).join(
+        User, User.id == Player.user_id
+    ).filter(Player.id.in_(player_ids)).all()
+    
+    # Verify the coach has access to every requested player's squad
+    accessible_ids = CoachAccessService.get_accessible_squad_ids(current_user.id)
+    if any(player.squad_id not in accessible_ids for player in players):
+        return jsonify({'error': 'Not authorized to view these players'}), 403
+    
+    # Keep the requested order
+    order = {player_id: index for index, player_id in enumerate(player_ids)}
+    players.sort(key=lambda player: order[player.id])
+    
+    found_ids = {player.id for player in players}
+    payload = _player_skills_columns(players)
+    payload['missing_ids'] = [player_id for player_id in player_ids if player_id not in found_ids]
+    return jsonify(payload)
+
+@bp.route('/api/squad/<int:squad_id>/player-skills', methods=['GET'])
+@login_required
+def get_squad_player_skills(squad_id):
+    """API endpoint to get skill data for every player in a squad"""
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Verify the coach has access to this squad
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
+        return jsonify({'error': 'Not authorized to view this squad'}), 403
+    
+    players = db.session.query(Player.id, Player.squad_id, User.name).join(
+        User, User.id == Player.user_id
+    ).filter(Player.squad_id == squad_id).order_by(User.name).limit(MAX_BATCH_PLAYERS).all()
+    
+    payload = _player_skills_columns(players)
+    payload['squad_id'] = squad_id
+    return jsonify(payload)
+
+def _player_skills_columns(players):
+    """Build a column-oriented skills payload for (id, squad_id, name) player rows"""
+    core_skills = SquadSkillService.CORE_SKILLS
+    detailed_skills = {
+        'Passing': ['Standard', 'Spin', 'Pop'],
+        'Tackling': ['Front', 'Rear', 'Side', 'Scrabble'],
+        'Kicking': ['Drop', 'Punt', 'Grubber', 'Goal']
+    }
+    
+    # One query for every player's core skills and sub-skills
+    skill_map = SkillIndexService.get_player_skill_map([player.id for player in players])
+    empty = {'skills': {}, 'sub_skills': {}}
+    levels = [skill_map.get(player.id, empty) for player in players]
+    
+    return {
+        'player_ids': [player.id for player in players],
+        'player_names': [player.name or f'Player #{player.id}' for player in players],
+        'squad_ids': [player.squad_id for player in players],
+        'core_skills': core_skills,
+        'detailed_skills': detailed_skills,
+        # Core skill levels, one value per player (1 if never assessed)
+        'skills': {
+            skill: [entry['skills'].get(skill, 1) for entry in levels]
+            for skill in core_skills
+        },
+        # Sub-skill levels, one value per player (null if never assessed)
+        'sub_skills': {
+            skill: {
+                sub_skill: [entry['sub_skills'].get(skill, {}).get(sub_skill) for entry in levels]
+                for sub_skill in sub_skills
+            }
+            for skill, sub_skills in detailed_skills.items()
+        }
+    }
+
 @bp.route('/api/player-detailed-skills/<int:player_id>', methods=['GET'])
 @login_required
 def get_player_detailed_skills(player_id):
@@ -367,23 +393,7 @@ def get_player_detailed_skills(player_id):
     player = Player.query.get_or_404(player_id)
     
     # Verify the coach has access to this player's squad
-    has_access = False
-    
-    # Check direct association
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == player.squad_id:
-        has_access = True
-    
-    # Check training plan association
-    if not has_access and player.squad_id:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=player.squad_id
-        ).first()
-        if training_plan:
-            has_access = True
-    
-    if not has_access:
+    if not CoachAccessService.can_access_squad(current_user.id, player.squad_id):
         return jsonify({'error': 'Not authorized to view this player'}), 403
     
     # Define detailed skill breakdowns
@@ -397,25 +407,28 @@ def get_player_detailed_skills(player_id):
     # In a real implementation, this would come from a detailed_skill_assessments table
     # For now, we'll generate simulated data based on the player's core skill ratings
     
-    # First get the core skill ratings
-    core_skill_ratings = {}
-    for skill in detailed_skills.keys():
-        assessment = SkillAssessment.query.filter_by(
-            player_id=player_id,
-            skill_type=skill
-        ).order_by(SkillAssessment.assessment_date.desc()).first()
-        
-        core_skill_ratings[skill] = assessment.skill_level if assessment else 3  # Default to average if not found
+    # First get the core skill ratings (and any indexed sub-skill ratings) in one query
+    skill_map = SkillIndexService.get_player_skill_map([player_id], skill_types=list(detailed_skills.keys()))
+    player_levels = skill_map.get(player_id, {'skills': {}, 'sub_skills': {}})
+    core_skill_ratings = {
+        skill: player_levels['skills'].get(skill, 3)  # Default to average if not found
+        for skill in detailed_skills.keys()
+    }
     
     # Now generate detailed ratings that average to the core rating
     detailed_ratings = {}
     for skill, sub_skills in detailed_skills.items():
         core_rating = core_skill_ratings[skill]
+        assessed_sub_skills = player_levels['sub_skills'].get(skill, {})
         detailed_ratings[skill] = {}
         
         # Generate random ratings around the core rating (within ±1)
         import random
         for sub_skill in sub_skills:
+            # Prefer a real sub-skill assessment when one exists
+            if sub_skill in assessed_sub_skills:
+                detailed_ratings[skill][sub_skill] = assessed_sub_skills[sub_skill]
+                continue
             # Ensure the rating stays within 1-5 range
             min_rating = max(1, core_rating - 1)
             max_rating = min(5, core_rating + 1)
@@ -435,65 +448,91 @@ def get_squad_skills(squad_id):
         return jsonify({'error': 'Access denied'}), 403
     
     # Verify the coach has access to this squad
-    has_access = False
-    
-    # Check direct association
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == squad_id:
-        has_access = True
-    
-    # Check training plan association
-    if not has_access:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=squad_id
-        ).first()
-        if training_plan:
-            has_access = True
-    
-    if not has_access:
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
         return jsonify({'error': 'Not authorized to view this squad'}), 403
     
-    # Get all players in the squad
-    players = Player.query.filter_by(squad_id=squad_id).all()
-    player_ids = [player.id for player in players]
-    
-    # Define the 5 core skills
-    core_skills = ['Passing', 'Tackling', 'Kicking', 'Running', 'Teamwork']
-    
-    # Get average skill levels for the squad
-    squad_averages = {}
-    for skill in core_skills:
-        # Initialize total and count
-        total_level = 0
-        count = 0
-        
-        # For each player, get their latest assessment for this skill
-        for player_id in player_ids:
-            assessment = SkillAssessment.query.filter_by(
-                player_id=player_id,
-                skill_type=skill
-            ).order_by(SkillAssessment.assessment_date.desc()).first()
-            
-            if assessment:
-                total_level += assessment.skill_level
-                count += 1
-        
-        # Calculate average (default to 1 if no assessments)
-        squad_averages[skill] = round(total_level / count, 1) if count > 0 else 1
+    # Aggregate the squad's skills in one statement
+    core_skills = SquadSkillService.CORE_SKILLS
+    stats = SquadSkillService.aggregate([squad_id], skill_types=core_skills).get(squad_id)
     
-    # Get squad info
-    squad = Squad.query.get(squad_id)
-    squad_name = squad.name if squad else f'Squad #{squad_id}'
+    # Every existing squad has an entry, including squads without players
+    if not stats:
+        return jsonify({'error': 'Squad not found'}), 404
     
     return jsonify({
         'squad_id': squad_id,
-        'squad_name': squad_name,
-        'player_count': len(player_ids),
-        'average_skills': squad_averages,
+        'squad_name': stats['squad_name'],
+        'player_count': stats['player_count'],
+        'average_skills': stats['average_skills'],
+        'skill_stats': stats['skills'],
         'core_skills': core_skills
     })
 
+# Maximum number of squads returned by one batch squad skills request
+MAX_BATCH_SQUADS = 50
+
+@bp.route('/api/squad-skills', methods=['GET'])
+@login_required
+def get_squads_skills():
+    """API endpoint to get skill statistics for several squads at once
+    
+    Query parameters:
+    - ids: comma separated squad IDs (at most MAX_BATCH_SQUADS)
+    - include_players: boolean (default: false)
+    
+    Squads that do not exist or that the coach cannot access are listed in
+    missing_ids.
+    """
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        squad_ids = list(dict.fromkeys(
+            int(value) for value in request.args.get('ids', '').split(',') if value.strip()
+        ))
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of squad IDs'}), 400
+    
+    if not squad_ids:
+        return jsonify({'error': 'At least one squad ID is required'}), 400
+    if len(squad_ids) > MAX_BATCH_SQUADS:
+        return jsonify({'error': f'At most {MAX_BATCH_SQUADS} squads can be requested at once'}), 400
+    
+    include_players = request.args.get('include_players', 'false').lower() == 'true'
+    core_skills = SquadSkillService.CORE_SKILLS
+    
+    # Only aggregate squads the coach has access to
+    accessible_ids = CoachAccessService.get_accessible_squad_ids(current_user.id)
+    allowed_ids = [squad_id for squad_id in squad_ids if squad_id in accessible_ids]
+    stats = {}
+    if allowed_ids:
+        stats = SquadSkillService.aggregate(allowed_ids, skill_types=core_skills, include_players=include_players)
+    
+    # 无权访问和不存在的球队同样报告为缺失，不泄露哪些球队存在
+    missing_ids = [squad_id for squad_id in squad_ids if squad_id not in stats]
+    
+    squads = []
+    for squad_id in squad_ids:
+        squad_stats = stats.get(squad_id)
+        if not squad_stats:
+            continue
+        squad_data = {
+            'squad_id': squad_id,
+            'squad_name': squad_stats['squad_name'],
+            'player_count': squad_stats['player_count'],
+            'average_skills': squad_stats['average_skills'],
+            'skill_stats': squad_stats['skills']
+        }
+        if include_players:
+            squad_data['players'] = squad_stats['players']
+        squads.append(squad_data)
+    
+    return jsonify({
+        'squads': squads,
+        'core_skills': core_skills,
+        'missing_ids': missing_ids
+    })
+
 @bp.route('/api/player-squad/<int:player_id>', methods=['GET'])
 @login_required
 def get_player_squad(player_id):
@@ -505,23 +544,7 @@ def get_player_squad(player_id):
     player = Player.query.get_or_404(player_id)
     
     # Verify the coach has access to this player's squad
-    has_access = False
-    
-    # Check direct association
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == player.squad_id:
-        has_access = True
-    
-    # Check training plan association
-    if not has_access and player.squad_id:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=player.squad_id
-        ).first()
-        if training_plan:
-            has_access = True
-    
-    if not has_access:
+    if not CoachAccessService.can_access_squad(current_user.id, player.squad_id):
         return jsonify({'error': 'Not authorized to view this player'}), 403
     
     # Get squad information
@@ -755,11 +778,20 @@ def training_plans():
                     squad_id=int(squad_id)
                 )
                 
+                # Build the recurrence rule before saving so invalid input creates nothing
+                rule = _recurrence_rule_from_form(request.form, start_date, end_date, frequency)
+                
+                # The plan and its sessions are committed together, or not at all
                 db.session.add(plan)
-                db.session.commit()
+                db.session.flush()
                 
                 # Generate training sessions based on plan frequency
-                generate_training_sessions(plan)
+                if generate_training_sessions(plan, rule) is None:
+                    error_msg = 'Failed to create the training plan sessions, please try again'
+                    if is_ajax:
+                        return jsonify({'success': False, 'message': error_msg})
+                    flash(error_msg, 'danger')
+                    return redirect(url_for('coach.training_plans'))
                 
                 success_msg = 'Training plan created successfully!'
                 
@@ -787,7 +819,7 @@ def training_plans():
                     flash(success_msg, 'success')
                     return redirect(url_for('coach.training_plans', success=True, plan_created=True))
         except ValueError:
-            error_msg = 'Invalid date format. Please use YYYY/MM/DD format'
+            error_msg = 'Invalid date, time or recurrence. Please use YYYY/MM/DD dates and HH:MM times'
             if is_ajax:
                 return jsonify({'success': False, 'message': error_msg})
             else:
@@ -828,25 +860,7 @@ def squad_details(squad_id):
     squad = Squad.query.get_or_404(squad_id)
     
     # Check if the coach manages this squad (either through direct association or training plan)
-    is_authorized = False
-    
-    # Method 1: Check direct association through Coach model
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == squad_id:
-        is_authorized = True
-    
-    # Method 2: Check association through TrainingPlan
-    if not is_authorized:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=squad_id
-        ).first()
-        
-        if training_plan:
-            is_authorized = True
-    
-    # If not authorized, return 404
-    if not is_authorized:
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
         flash('You are not authorized to manage this team', 'danger')
         return redirect(url_for('coach.squads'))
     
@@ -906,25 +920,7 @@ def add_player_to_squad(squad_id, player_id):
     squad = Squad.query.get_or_404(squad_id)
     
     # Check if the coach manages this squad (either through direct association or training plan)
-    is_authorized = False
-    
-    # Method 1: Check direct association through Coach model
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == squad_id:
-        is_authorized = True
-    
-    # Method 2: Check association through TrainingPlan
-    if not is_authorized:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=squad_id
-        ).first()
-        
-        if training_plan:
-            is_authorized = True
-    
-    # If not authorized, return 404
-    if not is_authorized:
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
         flash('You are not authorized to manage this team', 'danger')
         return redirect(url_for('coach.squads'))
     
@@ -936,22 +932,8 @@ def add_player_to_squad(squad_id, player_id):
     if player.squad_id is not None:
         old_squad = Squad.query.get(player.squad_id)
         
-        # Check if coach has permission to remove player from current squad
-        is_coach_of_old_squad = False
-        
-        # Check through Coach model
-        if coach and coach.squad_id == player.squad_id:
-            is_coach_of_old_squad = True
-            
-        # Check through TrainingPlan if not already authorized
-        if not is_coach_of_old_squad:
-            is_coach_of_old_squad = db.session.query(TrainingPlan).filter(
-                TrainingPlan.squad_id == player.squad_id,
-                TrainingPlan.coach_id == current_user.id
-            ).first() is not None
-        
         # If player is in another coach's squad, deny the transfer
-        if not is_coach_of_old_squad:
+        if not CoachAccessService.can_access_squad(current_user.id, player.squad_id):
             flash(f'Cannot transfer player from another coach\'s team ({old_squad.name})', 'danger')
             return redirect(url_for('coach.squad_details', squad_id=squad_id))
     
@@ -978,25 +960,7 @@ def remove_player_from_squad(squad_id, player_id):
     squad = Squad.query.get_or_404(squad_id)
     
     # Check if the coach manages this squad (either through direct association or training plan)
-    is_authorized = False
-    
-    # Method 1: Check direct association through Coach model
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == squad_id:
-        is_authorized = True
-    
-    # Method 2: Check association through TrainingPlan
-    if not is_authorized:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=squad_id
-        ).first()
-        
-        if training_plan:
-            is_authorized = True
-    
-    # If not authorized, return 404
-    if not is_authorized:
+    if not CoachAccessService.can_access_squad(current_user.id, squad_id):
         flash('You are not authorized to manage this team', 'danger')
         return redirect(url_for('coach.squads'))
     
@@ -1027,26 +991,8 @@ def player_detail(player_id):
     # Get the player's user record
     user = User.query.get_or_404(player.user_id)
     
-    # Check if the coach is authorized to view this player
-    is_authorized = False
-    
     # Check if the player is in a squad managed by this coach (either directly or through training plans)
-    # Method 1: Coach directly associated with the squad
-    coach = Coach.query.filter_by(user_id=current_user.id).first()
-    if coach and coach.squad_id == player.squad_id:
-        is_authorized = True
-    
-    # Method 2: Coach has training plans for the squad
-    if not is_authorized and player.squad_id:
-        training_plan = TrainingPlan.query.filter_by(
-            coach_id=current_user.id,
-            squad_id=player.squad_id
-        ).first()
-        
-        if training_plan:
-            is_authorized = True
-    
-    if not is_authorized:
+    if not CoachAccessService.can_access_squad(current_user.id, player.squad_id):
         flash('You are not authorized to view this player\'s details', 'danger')
         return redirect(url_for('coach.players_overview'))
     
@@ -1144,6 +1090,8 @@ def training_plan(id):
                 flash('Please fill in all required fields', 'danger')
                 return redirect(url_for('coach.training_plan', id=plan.id))
             
+            rule = _recurrence_rule_from_form(request.form, start_date, end_date, frequency)
+            
             # Update plan with new data
             plan.title = title
             plan.description = description
@@ -1152,11 +1100,15 @@ def training_plan(id):
             plan.frequency = frequency
             plan.squad_id = int(squad_id)
             
-            db.session.commit()
+            # Re-plan sessions against the existing ones instead of recreating them;
+            # the plan changes are committed with the sessions, or rolled back with them
+            if generate_training_sessions(plan, rule) is None:
+                flash('Failed to update the training plan sessions, please try again', 'danger')
+                return redirect(url_for('coach.training_plan', id=id))
             flash('Training plan updated successfully', 'success')
             return redirect(url_for('coach.training_plan', id=plan.id))
         except ValueError:
-            flash('Invalid date format. Please use YYYY/MM/DD format', 'danger')
+            flash('Invalid date, time or recurrence. Please use YYYY/MM/DD dates and HH:MM times', 'danger')
             return redirect(url_for('coach.training_plan', id=plan.id))
     
     # For GET request, populate form with current plan data
@@ -1192,6 +1144,7 @@ def training_plan(id):
                          form=form)
 
 @bp.route('/session/<int:session_id>', methods=['GET', 'POST'])
+@query_budget(15)
 @login_required
 def training_session(session_id):
     """View and record attendance for a training session"""
@@ -1208,67 +1161,59 @@ def training_session(session_id):
         flash('You are not authorized to view this training session', 'danger')
         return redirect(url_for('coach.training_plans'))
     
-    # Get squad information
-    squad = Squad.query.get(plan.squad_id)
+    # Get squad information (a plan may not have a squad yet)
+    squad = Squad.query.get(plan.squad_id) if plan.squad_id else None
     
-    # Get players in the squad
-    players = Player.query.filter_by(squad_id=squad.id).all()
-    player_data = []
+    # Get players in the squad and their recorded attendance (two queries in total)
+    players = RosterService.get_rosters([squad.id])[squad.id] if squad else []
     
-    for player in players:
-        user = User.query.get(player.user_id)
+    # Handle form submission for recording attendance
+    if request.method == 'POST':
+        invalid = [
+            player.name for player in players
+            if request.form.get(f'status_{player.id}', AttendanceService.STATUSES[0])
+            not in AttendanceService.STATUSES
+        ]
+        if invalid:
+            flash(f'Invalid attendance status for {", ".join(invalid)}', 'danger')
+            return redirect(url_for('coach.training_session', session_id=session_id))
+        
+        # The session status is saved together with the register
+        session_status = request.form.get('session_status') or None
+        if session_status and session_status not in AttendanceService.session_statuses():
+            flash(f'Invalid session status: {session_status}', 'danger')
+            return redirect(url_for('coach.training_session', session_id=session_id))
         
-        # Check if player already has attendance for this session
-        attendance = PlayerAttendance.query.filter_by(
-            player_id=player.id,
-            session_id=session_id
-        ).first()
+        # Record attendance for every player in one batch
+        entries = [
+            {
+                'player_id': player.id,
+                'status': request.form[f'status_{player.id}'],
+                'notes': request.form.get(f'notes_{player.id}', '')
+            }
+            for player in players
+            if f'status_{player.id}' in request.form
+        ]
         
+        if AttendanceService.record_register(session_id, entries, session_status) is None:
+            flash('Failed to record attendance, please try again', 'danger')
+        else:
+            if session_status:
+                flash('Session status updated', 'success')
+            flash('Attendance recorded successfully', 'success')
+        return redirect(url_for('coach.training_session', session_id=session_id))
+    
+    attendance_map = AttendanceService.get_attendance_map(session_id)
+    player_data = []
+    for player in players:
+        attendance = attendance_map.get(player.id)
         player_data.append({
             'id': player.id,
-            'name': user.name,
+            'name': player.name,
             'attendance_status': attendance.status if attendance else None,
             'notes': attendance.notes if attendance else None
         })
     
-    # Handle form submission for recording attendance
-    if request.method == 'POST':
-        # Update session status if provided
-        if 'session_status' in request.form:
-            session.status = request.form['session_status']
-            db.session.commit()
-            flash('Session status updated', 'success')
-        
-        # Record attendance for each player
-        for player in players:
-            status_key = f'status_{player.id}'
-            notes_key = f'notes_{player.id}'
-            
-            if status_key in request.form:
-                # Check if attendance record exists
-                attendance = PlayerAttendance.query.filter_by(
-                    player_id=player.id,
-                    session_id=session_id
-                ).first()
-                
-                if attendance:
-                    # Update existing record
-                    attendance.status = request.form[status_key]
-                    attendance.notes = request.form.get(notes_key, '')
-                else:
-                    # Create new record
-                    attendance = PlayerAttendance(
-                        player_id=player.id,
-                        session_id=session_id,
-                        status=request.form[status_key],
-                        notes=request.form.get(notes_key, '')
-                    )
-                    db.session.add(attendance)
-                    
-        db.session.commit()
-        flash('Attendance recorded successfully', 'success')
-        return redirect(url_for('coach.training_session', session_id=session_id))
-    
     return render_template('coach/training_session.html',
                          title=f'Training Session: {session.date.strftime("%d %b %Y")}',
                          session=session,
@@ -1276,6 +1221,56 @@ def training_session(session_id):
                          squad=squad,
                          players=player_data)
 
+@bp.route('/api/session/<int:session_id>/attendance', methods=['POST'])
+@login_required
+def record_session_attendance(session_id):
+    """API endpoint to submit the whole attendance register of a session
+    
+    This endpoint requires a JSON payload with:
+    - attendance: Array of {player_id, status, notes}
+    - session_status: New session status (optional)
+    
+    Returns JSON with the number of inserted, updated and unchanged rows.
+    """
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    session = TrainingSession.query.get_or_404(session_id)
+    plan = TrainingPlan.query.get(session.training_plan_id)
+    if not plan or plan.coach_id != current_user.id:
+        return jsonify({'error': 'Not authorized to edit this training session'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    register = data.get('attendance')
+    if not isinstance(register, list):
+        return jsonify({'error': 'attendance must be a list'}), 400
+    
+    # Only players of the session's squad can be registered
+    squad_player_ids = {player.id for player in RosterService.get_rosters([plan.squad_id])[plan.squad_id]}
+    
+    entries = []
+    for item in register:
+        try:
+            player_id = int(item.get('player_id'))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'error': 'Each entry needs a numeric player_id'}), 400
+        status = item.get('status')
+        if status not in AttendanceService.STATUSES:
+            return jsonify({'error': f'Invalid status for player {player_id}'}), 400
+        if player_id not in squad_player_ids:
+            return jsonify({'error': f'Player {player_id} is not in this squad'}), 400
+        entries.append({'player_id': player_id, 'status': status, 'notes': item.get('notes', '')})
+    
+    session_status = data.get('session_status') or None
+    if session_status and session_status not in AttendanceService.session_statuses():
+        return jsonify({'error': f'Invalid session status: {session_status}'}), 400
+    
+    result = AttendanceService.record_register(session_id, entries, session_status)
+    if result is None:
+        return jsonify({'success': False, 'message': 'Failed to record attendance'}), 500
+    
+    return jsonify(dict(result, success=True))
+
 @bp.route('/training-history', methods=['GET'])
 @login_required
 def training_history():
@@ -1284,44 +1279,52 @@ def training_history():
         flash('Access denied', 'danger')
         return redirect(url_for('auth.login'))
     
-    # Get all completed sessions for this coach
-    completed_sessions = TrainingSession.query.join(TrainingPlan).filter(
-        TrainingPlan.coach_id == current_user.id,
-        TrainingSession.status == 'completed',
-        TrainingSession.date < datetime.now().date()
-    ).order_by(TrainingSession.date.desc()).all()
-    
-    # Get attendance summary for each session
-    session_data = []
-    for session in completed_sessions:
-        # Get squad info
-        plan = TrainingPlan.query.get(session.training_plan_id)
-        squad = Squad.query.get(plan.squad_id) if plan else None
-        
-        # Get attendance stats
-        attendance_records = PlayerAttendance.query.filter_by(session_id=session.id).all()
-        total_players = len(attendance_records) if attendance_records else 0
-        present_count = sum(1 for a in attendance_records if a.status == 'present')
-        absent_count = sum(1 for a in attendance_records if a.status == 'absent')
-        excused_count = sum(1 for a in attendance_records if a.status == 'excused')
-        
-        # Add to data list
-        session_data.append({
-            'id': session.id,
-            'date': session.date,
-            'time': f"{session.start_time.strftime('%H:%M')} - {session.end_time.strftime('%H:%M')}",
-            'plan_title': plan.title if plan else 'Unknown',
-            'squad_name': squad.name if squad else 'Unknown',
-            'total_players': total_players,
-            'present_count': present_count,
-            'absent_count': absent_count,
-            'excused_count': excused_count,
-            'attendance_rate': round(present_count / total_players * 100) if total_players > 0 else 0
-        })
+    # Get one page of completed sessions with their attendance counts
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    try:
+        session_data, next_cursor = AttendanceService.get_session_summaries(
+            current_user.id,
+            cursor=request.args.get('before'),
+            limit=per_page
+        )
+    except InvalidCursor:
+        flash('Invalid page requested', 'warning')
+        return redirect(url_for('coach.training_history'))
     
     return render_template('coach/training_history.html',
                          title='Training History',
-                         sessions=session_data)
+                         sessions=session_data,
+                         next_cursor=next_cursor)
+
+@bp.route('/api/training-history', methods=['GET'])
+@login_required
+def get_training_history():
+    """API endpoint to page through training history and attendance statistics
+    
+    Query parameters:
+    - before: cursor returned as next_cursor by the previous page
+    - per_page: int (default: 20, max: 100)
+    """
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    try:
+        session_data, next_cursor = AttendanceService.get_session_summaries(
+            current_user.id,
+            cursor=request.args.get('before'),
+            limit=per_page
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    for summary in session_data:
+        summary['date'] = summary['date'].isoformat()
+    
+    return jsonify({
+        'sessions': session_data,
+        'next_cursor': next_cursor
+    })
 
 @bp.route('/schedule')
 @login_required
@@ -1343,32 +1346,73 @@ def schedule():
                          title='Coach Schedule',
                          sessions=sessions)
 
-def generate_training_sessions(plan):
-    """Generate training sessions based on plan frequency"""
-    start_date = plan.start_date
-    end_date = plan.end_date
-    frequency = plan.frequency
-    
-    current_date = start_date
-    while current_date <= end_date:
-        session = TrainingSession(
-            date=current_date,
-            start_time=datetime.strptime('09:00', '%H:%M').time(),
-            end_time=datetime.strptime('11:00', '%H:%M').time(),
-            plan_id=plan.id
-        )
-        db.session.add(session)
-        
-        # Increment date based on frequency
-        if frequency == 'weekly':
-            current_date += timedelta(days=7)
-        elif frequency == 'biweekly':
-            current_date += timedelta(days=14)
-        elif frequency == 'monthly':
-            # Add one month
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
+def generate_training_sessions(plan, rule=None):
+    """Generate training sessions based on plan frequency or an explicit recurrence rule"""
+    if rule is None:
+        rule = RecurrenceRule.from_plan_frequency(plan.frequency, plan.start_date, plan.end_date)
+    return TrainingScheduleService.sync_plan_sessions(plan, rule)
+
+def _recurrence_rule_from_form(form, start_date, end_date, frequency):
+    """Build a recurrence rule from plan form fields
+    
+    Optional fields on top of the plan frequency:
+    - weekdays: RRULE weekday codes (MO, TU, ...), repeated or comma separated
+    - interval: repeat every N weeks/months (overrides the frequency's interval)
+    - start_time / end_time: HH:MM session times
+    - exclude_dates: comma separated YYYY/MM/DD dates to skip
+    
+    Raises ValueError for invalid input.
+    """
+    weekdays = [
+        code
+        for value in form.getlist('weekdays')
+        for code in value.split(',')
+        if code.strip()
+    ]
+    rule = RecurrenceRule.from_plan_frequency(
+        frequency,
+        start_date,
+        end_date,
+        weekdays=weekdays or None,
+        exclude_dates=parse_dates(form.get('exclude_dates')),
+        start_time=parse_time(form.get('start_time')),
+        end_time=parse_time(form.get('end_time'))
+    )
+    if form.get('interval'):
+        rule.interval = int(form.get('interval'))
+        if rule.interval < 1:
+            raise ValueError('Interval must be at least 1')
+    return rule
+
+@bp.route('/api/training-plan/preview', methods=['GET'])
+@login_required
+def preview_training_sessions():
+    """API endpoint to preview the sessions a plan would generate
+    
+    Takes the same fields as the training plan form as query parameters,
+    plus limit (default: 50, max: 200).
+    """
+    if current_user.user_type != 'coach':
+        return jsonify({'error': 'Access denied'}), 403
     
-    db.session.commit() 
\ No newline at end of file
+    try:
+        start_date = datetime.strptime(request.args.get('start_date', ''), '%Y/%m/%d').date()
+        end_date = datetime.strptime(request.args.get('end_date', ''), '%Y/%m/%d').date()
+        rule = _recurrence_rule_from_form(request.args, start_date, end_date, request.args.get('frequency', 'weekly'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    occurrences, has_more = rule.preview(limit)
+    
+    return jsonify({
+        'sessions': [
+            {
+                'date': occurrence.date.isoformat(),
+                'start_time': occurrence.start_time.strftime('%H:%M') if occurrence.start_time else None,
+                'end_time': occurrence.end_time.strftime('%H:%M') if occurrence.end_time else None
+            }
+            for occurrence in occurrences
+        ],
+        'has_more': has_more
+    })
@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
@@ -6,8 +7,12 @@ from app.forms.assessment import SkillAssessmentForm, MatchRecordForm
 from app.models.junior_player import JuniorPlayer
 from app.models.skill_assessment import SkillAssessment
 from app.models.match_record import MatchRecord
+from app.services.skill_index_service import SkillIndexService
 from datetime import datetime, timedelta
 
+
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('junior_player', __name__, url_prefix='/junior_player')
 
 @bp.route('/dashboard')
@@ -31,31 +36,23 @@ def dashboard():
     last_assessment_date = None
     has_assessment_data = False
     
-    # Print debug information
-    print(f"DEBUG: Junior player ID = {player.id}")
+    logger.debug("Junior player ID = %s", player.id)
+    
+    # Read the current level of every skill and sub-skill from the skill index in one query
+    try:
+        skill_map = SkillIndexService.get_junior_skill_map([player.id], skill_types=skill_categories)
+    except Exception as e:
+        logger.error("Error querying skill index: %s", e)
+        skill_map = {}
+    player_levels = skill_map.get(player.id, {'skills': {}, 'sub_skills': {}, 'last_assessment_date': None})
     
-    # Query the latest assessment for each skill category
     for category in skill_categories:
-        try:
-            assessment = SkillAssessment.query.filter_by(
-                junior_player_id=player.id,
-                skill_type=category
-            ).order_by(SkillAssessment.assessment_date.desc()).first()
-            
-            print(f"DEBUG: Query for {category} assessment returned: {assessment}")
-            
-            if assessment:
-                skills[category] = assessment.skill_level
-                has_assessment_data = True
-                
-                # Update the latest assessment date
-                if not last_assessment_date or assessment.assessment_date > last_assessment_date:
-                    last_assessment_date = assessment.assessment_date
-            else:
-                skills[category] = 3  # Default middle value if no assessment exists
-        except Exception as e:
-            print(f"ERROR querying {category} assessment: {str(e)}")
-            skills[category] = 3  # Default value on error
+        if category in player_levels['skills']:
+            skills[category] = player_levels['skills'][category]
+            has_assessment_data = True
+        else:
+            skills[category] = 3  # Default middle value if no assessment exists
+    last_assessment_date = player_levels['last_assessment_date']
     
     # Get detailed sub-skills assessments
     detailed_skills = {
@@ -78,25 +75,16 @@ def dashboard():
         }
     }
     
-    # Query the latest assessment for each sub-skill
+    # Apply the latest assessment for each sub-skill
     for skill_type, sub_skills in detailed_skills.items():
+        assessed_sub_skills = player_levels['sub_skills'].get(skill_type.capitalize(), {})
         for sub_skill in sub_skills.keys():
-            try:
-                assessment = SkillAssessment.query.filter_by(
-                    junior_player_id=player.id,
-                    skill_type=skill_type.capitalize(),
-                    sub_skill=sub_skill
-                ).order_by(SkillAssessment.assessment_date.desc()).first()
-                
-                if assessment:
-                    detailed_skills[skill_type][sub_skill] = assessment.skill_level
-                    has_assessment_data = True
-            except Exception as e:
-                print(f"ERROR querying {skill_type}.{sub_skill} assessment: {str(e)}")
-                # Keep default value on error
+            if sub_skill in assessed_sub_skills:
+                detailed_skills[skill_type][sub_skill] = assessed_sub_skills[sub_skill]
+                has_assessment_data = True
     
     if not has_assessment_data:
-        print("DEBUG: No assessment data found, using default values for display")
+        logger.debug("No assessment data found, using default values for display")
         # If no actual assessment data exists, we'll still use our default values
         # to ensure the radar charts render properly
         if not last_assessment_date:
@@ -0,0 +1,28 @@
+"""
+Routes for exposing application metrics in the Simply Rugby application.
+"""
+import hmac
+from flask import Blueprint, Response, abort, current_app, request
+from app.utils.metrics import collect
+
+# Create a Blueprint for the metrics routes
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """
+    Expose request, database and cache metrics in the Prometheus text format.
+
+    If METRICS_TOKEN is set, scrapers must send it as a bearer token. The
+    endpoint is not served when METRICS_ENABLED is off.
+    """
+    if not current_app.config.get('METRICS_ENABLED', True):
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return Response('Unauthorized', status=401, mimetype='text/plain')
+
+    return Response(collect(), mimetype='text/plain; version=0.0.4')
@@ -1,9 +1,17 @@
 """
 Routes for handling notifications in the Simply Rugby application.
 """
-from flask import Blueprint, jsonify, request, render_template, redirect, url_for, flash
+import json
+import time
+from flask import Blueprint, Response, jsonify, request, render_template, redirect, url_for, flash, current_app, stream_with_context
 from flask_login import login_required, current_user
 from app.services.notification_service import NotificationService
+from app.services.fanout_service import FanoutService
+from app.services.inbox_service import InboxService
+from app.services.segment_service import Segment, SegmentService
+from app.utils.pagination import InvalidCursor
+from app.utils.query_counter import query_budget
+from app.utils.events import get_event_bus
 from app.models.member_assistant import MemberAssistant
 from app.models.squad import Squad
 from app.models.user import User
@@ -113,11 +121,16 @@ def get_squads():
     return jsonify(squad_list)
 
 @notification_bp.route('/api/notifications/recent', methods=['GET'])
+@query_budget(5)
 @login_required
 def get_recent_notifications():
     """
     Get recent notifications sent by admins and member assistants.
     
+    Query parameters:
+    - limit: int (default: 50, max: 500)
+    - before: cursor from the X-Next-Cursor header of the previous page
+    
     Returns JSON with notifications array.
     This endpoint is used by the admin/member assistant dashboard.
     """
@@ -134,82 +147,137 @@ def get_recent_notifications():
     if not is_authorized:
         return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
     
-    # Get recent notifications (limit to 50)
-    # 使用简化的查询以避免复杂的join
-    notifications = Notification.query.order_by(Notification.created_at.desc()).limit(50).all()
-    
-    notification_list = []
-    for notification in notifications:
-        # 查找发送者信息
-        sender = User.query.get(notification.sender_id)
-        sender_name = sender.username if sender else 'Unknown'
-        
-        # 确定接收者信息
-        recipient_name = 'All Users'
-        if notification.recipient_type == 'user' and notification.recipient_id:
-            user = User.query.get(notification.recipient_id)
-            recipient_name = user.username if user else 'Unknown User'
-        elif notification.recipient_type == 'squad' and notification.squad_id:
-            squad = Squad.query.get(notification.squad_id)
-            recipient_name = squad.name if squad else 'Unknown Squad'
-    
-        notification_data = {
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.type,
-            'created_at': notification.created_at.isoformat() if hasattr(notification.created_at, 'isoformat') else str(notification.created_at),
-            'sender_id': notification.sender_id,
-            'sender_name': sender_name,
-            'recipient_type': notification.recipient_type,
-            'recipient_name': recipient_name
-        }
-        notification_list.append(notification_data)
+    # 一次联表查询取出发送者、接收用户和接收球队
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    try:
+        notification_list, next_cursor = NotificationService.get_recent_feed(
+            limit=limit,
+            cursor=request.args.get('before')
+        )
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
     
-    return jsonify(notification_list)
+    response = jsonify(notification_list)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @notification_bp.route('/api/notifications', methods=['GET'])
+@notification_bp.route('/api/inbox', methods=['GET'])
 @login_required
 def get_notifications():
     """
-    Get notifications for the current user.
+    Get the current user's unified inbox of messages, notifications and broadcasts.
     
     Query parameters:
     - unread_only: boolean (default: false)
-    - limit: int (default: 20)
-    - offset: int (default: 0)
+    - limit: int (default: 20, max: 100)
+    - cursor: next_cursor from the previous page (optional)
+    - type: comma separated message types to include (optional)
+    - kind: comma separated sources to include: message, notification, broadcast (optional)
     
-    Returns JSON with notifications array.
+    Returns JSON with notifications array, next_cursor (null on the last page)
+    and unread counts by type.
     """
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-    limit = int(request.args.get('limit', 20))
-    offset = int(request.args.get('offset', 0))
-    
-    notifications = NotificationService.get_user_notifications(
-        current_user.id, 
-        unread_only=unread_only,
-        limit=limit,
-        offset=offset
-    )
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    message_types = [value for value in request.args.get('type', '').split(',') if value] or None
+    kinds = [value for value in request.args.get('kind', '').split(',') if value] or None
+    
+    if kinds and any(kind not in InboxService.KINDS for kind in kinds):
+        return jsonify({'success': False, 'message': 'Invalid kind'}), 400
+    
+    try:
+        notifications, next_cursor = InboxService.get_page(
+            current_user.id, 
+            unread_only=unread_only,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            message_types=message_types,
+            kinds=kinds
+        )
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
     
     # Convert notifications to dictionary format for JSON response
-    notifications_data = []
-    for notification in notifications:
-        notifications_data.append({
-            'id': notification.id,
-            'content': notification.content,
-            'sender_id': notification.sender_id,
-            'created_at': notification.created_at.isoformat(),
-            'is_read': notification.is_read,
-            'message_type': notification.message_type
-        })
+    notifications_data = [notification.to_dict() for notification in notifications]
+    
+    unread_counts = InboxService.get_unread_counts(current_user.id)
     
     return jsonify({
         'success': True,
         'notifications': notifications_data,
-        'total_unread': NotificationService.get_unread_count(current_user.id)
+        'next_cursor': next_cursor,
+        'total_unread': sum(unread_counts.values()),
+        'unread_counts': unread_counts
     })
 
+@notification_bp.route('/api/notifications/stream', methods=['GET'])
+@login_required
+def notification_stream():
+    """
+    Stream live inbox updates as Server-Sent Events.
+    
+    Events:
+    - message / notification: a new item for the current user
+    - read: items were marked as read in another tab
+    - unread: current unread counts, sent after every batch of events
+    
+    A comment line is sent as a heartbeat when nothing happens. Clients resume
+    with the Last-Event-ID header (sent automatically by EventSource on
+    reconnect) or the last_event_id query parameter. The connection is closed
+    after NOTIFICATION_STREAM_MAX_SECONDS so the client reconnects.
+    """
+    user_id = current_user.id
+    channels = NotificationService.get_event_channels(user_id)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    heartbeat = current_app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    max_seconds = current_app.config.get('NOTIFICATION_STREAM_MAX_SECONDS', 300)
+    bus = get_event_bus()
+    # 释放数据库连接，流在大部分时间里只是等待事件
+    db.session.remove()
+    
+    def format_event(event_type, data, event_id=None):
+        lines = []
+        if event_id:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event_type}')
+        lines.append(f'data: {json.dumps(data)}')
+        return '\n'.join(lines) + '\n\n'
+    
+    def generate():
+        nonlocal last_event_id
+        # 固定起点，避免在两次等待之间发布的事件被跳过
+        last_event_id = last_event_id or bus.last_event_id() or '0'
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events = bus.listen(channels, last_event_id, timeout=heartbeat)
+            if not events:
+                yield ': heartbeat\n\n'
+                continue
+            delivered = False
+            try:
+                for item in events:
+                    last_event_id = item.id
+                    data = item.data
+                    # 分批写入的事件只转发给这一批的收件人
+                    if isinstance(data, dict) and 'recipients' in data:
+                        if not InboxService.received_batch(user_id, data['recipients']):
+                            continue
+                        data = {key: value for key, value in data.items() if key != 'recipients'}
+                    delivered = True
+                    yield format_event(item.type, data, item.id)
+                if delivered:
+                    yield format_event('unread', NotificationService.get_unread_counts(user_id))
+            finally:
+                db.session.remove()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @notification_bp.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 @login_required
 def mark_notification_read(notification_id):
@@ -218,16 +286,83 @@ def mark_notification_read(notification_id):
     
     Parameters:
     - notification_id: ID of the notification to mark as read
+    - kind: 'message' (default), 'notification' or 'broadcast', as returned by /api/notifications
     
     Returns JSON with success status.
     """
-    success = NotificationService.mark_as_read(notification_id, current_user.id)
+    kind = request.args.get('kind', 'message')
+    if kind not in InboxService.KINDS:
+        return jsonify({'success': False, 'message': 'Invalid kind'}), 400
+    
+    success = NotificationService.mark_as_read(notification_id, current_user.id, kind)
     
     return jsonify({
         'success': success,
         'total_unread': NotificationService.get_unread_count(current_user.id)
     })
 
+@notification_bp.route('/api/notifications/read-all', methods=['POST'])
+@login_required
+def mark_all_notifications_read():
+    """
+    Mark the current user's whole inbox, or part of it, as read.
+    
+    Optional JSON payload:
+    - message_type: Only mark items of this type
+    - before: Only mark items older than this cursor (a next_cursor from /api/notifications)
+    
+    Returns JSON with the new unread counts.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        unread_counts = NotificationService.mark_many_as_read(
+            current_user.id,
+            message_type=data.get('message_type'),
+            before=data.get('before')
+        )
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    return _bulk_read_response(unread_counts)
+
+@notification_bp.route('/api/notifications/read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    """
+    Mark a list of inbox items as read.
+    
+    This endpoint requires a JSON payload with:
+    - items: Array of {kind, id} as returned by /api/notifications
+    
+    Returns JSON with the new unread counts.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    
+    try:
+        items = [(item['kind'], int(item['id'])) for item in items]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'items must be a list of {kind, id}'}), 400
+    
+    if not items:
+        return jsonify({'success': False, 'message': 'items must not be empty'}), 400
+    if len(items) > 1000:
+        return jsonify({'success': False, 'message': 'At most 1000 items can be marked at once'}), 400
+    
+    unread_counts = NotificationService.mark_many_as_read(current_user.id, items=items)
+    return _bulk_read_response(unread_counts)
+
+def _bulk_read_response(unread_counts):
+    if unread_counts is None:
+        return jsonify({'success': False, 'message': 'Failed to mark notifications as read'}), 500
+    
+    return jsonify({
+        'success': True,
+        'total_unread': sum(unread_counts.values()),
+        'unread_counts': unread_counts
+    })
+
 @notification_bp.route('/api/notifications/send', methods=['POST'])
 @login_required
 def send_notification():
@@ -237,8 +372,13 @@ def send_notification():
     This endpoint requires a JSON payload with:
     - receiver_ids: Array of user IDs (optional if squad_id is provided)
     - squad_id: ID of the squad to send notification to (optional if receiver_ids is provided)
+    - send_to_coaches / send_to_all: Send to all coaches / all users
+      (send_to_all only supports broadcast delivery)
+    - segment: Audience filters (see /api/notifications/segments/preview)
     - content: Notification content
     - message_type: Type of message (training, match, personal, announcement)
+    - delivery: 'broadcast' (default) stores one row for the audience,
+      'fanout' writes one message per recipient in the background
     
     Returns JSON with success status.
     """
@@ -260,27 +400,83 @@ def send_notification():
             'message': 'Content is required'
         }), 400
     
+    delivery = data.get('delivery', 'broadcast')
+    if delivery not in ('broadcast', 'fanout'):
+        return jsonify({
+            'success': False,
+            'message': "delivery must be 'broadcast' or 'fanout'"
+        }), 400
+    
+    squad_id = None
+    if 'squad_id' in data:
+        try:
+            squad_id = int(data['squad_id'])
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'squad_id must be an integer'
+            }), 400
+    
+    # Send to a segment in the background
+    if 'segment' in data:
+        try:
+            segment = Segment.from_dict(data['segment'] or {})
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        job = NotificationService.queue_notification_to_segment(
+            assistant.id, segment, content, message_type, data.get('title')
+        )
+        return jsonify({
+            'success': True,
+            'message': 'Notification is being sent',
+            'job': FanoutService.job_status(job),
+            'status_url': url_for('notification.get_notification_job', job_id=job.id)
+        }), 202
     # Send to specific receivers
-    if 'receiver_ids' in data:
+    elif 'receiver_ids' in data:
         receiver_ids = data['receiver_ids']
         success = NotificationService.send_notification(
             assistant.id, receiver_ids, content, message_type
         )
-    # Send to a squad
-    elif 'squad_id' in data:
-        squad_id = data['squad_id']
-        success = NotificationService.send_notification_to_squad(
-            assistant.id, squad_id, content, message_type
-        )
-    # Send to all coaches
-    elif data.get('send_to_coaches', False):
-        success = NotificationService.send_notification_to_coaches(
-            assistant.id, content, message_type
+    # Send to a squad, all coaches or everyone as a single broadcast
+    elif delivery == 'broadcast' and (
+            squad_id is not None or data.get('send_to_coaches', False) or data.get('send_to_all', False)):
+        if squad_id is not None:
+            audience_type, audience_value = 'squad', squad_id
+        elif data.get('send_to_all', False):
+            audience_type, audience_value = 'all', ''
+        else:
+            audience_type, audience_value = 'role', 'coach'
+        broadcast = NotificationService.send_broadcast(
+            assistant.id, audience_type, content, message_type, audience_value=audience_value
         )
+        success = broadcast is not None
+    # 全体用户只存一条广播，不逐人写入
+    elif squad_id is None and data.get('send_to_all', False):
+        return jsonify({
+            'success': False,
+            'message': "send_to_all only supports 'broadcast' delivery"
+        }), 400
+    # Send to a squad or to all coaches in the background
+    elif squad_id is not None or data.get('send_to_coaches', False):
+        if squad_id is not None:
+            job = NotificationService.queue_notification_to_squad(
+                assistant.id, squad_id, content, message_type
+            )
+        else:
+            job = NotificationService.queue_notification_to_coaches(
+                assistant.id, content, message_type
+            )
+        return jsonify({
+            'success': True,
+            'message': 'Notification is being sent',
+            'job': FanoutService.job_status(job),
+            'status_url': url_for('notification.get_notification_job', job_id=job.id)
+        }), 202
     else:
         return jsonify({
             'success': False,
-            'message': 'Either receiver_ids, squad_id, or send_to_coaches must be provided'
+            'message': 'Either receiver_ids, squad_id, segment, send_to_coaches or send_to_all must be provided'
         }), 400
     
     return jsonify({
@@ -288,6 +484,82 @@ def send_notification():
         'message': 'Notification sent successfully' if success else 'Failed to send notification'
     })
 
+@notification_bp.route('/api/notifications/segments/preview', methods=['POST'])
+@login_required
+def preview_segment():
+    """
+    Count the recipients of a segment without sending anything.
+    
+    This endpoint accepts a JSON payload with any of:
+    - roles: Array of user types
+    - squad_ids: Array of squad IDs
+    - member_kind: 'junior' or 'adult'
+    - positions: Array of positions
+    - min_age / max_age: Age range in years
+    - consent: 'signed' or 'missing' (junior consent)
+    - missed_training_days: Players not present at their squad's training in this many days
+    
+    Returns JSON with the recipient count.
+    """
+    assistant = MemberAssistant.query.filter_by(user_id=current_user.id).first()
+    if not assistant or current_user.user_type == 'schedule_assistant':
+        return jsonify({
+            'success': False,
+            'message': 'Only member assistants can send notifications'
+        }), 403
+    
+    try:
+        segment = Segment.from_dict(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'count': SegmentService.count(segment)
+    })
+
+@notification_bp.route('/api/notifications/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_notification_job(job_id):
+    """
+    Get the progress of a background notification send.
+    
+    Returns JSON with the job status and the number of messages written so far.
+    """
+    assistant = MemberAssistant.query.filter_by(user_id=current_user.id).first()
+    if not assistant and current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    job = FanoutService.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    return jsonify({'success': True, 'job': FanoutService.job_status(job)})
+
+
+@notification_bp.route('/api/notifications/jobs/<job_id>/retry', methods=['POST'])
+@login_required
+def retry_notification_job(job_id):
+    """
+    Resume a failed or stalled background notification send after the last
+    recipient it reached. A send is stalled when the worker running it stopped
+    (see FANOUT_JOB_STALE_SECONDS).
+    
+    Returns JSON with the restarted job.
+    """
+    assistant = MemberAssistant.query.filter_by(user_id=current_user.id).first()
+    if not assistant and current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    if not FanoutService.get_job(job_id):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    job = FanoutService.retry_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Only failed or stalled jobs can be retried'}), 409
+    
+    return jsonify({'success': True, 'job': FanoutService.job_status(job)}), 202
+
 
 @notification_bp.route('/api/form/notifications/send', methods=['POST'])
 @login_required
@@ -296,7 +568,9 @@ def send_notification_form():
     Send a notification via form submission.
     
     This endpoint handles form data with:
-    - target_type: Type of receivers (all, coaches, etc.)
+    - target_type: Type of receivers (all, coaches, squad, segment)
+    - roles, squad_ids, member_kind, positions, min_age, max_age, consent,
+      missed_training_days: Segment filters when target_type is segment
     - content: Notification content
     - message_type: Type of message
     - title: Notification title (optional)
@@ -304,8 +578,7 @@ def send_notification_form():
     Redirects to the notification view with a flash message.
     """
     # 记录请求调试信息
-    app.logger.debug(f"Form Data: {request.form}")
-    app.logger.debug(f"Headers: {request.headers}")
+    current_app.logger.debug("Notification form submitted", extra={'fields': sorted(request.form)})
     
     # 检查用户权限
     assistant = MemberAssistant.query.filter_by(user_id=current_user.id).first()
@@ -324,27 +597,47 @@ def send_notification_form():
         flash('内容不能为空', 'danger')
         return redirect(url_for('notification.send_notification_view', error='内容不能为空'))
     
-    success = False
-    
-    # 根据目标类型发送通知
+    # 根据目标类型发送通知，群发只写入一条广播记录
     if target_type == 'all':
-        # 发送给所有用户的逻辑
-        # 这里简化为只发送给所有教练
-        success = NotificationService.send_notification_to_coaches(
-            assistant.id, content, message_type, title
+        broadcast = NotificationService.send_broadcast(
+            assistant.id, 'all', content, message_type, title
         )
     elif target_type == 'coaches':
         # 发送给所有教练
-        success = NotificationService.send_notification_to_coaches(
-            assistant.id, content, message_type, title
+        broadcast = NotificationService.send_broadcast(
+            assistant.id, 'role', content, message_type, title, audience_value='coach'
+        )
+    elif target_type == 'segment':
+        # 按条件筛选的目标人群，在后台分批写入
+        try:
+            segment = Segment.from_dict({
+                'roles': request.form.getlist('roles'),
+                'squad_ids': request.form.getlist('squad_ids'),
+                'member_kind': request.form.get('member_kind'),
+                'positions': request.form.getlist('positions'),
+                'min_age': request.form.get('min_age'),
+                'max_age': request.form.get('max_age'),
+                'consent': request.form.get('consent'),
+                'missed_training_days': request.form.get('missed_training_days')
+            })
+        except ValueError as e:
+            flash(f'筛选条件无效: {str(e)}', 'danger')
+            return redirect(url_for('notification.send_notification_view', error='筛选条件无效'))
+        NotificationService.queue_notification_to_segment(
+            assistant.id, segment, content, message_type, title
         )
+        flash('通知正在后台发送', 'success')
+        return redirect(url_for('notification.notifications_view'))
     elif target_type == 'squad':
         # 发送给特定球队
-        squad_id = request.form.get('squad_id')
+        squad_id = request.form.get('squad_id', type=int)
         if squad_id:
-            success = NotificationService.send_notification_to_squad(
-                assistant.id, int(squad_id), content, message_type, title
+            broadcast = NotificationService.send_broadcast(
+                assistant.id, 'squad', content, message_type, title, audience_value=squad_id
             )
+        elif request.form.get('squad_id'):
+            flash('球队编号无效', 'danger')
+            return redirect(url_for('notification.send_notification_view', error='球队编号无效'))
         else:
             flash('请选择要发送的球队', 'danger')
             return redirect(url_for('notification.send_notification_view', error='未选择球队'))
@@ -352,7 +645,7 @@ def send_notification_form():
         flash('请选择有效的接收者类型', 'danger')
         return redirect(url_for('notification.send_notification_view', error='无效的接收者类型'))
     
-    if success:
+    if broadcast:
         flash('通知发送成功!', 'success')
     else:
         flash('通知发送失败，请稍后再试', 'danger')
@@ -366,17 +659,25 @@ def send_notification_form():
 def notifications_view():
     """
     Render the notifications page.
+    
+    Older pages are requested with ?cursor=<next_cursor>.
     """
-    notifications = NotificationService.get_user_notifications(
-        current_user.id, 
-        limit=50
-    )
+    try:
+        notifications, next_cursor = NotificationService.get_user_notifications(
+            current_user.id, 
+            limit=50,
+            cursor=request.args.get('cursor')
+        )
+    except InvalidCursor:
+        flash('Invalid page requested', 'warning')
+        return redirect(url_for('notification.notifications_view'))
     
     unread_count = NotificationService.get_unread_count(current_user.id)
     
     return render_template(
         'notifications/index.html',
         notifications=notifications,
+        next_cursor=next_cursor,
         unread_count=unread_count
     )
 
@@ -399,7 +700,7 @@ def send_notification_view():
     debug_info = None
     
     # 开发模式下显示调试信息
-    if app.debug:
+    if current_app.debug:
         debug_info = {
             'request_method': request.method,
             'form_data': dict(request.form) if request.method == 'POST' else None,
@@ -0,0 +1,234 @@
+"""
+Attendance service for Simply Rugby.
+This module provides attendance statistics and bulk attendance recording for training sessions.
+"""
+import logging
+from app import db
+from app.models.training_plan import TrainingPlan, TrainingSession, PlayerAttendance
+from app.models.squad import Squad
+from app.utils.pagination import InvalidCursor, encode_cursor, decode_cursor
+from app.utils.upsert import build_upsert, supports_upsert
+from sqlalchemy import and_, case, func, insert, or_
+from datetime import date, datetime
+
+
+logger = logging.getLogger(__name__)
+
+
+class AttendanceService:
+    """
+    Service for reading and recording training attendance.
+    """
+
+    # Attendance statuses that are counted separately
+    STATUSES = ('present', 'absent', 'excused')
+
+    # Training session statuses, used when the status column is not an Enum
+    SESSION_STATUSES = ('scheduled', 'completed', 'cancelled')
+
+    @staticmethod
+    def get_session_summaries(coach_user_id, cursor=None, limit=20):
+        """
+        Get attendance summaries of a coach's completed training sessions.
+
+        Counts for every session on the page are computed by one GROUP BY
+        query joined to the training plan and squad. Pages are ordered by
+        date (newest first) and use keyset pagination on (date, id).
+
+        Args:
+            coach_user_id (int): ID of the coach's user record
+            cursor (str, optional): Cursor returned with the previous page
+            limit (int): Maximum number of sessions to return
+
+        Returns:
+            tuple: (list of session summary dicts, next cursor or None)
+
+        Raises:
+            InvalidCursor: If cursor is malformed
+        """
+        status_counts = [
+            func.sum(case((PlayerAttendance.status == status, 1), else_=0))
+            for status in AttendanceService.STATUSES
+        ]
+
+        query = db.session.query(
+            TrainingSession.id,
+            TrainingSession.date,
+            TrainingSession.start_time,
+            TrainingSession.end_time,
+            TrainingPlan.title,
+            Squad.name,
+            func.count(PlayerAttendance.id),
+            *status_counts
+        ).join(
+            TrainingPlan, TrainingPlan.id == TrainingSession.training_plan_id
+        ).outerjoin(
+            Squad, Squad.id == TrainingPlan.squad_id
+        ).outerjoin(
+            PlayerAttendance, PlayerAttendance.session_id == TrainingSession.id
+        ).filter(
+            TrainingPlan.coach_id == coach_user_id,
+            TrainingSession.status == 'completed',
+            TrainingSession.date < datetime.now().date()
+        )
+
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, size=2)
+            if (not isinstance(last_date, date) or isinstance(last_date, datetime)
+                    or not isinstance(last_id, int) or isinstance(last_id, bool)):
+                raise InvalidCursor('Invalid pagination cursor')
+            query = query.filter(or_(
+                TrainingSession.date < last_date,
+                and_(TrainingSession.date == last_date, TrainingSession.id < last_id)
+            ))
+
+        rows = query.group_by(
+            TrainingSession.id,
+            TrainingSession.date,
+            TrainingSession.start_time,
+            TrainingSession.end_time,
+            TrainingPlan.title,
+            Squad.name
+        ).order_by(
+            TrainingSession.date.desc(),
+            TrainingSession.id.desc()
+        ).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        summaries = []
+        for session_id, session_date, start_time, end_time, plan_title, squad_name, total, present, absent, excused in rows:
+            total = total or 0
+            present, absent, excused = int(present or 0), int(absent or 0), int(excused or 0)
+            summaries.append({
+                'id': session_id,
+                'date': session_date,
+                'time': AttendanceService._format_time_range(start_time, end_time),
+                'plan_title': plan_title or 'Unknown',
+                'squad_name': squad_name or 'Unknown',
+                'total_players': total,
+                'present_count': present,
+                'absent_count': absent,
+                'excused_count': excused,
+                'attendance_rate': round(present / total * 100) if total > 0 else 0,
+                'absence_rate': round(absent / total * 100) if total > 0 else 0,
+                'excused_rate': round(excused / total * 100) if total > 0 else 0
+            })
+
+        next_cursor = None
+        if has_more and summaries:
+            next_cursor = encode_cursor(summaries[-1]['date'], summaries[-1]['id'])
+
+        return summaries, next_cursor
+
+    @staticmethod
+    def get_attendance_map(session_id):
+        """
+        Get the recorded attendance of a training session.
+
+        Args:
+            session_id (int): Training session ID
+
+        Returns:
+            dict: {player_id: PlayerAttendance}
+        """
+        records = PlayerAttendance.query.filter_by(session_id=session_id).all()
+        return {record.player_id: record for record in records}
+
+    @staticmethod
+    def session_statuses():
+        """Statuses a training session can be set to."""
+        enums = getattr(TrainingSession.__table__.c.status.type, 'enums', None)
+        return tuple(enums) if enums else AttendanceService.SESSION_STATUSES
+
+    @staticmethod
+    def record_register(session_id, entries, session_status=None):
+        """
+        Record attendance for many players of a session at once.
+
+        Existing rows are loaded with one query and unchanged rows skipped.
+        New and changed rows are written with one multi-row upsert on the
+        (session_id, player_id) unique key, so concurrent first submissions
+        of the same register cannot insert duplicates. Databases without
+        upsert support update the loaded rows through the ORM and insert
+        new rows with one multi-row insert.
+
+        Args:
+            session_id (int): Training session ID
+            entries (list): Dicts with player_id, status and optional notes
+            session_status (str, optional): New status of the session, saved
+                in the same transaction as the register
+
+        Returns:
+            dict: Counts of inserted, updated and unchanged rows, or None on failure
+
+        Raises:
+            ValueError: If session_status is not a valid session status
+        """
+        if session_status is not None and session_status not in AttendanceService.session_statuses():
+            raise ValueError(f'Invalid session status: {session_status}')
+
+        try:
+            existing = AttendanceService.get_attendance_map(session_id)
+            updates = []
+            inserts = []
+            unchanged = 0
+
+            # 同一球员出现多次时以最后一条为准，upsert 不能两次更新同一行
+            for entry in {entry['player_id']: entry for entry in entries}.values():
+                status = entry['status']
+                notes = entry.get('notes') or ''
+                row = {
+                    'player_id': entry['player_id'],
+                    'session_id': session_id,
+                    'status': status,
+                    'notes': notes
+                }
+                record = existing.get(entry['player_id'])
+                if record is None:
+                    inserts.append(row)
+                elif record.status != status or (record.notes or '') != notes:
+                    updates.append(row)
+                else:
+                    unchanged += 1
+
+            if session_status is not None:
+                # 通过 ORM 修改，日历和 iCal 缓存的失效钩子才会触发
+                db.session.get(TrainingSession, session_id).status = session_status
+
+            table = PlayerAttendance.__table__
+            if not supports_upsert(db.session):
+                # 不支持 upsert 的数据库直接更新已加载的记录
+                for update in updates:
+                    record = existing[update['player_id']]
+                    record.status = update['status']
+                    record.notes = update['notes']
+                if inserts:
+                    db.session.execute(insert(table).values(inserts))
+            elif updates or inserts:
+                db.session.execute(build_upsert(
+                    db.session, table, ['session_id', 'player_id'],
+                    lambda incoming, target: {
+                        'status': incoming.status,
+                        'notes': incoming.notes
+                    },
+                    values=inserts + updates
+                ))
+
+            db.session.commit()
+            return {
+                'inserted': len(inserts),
+                'updated': len(updates),
+                'unchanged': unchanged
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error recording attendance: %s", e)
+            return None
+
+    @staticmethod
+    def _format_time_range(start_time, end_time):
+        if not start_time or not end_time:
+            return 'TBD'
+        return f"{start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}"
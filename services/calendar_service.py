@@ -0,0 +1,320 @@
+"""
+Calendar service for Simply Rugby.
+This module merges games, training sessions and venue bookings into per-day calendar buckets.
+"""
+import calendar
+import copy
+import logging
+from collections import namedtuple, OrderedDict
+from flask import current_app, has_app_context
+from app import db
+from app.models.game import Game
+from app.models.venue import Venue, VenueBooking
+from app.models.squad import Squad
+from app.models.season import Season
+from app.models.training_plan import TrainingPlan, TrainingSession
+from app.utils.cache import TTLCache, bump_versions, get_versions
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from datetime import date, timedelta
+
+
+logger = logging.getLogger(__name__)
+
+# Lightweight, read-only calendar entry; type is 'game', 'training' or 'booking'
+CalendarEvent = namedtuple('CalendarEvent', [
+    'type',
+    'id',
+    'date',
+    'start_time',
+    'end_time',
+    'title',
+    'location',
+    'squad_id',
+    'squad_name',
+    'venue_id',
+    'venue_name',
+    'status'
+])
+
+# Rendered month grids, keyed by versions (see get_versions) so changes make old
+# entries unreachable: 'calendar:<year>-<month>' for the events of a month and
+# 'calendar:names' for squad and venue names, which appear in every month.
+_month_cache = TTLCache('calendar_months', ttl=300, max_entries=2000)
+_NAMES_FIELD = 'calendar:names'
+
+
+def _month_field(year, month):
+    return f'calendar:{year}-{month:02d}'
+
+
+class CalendarService:
+    """
+    Service for reading the club calendar.
+    """
+
+    @staticmethod
+    def month_range(year, month):
+        """Return the first and last day of a month."""
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+    @staticmethod
+    def week_range(day):
+        """Return the Monday and Sunday of the week containing day."""
+        monday = day - timedelta(days=day.weekday())
+        return monday, monday + timedelta(days=6)
+
+    @staticmethod
+    def season_range(season_id):
+        """
+        Return the first and last day of a season.
+
+        Returns:
+            tuple: (start date, end date), or None if the season does not exist
+        """
+        row = db.session.query(Season.start_date, Season.end_date).filter(Season.id == season_id).first()
+        return (row.start_date, row.end_date) if row else None
+
+    @staticmethod
+    def get_events(start, end, squad_ids=None, venue_ids=None, kinds=None):
+        """
+        Get all calendar events between two dates.
+
+        Each event source is read with one range query on its date index,
+        selecting only the columns the calendar shows.
+
+        Args:
+            start (date): First day (inclusive)
+            end (date): Last day (inclusive)
+            squad_ids (list, optional): Only events of these squads
+            venue_ids (list, optional): Only events at these venues; training
+                sessions have no venue and are left out when this is set
+            kinds (list, optional): Only these sources ('game', 'training', 'booking')
+
+        Returns:
+            list: CalendarEvent rows ordered by date and start time
+        """
+        kinds = kinds or ('game', 'training', 'booking')
+        events = []
+
+        if 'game' in kinds:
+            games = db.session.query(
+                Game.id, Game.match_date, Game.kickoff_time, Game.opponent, Game.location,
+                Game.squad_id, Squad.name, Game.venue_id, Venue.name, Game.result
+            ).outerjoin(
+                Squad, Squad.id == Game.squad_id
+            ).outerjoin(
+                Venue, Venue.id == Game.venue_id
+            ).filter(
+                Game.match_date >= start,
+                Game.match_date <= end
+            )
+            if squad_ids:
+                games = games.filter(Game.squad_id.in_(squad_ids))
+            if venue_ids:
+                games = games.filter(Game.venue_id.in_(venue_ids))
+
+            for game_id, match_date, kickoff, opponent, location, squad_id, squad_name, venue_id, venue_name, result in games:
+                events.append(CalendarEvent(
+                    'game', game_id, match_date, kickoff, None, f"vs {opponent}", location,
+                    squad_id, squad_name, venue_id, venue_name, result
+                ))
+
+        if 'training' in kinds and not venue_ids:
+            sessions = db.session.query(
+                TrainingSession.id, TrainingSession.date, TrainingSession.start_time, TrainingSession.end_time,
+                TrainingPlan.title, TrainingPlan.squad_id, Squad.name, TrainingSession.status
+            ).join(
+                TrainingPlan, TrainingPlan.id == TrainingSession.training_plan_id
+            ).outerjoin(
+                Squad, Squad.id == TrainingPlan.squad_id
+            ).filter(
+                TrainingSession.date >= start,
+                TrainingSession.date <= end
+            )
+            if squad_ids:
+                sessions = sessions.filter(TrainingPlan.squad_id.in_(squad_ids))
+
+            for session_id, session_date, start_time, end_time, plan_title, squad_id, squad_name, status in sessions:
+                events.append(CalendarEvent(
+                    'training', session_id, session_date, start_time, end_time, plan_title or 'Training',
+                    None, squad_id, squad_name, None, None, status
+                ))
+
+        if 'booking' in kinds:
+            bookings = db.session.query(
+                VenueBooking.id, VenueBooking.date, VenueBooking.start_time, VenueBooking.end_time,
+                VenueBooking.title, VenueBooking.squad_id, Squad.name, VenueBooking.venue_id, Venue.name
+            ).join(
+                Venue, Venue.id == VenueBooking.venue_id
+            ).outerjoin(
+                Squad, Squad.id == VenueBooking.squad_id
+            ).filter(
+                VenueBooking.date >= start,
+                VenueBooking.date <= end
+            )
+            if squad_ids:
+                bookings = bookings.filter(VenueBooking.squad_id.in_(squad_ids))
+            if venue_ids:
+                bookings = bookings.filter(VenueBooking.venue_id.in_(venue_ids))
+
+            for booking_id, booking_date, start_time, end_time, title, squad_id, squad_name, venue_id, venue_name in bookings:
+                events.append(CalendarEvent(
+                    'booking', booking_id, booking_date, start_time, end_time, title, None,
+                    squad_id, squad_name, venue_id, venue_name, None
+                ))
+
+        events.sort(key=lambda item: (item.date, item.start_time is None, item.start_time or 0, item.type, item.id))
+        return events
+
+    @staticmethod
+    def to_dict(event):
+        """Serialize a CalendarEvent for templates and JSON."""
+        return {
+            'type': event.type,
+            'id': event.id,
+            'date': event.date.isoformat(),
+            'title': event.title,
+            'location': event.location or event.venue_name,
+            'time': event.start_time.strftime('%H:%M') if event.start_time else 'TBD',
+            'start_time': event.start_time.strftime('%H:%M') if event.start_time else None,
+            'end_time': event.end_time.strftime('%H:%M') if event.end_time else None,
+            'squad_id': event.squad_id,
+            'squad_name': event.squad_name,
+            'venue_id': event.venue_id,
+            'venue_name': event.venue_name,
+            'status': event.status
+        }
+
+    @staticmethod
+    def get_day_buckets(start, end, squad_ids=None, venue_ids=None):
+        """
+        Get calendar events between two dates grouped by day.
+
+        Returns:
+            OrderedDict: {date: [event dict]} with an entry for every day in the range
+        """
+        buckets = OrderedDict()
+        day = start
+        while day <= end:
+            buckets[day] = []
+            day += timedelta(days=1)
+
+        for item in CalendarService.get_events(start, end, squad_ids, venue_ids):
+            buckets[item.date].append(CalendarService.to_dict(item))
+        return buckets
+
+    @staticmethod
+    def get_month(year, month, squad_ids=None, venue_ids=None):
+        """
+        Get the month grid used by the assistant calendar page.
+
+        Grids are cached per month and filter, and dropped once a game,
+        training session or booking in that month, the title of a training
+        plan with sessions in it, or a squad or venue name changes.
+
+        Returns:
+            dict: calendar (weeks of day numbers), events ({day: [event dict]}),
+                month_name, month and year; a copy the caller may modify
+        """
+        versions = get_versions([_month_field(year, month), _NAMES_FIELD])
+        key = (year, month, versions, tuple(sorted(squad_ids or ())), tuple(sorted(venue_ids or ())))
+
+        grid = _month_cache.get(key)
+        if grid is not None:
+            return copy.deepcopy(grid)
+
+        first_day, last_day = CalendarService.month_range(year, month)
+        events = {}
+        for item in CalendarService.get_events(first_day, last_day, squad_ids, venue_ids):
+            events.setdefault(item.date.day, []).append(CalendarService.to_dict(item))
+
+        grid = {
+            'calendar': calendar.monthcalendar(year, month),
+            'events': events,
+            'month_name': calendar.month_name[month],
+            'month': month,
+            'year': year
+        }
+        ttl = current_app.config.get('CALENDAR_CACHE_TTL') if has_app_context() else None
+        _month_cache.set(key, grid, ttl=ttl)
+        return copy.deepcopy(grid)
+
+    @staticmethod
+    def invalidate_dates(dates):
+        """Drop cached month grids containing any of the dates."""
+        bump_versions({_month_field(day.year, day.month) for day in dates if day is not None})
+
+    @staticmethod
+    def invalidate_names():
+        """Drop every cached month grid after a squad or venue is renamed."""
+        bump_versions([_NAMES_FIELD])
+
+    @staticmethod
+    def invalidate_after_commit(session, dates):
+        """
+        Drop cached month grids for the dates once the session commits.
+
+        Use this for bulk writes that bypass ORM events.
+        """
+        session.info.setdefault('calendar_changed_dates', set()).update(
+            day for day in dates if day is not None)
+
+
+def _changed_dates(target, attribute):
+    history = get_history(target, attribute)
+    return set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+
+
+def _record_change(attribute):
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            CalendarService.invalidate_after_commit(session, _changed_dates(target, attribute))
+    return listener
+
+
+def _plan_changed(mapper, connection, target):
+    # 计划的标题和球队显示在其每一次训练上
+    session = object_session(target)
+    if session is None or not (get_history(target, 'title').has_changes()
+                               or get_history(target, 'squad_id').has_changes()):
+        return
+    dates = connection.execute(
+        select(TrainingSession.date).where(TrainingSession.training_plan_id == target.id).distinct()
+    ).scalars().all()
+    CalendarService.invalidate_after_commit(session, dates)
+
+
+def _renamed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and get_history(target, 'name').has_changes():
+        session.info['calendar_names_changed'] = True
+
+
+for _model, _attribute in ((Game, 'match_date'), (TrainingSession, 'date'), (VenueBooking, 'date')):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _record_change(_attribute))
+event.listen(TrainingPlan, 'after_update', _plan_changed)
+event.listen(Squad, 'after_update', _renamed)
+event.listen(Venue, 'after_update', _renamed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_months(session):
+    dates = session.info.pop('calendar_changed_dates', None)
+    names_changed = session.info.pop('calendar_names_changed', False)
+    try:
+        if dates:
+            CalendarService.invalidate_dates(dates)
+        if names_changed:
+            CalendarService.invalidate_names()
+    except Exception as e:
+        logger.error("Error invalidating calendar months: %s", e)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_changed_months(session):
+    session.info.pop('calendar_changed_dates', None)
+    session.info.pop('calendar_names_changed', None)
@@ -0,0 +1,145 @@
+"""
+Coach access service for Simply Rugby.
+This module resolves which squads a coach may view and manage.
+"""
+from flask import current_app, g, has_app_context
+from app import db
+from app.models.coach import Coach
+from app.models.training_plan import TrainingPlan
+from app.utils.cache import TTLCache
+from sqlalchemy import event, select, union
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+
+
+# Squad IDs per coach user, shared by requests in this worker
+_access_cache = TTLCache('coach_squad_access', ttl=60)
+
+
+class CoachAccessService:
+    """
+    Service for checking coach access to squads.
+
+    A coach can access the squad they are directly associated with through
+    the Coach model and every squad they have a TrainingPlan for.
+    """
+
+    @staticmethod
+    def get_accessible_squad_ids(user_id):
+        """
+        Get all squad IDs a coach user can access.
+
+        The set is loaded with one query, memoized for the current request
+        and kept in a short-TTL cache keyed by user.
+
+        Args:
+            user_id (int): ID of the coach's user record
+
+        Returns:
+            frozenset: Squad IDs
+        """
+        request_memo = g.setdefault('coach_squad_ids', {}) if has_app_context() else {}
+        if user_id in request_memo:
+            return request_memo[user_id]
+
+        squad_ids = _access_cache.get(user_id)
+        if squad_ids is None:
+            squad_ids = CoachAccessService._load_squad_ids(user_id)
+            ttl = current_app.config.get('COACH_ACCESS_CACHE_TTL') if has_app_context() else None
+            _access_cache.set(user_id, squad_ids, ttl=ttl)
+
+        request_memo[user_id] = squad_ids
+        return squad_ids
+
+    @staticmethod
+    def can_access_squad(user_id, squad_id):
+        """
+        Check whether a coach user can access a squad.
+
+        Args:
+            user_id (int): ID of the coach's user record
+            squad_id (int): Squad ID (None is never accessible)
+
+        Returns:
+            bool: True if the coach manages the squad
+        """
+        if squad_id is None:
+            return False
+        return squad_id in CoachAccessService.get_accessible_squad_ids(user_id)
+
+    @staticmethod
+    def invalidate(user_id):
+        """
+        Drop the cached squad IDs for a coach user.
+
+        Args:
+            user_id (int): ID of the coach's user record
+        """
+        if user_id is None:
+            return
+        _access_cache.delete(user_id)
+        if has_app_context():
+            g.get('coach_squad_ids', {}).pop(user_id, None)
+
+    @staticmethod
+    def _load_squad_ids(user_id):
+        direct = select(Coach.squad_id).where(
+            Coach.user_id == user_id,
+            Coach.squad_id.isnot(None)
+        )
+        planned = select(TrainingPlan.squad_id).where(
+            TrainingPlan.coach_id == user_id,
+            TrainingPlan.squad_id.isnot(None)
+        )
+        rows = db.session.execute(union(direct, planned)).fetchall()
+        return frozenset(row[0] for row in rows)
+
+
+    @staticmethod
+    def invalidate_after_commit(session, user_ids):
+        """
+        Drop the cached squad IDs for coach users once the session commits.
+
+        Invalidating at flush time would let a concurrent request reload
+        the old rows and cache them again before the commit is visible.
+
+        Args:
+            session: SQLAlchemy session holding the change
+            user_ids (iterable): IDs of the coaches' user records
+        """
+        session.info.setdefault('coach_access_changed_users', set()).update(
+            user_id for user_id in user_ids if user_id is not None)
+
+
+def _record_owners(target, owner_attr):
+    """Queue the current and previous owner of a changed row."""
+    session = object_session(target)
+    if session is not None:
+        owners = [getattr(target, owner_attr)] + list(get_history(target, owner_attr).deleted)
+        CoachAccessService.invalidate_after_commit(session, owners)
+
+
+@event.listens_for(Coach, 'after_insert')
+@event.listens_for(Coach, 'after_update')
+@event.listens_for(Coach, 'after_delete')
+def _coach_changed(mapper, connection, target):
+    _record_owners(target, 'user_id')
+
+
+@event.listens_for(TrainingPlan, 'after_insert')
+@event.listens_for(TrainingPlan, 'after_update')
+@event.listens_for(TrainingPlan, 'after_delete')
+def _training_plan_changed(mapper, connection, target):
+    # TrainingPlan.coach_id stores the coach's user ID
+    _record_owners(target, 'coach_id')
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_coaches(session):
+    for user_id in session.info.pop('coach_access_changed_users', ()):
+        CoachAccessService.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_changed_coaches(session):
+    session.info.pop('coach_access_changed_users', None)
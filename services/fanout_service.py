@@ -0,0 +1,361 @@
+"""
+Fan-out service for Simply Rugby.
+This module writes one Message row per recipient for large audiences using
+keyset-batched INSERT ... SELECT statements, optionally as a background job.
+"""
+import logging
+import threading
+import uuid
+from app import db
+from app.models.fanout_job import FanoutJob
+from app.models.message import Message
+from app.models.player import Player
+from app.models.junior_player import JuniorPlayer
+from app.models.coach import Coach
+from app.services.inbox_service import fanout_channel
+from app.services.segment_service import Segment, SegmentService
+from app.services.unread_counter_service import UnreadCounterService
+from app.utils.events import get_event_bus
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func, insert, literal, or_, select, union, update
+from datetime import date, datetime, timedelta
+
+
+logger = logging.getLogger(__name__)
+
+
+class FanoutService:
+    """
+    Service for fanning a message out to many recipients.
+    """
+
+    # Number of recipients written by one INSERT ... SELECT
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def squad_audience(squad_id):
+        """
+        Build a SELECT of the user IDs of all players and junior players in a squad.
+
+        Returns:
+            Select: Query with a single user_id column
+        """
+        players = select(Player.user_id.label('user_id')).where(Player.squad_id == squad_id)
+        juniors = select(JuniorPlayer.user_id.label('user_id')).where(JuniorPlayer.squad_id == squad_id)
+        return union(players, juniors)
+
+    @staticmethod
+    def coach_audience():
+        """
+        Build a SELECT of the user IDs of all coaches.
+
+        Returns:
+            Select: Query with a single user_id column
+        """
+        return select(Coach.user_id.label('user_id')).distinct()
+
+    @staticmethod
+    def write_messages(audience, sender_id, content, message_type='announcement', title=None,
+                       chunk_size=None, job=None, channel=None, notify_batches=False):
+        """
+        Write one Message per audience member with keyset-batched INSERT ... SELECT.
+
+        Each batch covers the next chunk_size recipients by user ID
+        (user_id > last ORDER BY user_id LIMIT chunk_size) and is committed on
+        its own together with the recipients' unread counters, so no single
+        transaction holds locks for the whole audience and recipient IDs are
+        never loaded into Python. The last user ID written is committed on
+        the job with each batch; a job that already has one resumes after it.
+
+        Args:
+            audience (Select): Query with a single user_id column
+            sender_id (int): ID of the sender (MemberAssistant)
+            content (str): Message content
+            message_type (str): Type of message
+            title (str, optional): Message title
+            chunk_size (int, optional): Recipients per batch
+            job (FanoutJob, optional): Job to report progress to and resume from
+            channel (str, optional): Event channel notified once all batches are written;
+                it must reach exactly the audience
+            notify_batches (bool): Instead, publish one event per batch on the
+                fan-out channel after it commits, naming the batch's user ID range
+
+        Returns:
+            int: Number of messages written by this call
+        """
+        chunk_size = chunk_size or FanoutService.CHUNK_SIZE
+        recipients = audience.subquery()
+        last_user_id = job.last_user_id if job is not None else None
+
+        if job is not None and job.total is None:
+            job.total = db.session.execute(select(func.count()).select_from(recipients)).scalar()
+
+        # 重试的批次与之前的批次使用同一发送时间
+        created_at = job.created_at if job is not None else datetime.utcnow()
+        columns = ['sender_id', 'receiver_id', 'title', 'content', 'message_type', 'created_at', 'is_read']
+        written = 0
+
+        while True:
+            # 以上一批最后的 user_id 为起点，取下一批的边界
+            remaining = select(recipients.c.user_id).where(recipients.c.user_id.isnot(None))
+            if last_user_id is not None:
+                remaining = remaining.where(recipients.c.user_id > last_user_id)
+            batch = remaining.order_by(recipients.c.user_id).limit(chunk_size).subquery()
+            batch_last = db.session.execute(select(func.max(batch.c.user_id))).scalar()
+            if batch_last is None:
+                break
+
+            in_batch = [recipients.c.user_id <= batch_last]
+            if last_user_id is not None:
+                in_batch.append(recipients.c.user_id > last_user_id)
+            rows = select(
+                literal(sender_id),
+                recipients.c.user_id,
+                literal(title),
+                literal(content),
+                literal(message_type),
+                literal(created_at),
+                literal(False)
+            ).where(*in_batch)
+            try:
+                result = db.session.execute(insert(Message.__table__).from_select(columns, rows))
+                UnreadCounterService.increment_from_select(
+                    select(recipients.c.user_id).where(*in_batch), message_type)
+                if job is not None:
+                    # 进度与这一批消息在同一事务中提交，重试时从这里继续
+                    job.last_user_id = batch_last
+                    job.written += max(result.rowcount, 0)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            if notify_batches:
+                # 每批只发布一个事件，由各用户的事件流判断自己是否在这一批中
+                event_data = FanoutService._event_data(title, content, message_type, created_at)
+                event_data['recipients'] = {
+                    'sender_id': sender_id,
+                    'created_at': created_at.isoformat(),
+                    'after': last_user_id,
+                    'through': batch_last
+                }
+                get_event_bus().publish(fanout_channel(), 'message', event_data)
+
+            last_user_id = batch_last
+            written += max(result.rowcount, 0)
+
+        if channel and written:
+            get_event_bus().publish(channel, 'message', FanoutService._event_data(
+                title, content, message_type, created_at))
+        return written
+
+    @staticmethod
+    def _event_data(title, content, message_type, created_at):
+        return {
+            'kind': 'message',
+            'title': title,
+            'content': content,
+            'message_type': message_type,
+            'created_at': created_at.isoformat()
+        }
+
+    @staticmethod
+    def squad_job_audience(squad_id):
+        """Audience definition of a squad, stored on fan-out jobs."""
+        return {'type': 'squad', 'squad_id': int(squad_id)}
+
+    @staticmethod
+    def coach_job_audience():
+        """Audience definition of all coaches, stored on fan-out jobs."""
+        return {'type': 'coaches'}
+
+    @staticmethod
+    def segment_job_audience(segment, today=None):
+        """
+        Audience definition of a segment, stored on fan-out jobs.
+
+        The reference date is kept so a retry selects the same ages and
+        attendance window as the first run.
+        """
+        return {
+            'type': 'segment',
+            'segment': segment.to_dict(),
+            'today': (today or date.today()).isoformat()
+        }
+
+    @staticmethod
+    def audience_query(audience):
+        """
+        Build the recipient SELECT of a stored audience definition.
+
+        Raises:
+            ValueError: If the definition is unknown
+        """
+        if audience.get('type') == 'squad':
+            return FanoutService.squad_audience(audience['squad_id'])
+        if audience.get('type') == 'coaches':
+            return FanoutService.coach_audience()
+        if audience.get('type') == 'segment':
+            return SegmentService.compile(Segment.from_dict(audience['segment']),
+                                          today=date.fromisoformat(audience['today']))
+        raise ValueError(f"Unknown fan-out audience: {audience.get('type')}")
+
+    @staticmethod
+    def _stale_before():
+        seconds = current_app.config.get('FANOUT_JOB_STALE_SECONDS', 300) if has_app_context() else 300
+        return datetime.utcnow() - timedelta(seconds=seconds)
+
+    @staticmethod
+    def job_status(job):
+        """Serialize a job's progress, flagging jobs that stopped without finishing."""
+        return job.to_dict(stale_before=FanoutService._stale_before())
+
+    @staticmethod
+    def start_job(description, audience, sender_id, content, message_type='announcement', title=None,
+                  channel=None):
+        """
+        Save a fan-out job and run it on a background thread.
+
+        The job and its progress are stored in the database, so any worker
+        can report or retry it.
+
+        Args:
+            description (str): Audience description shown with the job's progress
+            audience (dict): Audience definition from squad_job_audience,
+                coach_job_audience or segment_job_audience
+            channel (str, optional): Event channel of exactly the audience; without
+                one each batch is announced on the fan-out channel
+
+        Returns:
+            FanoutJob: The started job; poll get_job(job.id) for progress
+        """
+        job = FanoutJob(
+            id=uuid.uuid4().hex,
+            description=description,
+            audience=audience,
+            sender_id=sender_id,
+            content=content,
+            message_type=message_type,
+            title=title,
+            channel=channel,
+            status='queued'
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        FanoutService._run_job(job.id)
+        return job
+
+    @staticmethod
+    def claim_job(job_id, failed=True):
+        """
+        Atomically mark a job as queued again if it can be resumed.
+
+        A job can be resumed when it failed, or when it is queued or running
+        but has not progressed for FANOUT_JOB_STALE_SECONDS because the
+        worker running it stopped. Only one caller can claim a job.
+
+        Args:
+            job_id (str): Job ID
+            failed (bool): Whether failed jobs can be claimed, not just stalled ones
+
+        Returns:
+            bool: True if the caller claimed the job
+        """
+        resumable = and_(FanoutJob.status.in_(('queued', 'running')),
+                         FanoutJob.updated_at < FanoutService._stale_before())
+        if failed:
+            resumable = or_(FanoutJob.status == 'failed', resumable)
+        result = db.session.execute(update(FanoutJob.__table__).where(
+            FanoutJob.id == job_id, resumable
+        ).values(status='queued', error=None, finished_at=None, updated_at=datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def retry_job(job_id):
+        """
+        Restart a failed or stalled job after the last recipient it delivered to.
+
+        Returns:
+            FanoutJob: The restarted job, or None if it is unknown or cannot be resumed
+        """
+        if not FanoutService.claim_job(job_id):
+            return None
+        FanoutService._run_job(job_id)
+        return db.session.get(FanoutJob, job_id)
+
+    @staticmethod
+    def run_job(job_id):
+        """
+        Run a claimed job in the current thread.
+
+        Returns:
+            bool: True if every recipient was written
+        """
+        job = db.session.get(FanoutJob, job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            FanoutService.write_messages(
+                FanoutService.audience_query(job.audience), job.sender_id, job.content,
+                job.message_type, job.title, job=job, channel=job.channel,
+                notify_batches=job.channel is None)
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error fanning out notification: %s", e)
+            job = db.session.get(FanoutJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return job.status == 'done'
+
+    @staticmethod
+    def _run_job(job_id):
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    FanoutService.run_job(job_id)
+                except Exception as e:
+                    # 状态无法保存时任务停在 running，超时后可以重试
+                    logger.error("Error saving fan-out job %s: %s", job_id, e)
+                finally:
+                    db.session.remove()
+
+        threading.Thread(target=run, name=f'fanout-{job_id[:8]}', daemon=True).start()
+
+    @staticmethod
+    def resume_stalled_jobs(include_failed=False):
+        """
+        Resume jobs interrupted by a worker restart, in the current thread.
+
+        Args:
+            include_failed (bool): Also retry failed jobs
+
+        Returns:
+            list: (job ID, True if it completed) per resumed job
+        """
+        statuses = ('queued', 'running', 'failed') if include_failed else ('queued', 'running')
+        job_ids = db.session.execute(
+            select(FanoutJob.id).where(FanoutJob.status.in_(statuses)).order_by(FanoutJob.created_at)
+        ).scalars().all()
+
+        resumed = []
+        for job_id in job_ids:
+            if FanoutService.claim_job(job_id, failed=include_failed):
+                resumed.append((job_id, FanoutService.run_job(job_id)))
+        return resumed
+
+    @staticmethod
+    def get_job(job_id):
+        """
+        Get a fan-out job started by any worker.
+
+        Returns:
+            FanoutJob: The job, or None if unknown
+        """
+        return db.session.get(FanoutJob, job_id)
@@ -0,0 +1,428 @@
+"""
+iCalendar feed service for Simply Rugby.
+This module renders per-squad, per-coach and per-member .ics feeds of games and training sessions.
+"""
+import hashlib
+import logging
+from collections import namedtuple
+from flask import current_app, has_app_context
+from itsdangerous import BadSignature, URLSafeSerializer
+from app import db
+from app.models.game import Game
+from app.models.player import Player
+from app.models.junior_player import JuniorPlayer
+from app.models.coach import Coach
+from app.models.squad import Squad
+from app.models.user import User
+from app.models.venue import Venue
+from app.models.training_plan import TrainingPlan, TrainingSession
+from app.services.calendar_service import CalendarService
+from app.services.coach_access_service import CoachAccessService
+from app.utils.cache import TTLCache, bump_versions, get_versions
+from sqlalchemy import event, select, union
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from datetime import date, datetime, timedelta
+
+
+logger = logging.getLogger(__name__)
+
+
+FEED_KINDS = ('squad', 'coach', 'member')
+
+# A rendered feed; etag is strong because it is a hash of the exact body
+Feed = namedtuple('Feed', ['body', 'etag', 'last_modified'])
+
+# (kind, owner_id) -> (owner version, squad IDs shown in that feed)
+_feed_squads = TTLCache('ical_feed_squads', ttl=300, max_entries=20000)
+# (kind, owner_id) -> (validity key, Feed)
+_feeds = TTLCache('ical_feeds', ttl=3600, max_entries=5000)
+
+# Versions (see get_versions) are 'squad:<id>' for a squad's games or sessions and
+# '<kind>:<owner_id>' for the squads a coach or member feed shows. Without
+# EVENT_BUS_URL other workers serve their cached feed until ICAL_FEED_CACHE_TTL expires.
+
+
+def _squad_field(squad_id):
+    return f'squad:{squad_id}'
+
+
+def _owner_field(kind, owner_id):
+    return f'{kind}:{owner_id}'
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Fold a content line at 75 octets as required by RFC 5545."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        # 不要截断多字节字符
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+        limit = 74
+    return '\r\n '.join(parts)
+
+
+class ICalService:
+    """
+    Service for rendering and caching iCalendar feeds.
+
+    Calendar apps poll feeds often, so rendered feeds are kept per process
+    and only rebuilt after a game or training session of one of the feed's
+    squads changes. Serving a cached feed needs only the subscriber's access
+    check (primary-key lookups and the cached feed squads) and a version
+    lookup (in Redis when EVENT_BUS_URL is set).
+    """
+
+    DEFAULT_PAST_DAYS = 90
+    DEFAULT_FUTURE_DAYS = 365
+    # Games have no end time; calendar entries use this length
+    GAME_DURATION = timedelta(hours=2)
+
+    @staticmethod
+    def _serializer():
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='ical-feed')
+
+    @staticmethod
+    def make_token(kind, owner_id, user):
+        """
+        Create the signed token used in a feed URL.
+
+        Tokens name the user they were issued to and that user's current
+        token version, so they stop working once the user rotates their
+        feed URLs or loses access to the feed.
+
+        Args:
+            kind (str): 'squad', 'coach' (Coach ID) or 'member' (User ID)
+            owner_id (int): ID of the squad, coach or member
+            user (User): User subscribing to the feed
+        """
+        return ICalService._serializer().dumps([kind, owner_id, user.id, user.ical_token_version])
+
+    @staticmethod
+    def read_token(token):
+        """
+        Read a feed token without touching the database.
+
+        Returns:
+            tuple: (kind, owner_id, user_id, token version), or None if the token is invalid
+        """
+        try:
+            kind, owner_id, user_id, version = ICalService._serializer().loads(token)
+        except (BadSignature, TypeError, ValueError):
+            return None
+        if kind not in FEED_KINDS or not all(type(value) is int for value in (owner_id, user_id, version)):
+            return None
+        return kind, owner_id, user_id, version
+
+    @staticmethod
+    def is_authorized(kind, owner_id, user_id, version):
+        """
+        Check that a token's user may still read a feed.
+
+        The token version must match the user's current one, and the user
+        must still be the member or coach a feed belongs to, or play for or
+        coach its squad.
+
+        Returns:
+            bool: True if the feed can be served
+        """
+        current_version = db.session.query(User.ical_token_version).filter(User.id == user_id).scalar()
+        if current_version is None or current_version != version:
+            return False
+        if kind == 'member':
+            return owner_id == user_id
+
+        coach_id = db.session.query(Coach.id).filter(Coach.user_id == user_id).scalar()
+        if kind == 'coach':
+            return coach_id == owner_id
+        if owner_id in (ICalService.get_feed_squads('member', user_id) or ()):
+            return True
+        return coach_id is not None and owner_id in (ICalService.get_feed_squads('coach', coach_id) or ())
+
+    @staticmethod
+    def rotate_tokens(user):
+        """
+        Invalidate every feed URL issued to a user.
+
+        Returns:
+            bool: Success status
+        """
+        try:
+            user.ical_token_version = (user.ical_token_version or 0) + 1
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error rotating calendar feed tokens: %s", e)
+            return False
+
+    @staticmethod
+    def get_feed_squads(kind, owner_id):
+        """
+        Get the squads whose events a feed shows.
+
+        A coach feed shows every squad the coach can access, including
+        squads they run through a TrainingPlan.
+
+        Returns:
+            tuple: Sorted squad IDs, or None if the coach or member does not exist
+        """
+        if kind == 'squad':
+            return (owner_id,)
+
+        key = (kind, owner_id)
+        owner_version = get_versions([_owner_field(kind, owner_id)])[0]
+        cached = _feed_squads.get(key)
+        if cached is not None and cached[0] == owner_version:
+            return cached[1]
+
+        if kind == 'coach':
+            user_id = db.session.query(Coach.user_id).filter(Coach.id == owner_id).scalar()
+            if user_id is None:
+                return None
+            # 访问缓存只在本进程失效，其他进程提交的变更需要重新加载
+            CoachAccessService.invalidate(user_id)
+            squad_ids = tuple(sorted(CoachAccessService.get_accessible_squad_ids(user_id)))
+        else:
+            squad_ids = tuple(sorted(db.session.execute(union(
+                select(Player.squad_id).where(Player.user_id == owner_id, Player.squad_id.isnot(None)),
+                select(JuniorPlayer.squad_id).where(JuniorPlayer.user_id == owner_id, JuniorPlayer.squad_id.isnot(None))
+            )).scalars().all()))
+
+        _feed_squads.set(key, (owner_version, squad_ids))
+        return squad_ids
+
+    @staticmethod
+    def _window():
+        config = current_app.config if has_app_context() else {}
+        today = date.today()
+        return (today - timedelta(days=config.get('ICAL_FEED_PAST_DAYS', ICalService.DEFAULT_PAST_DAYS)),
+                today + timedelta(days=config.get('ICAL_FEED_FUTURE_DAYS', ICalService.DEFAULT_FUTURE_DAYS)))
+
+    @staticmethod
+    def render(name, events):
+        """
+        Render calendar events as an iCalendar document.
+
+        Times are written as floating local times, matching how games and
+        sessions are stored.
+        """
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//Simply Rugby//Club Calendar//EN',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f'X-WR-CALNAME:{_escape(name)}'
+        ]
+
+        for item in events:
+            if item.start_time:
+                start = datetime.combine(item.date, item.start_time)
+                if item.end_time and item.end_time > item.start_time:
+                    end = datetime.combine(item.date, item.end_time)
+                else:
+                    end = start + ICalService.GAME_DURATION
+                timing = [f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+                          f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}"]
+            else:
+                timing = [f"DTSTART;VALUE=DATE:{item.date.strftime('%Y%m%d')}",
+                          f"DTEND;VALUE=DATE:{(item.date + timedelta(days=1)).strftime('%Y%m%d')}"]
+
+            title = item.title if item.type == 'game' else f'Training: {item.title}'
+            if item.squad_name:
+                title = f'{item.squad_name} {title}'
+
+            lines.append('BEGIN:VEVENT')
+            lines.append(f'UID:{item.type}-{item.id}@simplyrugby')
+            # DTSTAMP 由事件本身决定，保证同样的数据渲染出同样的内容
+            lines.append(f"DTSTAMP:{item.date.strftime('%Y%m%d')}T000000Z")
+            lines.extend(timing)
+            lines.append(f'SUMMARY:{_escape(title)}')
+            if item.location or item.venue_name:
+                lines.append(f'LOCATION:{_escape(item.venue_name or item.location)}')
+            if item.status == 'cancelled':
+                lines.append('STATUS:CANCELLED')
+            lines.append('END:VEVENT')
+
+        lines.append('END:VCALENDAR')
+        return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+    @staticmethod
+    def get_feed(kind, owner_id):
+        """
+        Get a rendered feed, rebuilding it only if its squads changed.
+
+        Args:
+            kind (str): 'squad', 'coach' or 'member'
+            owner_id (int): ID of the squad, coach or member
+
+        Returns:
+            Feed: Rendered feed, or None if the owner does not exist
+        """
+        squad_ids = ICalService.get_feed_squads(kind, owner_id)
+        if squad_ids is None:
+            return None
+
+        start, end = ICalService._window()
+        versions = get_versions([_squad_field(squad_id) for squad_id in squad_ids])
+        validity = (squad_ids, versions, start)
+
+        key = (kind, owner_id)
+        cached = _feeds.get(key)
+        if cached is not None and cached[0] == validity:
+            return cached[1]
+
+        events = CalendarService.get_events(start, end, squad_ids, kinds=('game', 'training')) if squad_ids else []
+        body = ICalService.render(f'Simply Rugby {kind} {owner_id}', events)
+        etag = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+        if cached is not None and cached[1].etag == etag:
+            feed = cached[1]
+        else:
+            feed = Feed(body, etag, datetime.utcnow().replace(microsecond=0))
+        _feeds.set(key, (validity, feed),
+                   ttl=current_app.config.get('ICAL_FEED_CACHE_TTL') if has_app_context() else None)
+        return feed
+
+    @staticmethod
+    def invalidate_squads(squad_ids):
+        """Mark the feeds of these squads as changed."""
+        bump_versions([_squad_field(squad_id) for squad_id in squad_ids if squad_id is not None])
+
+    @staticmethod
+    def invalidate_owners(owners):
+        """Mark the squad lists of these (kind, owner_id) feeds as changed."""
+        bump_versions([_owner_field(kind, owner_id) for kind, owner_id in owners if owner_id is not None])
+
+    @staticmethod
+    def invalidate_after_commit(session, squad_ids=(), owners=()):
+        """
+        Mark feeds as changed once the session commits.
+
+        Use this for bulk writes that bypass ORM events.
+
+        Args:
+            squad_ids (iterable): Squads whose games or sessions changed
+            owners (iterable): (kind, owner_id) feeds whose squads changed
+        """
+        session.info.setdefault('ical_changed_squads', set()).update(squad_ids)
+        session.info.setdefault('ical_changed_owners', set()).update(owners)
+
+
+def _history_values(target, attribute):
+    history = get_history(target, attribute)
+    return set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+
+
+def _game_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        ICalService.invalidate_after_commit(session, _history_values(target, 'squad_id'))
+
+
+def _session_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        plan_ids = _history_values(target, 'training_plan_id')
+        squad_ids = connection.execute(
+            select(TrainingPlan.squad_id).where(TrainingPlan.id.in_(plan_ids))
+        ).scalars().all() if plan_ids else []
+        ICalService.invalidate_after_commit(session, squad_ids)
+
+
+def _plan_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    squad_changed = get_history(target, 'squad_id').has_changes()
+    # 计划标题是订阅中训练条目的标题
+    if squad_changed or get_history(target, 'title').has_changes():
+        ICalService.invalidate_after_commit(session, _history_values(target, 'squad_id'))
+    if squad_changed or get_history(target, 'coach_id').has_changes():
+        _plan_coaches_changed(mapper, connection, target)
+
+
+def _plan_coaches_changed(mapper, connection, target):
+    # 教练通过训练计划可访问的球队变化时，其订阅的球队列表也随之变化
+    session = object_session(target)
+    coach_user_ids = _history_values(target, 'coach_id') - {None}
+    if session is None or not coach_user_ids:
+        return
+    coach_ids = connection.execute(
+        select(Coach.id).where(Coach.user_id.in_(coach_user_ids))
+    ).scalars().all()
+    ICalService.invalidate_after_commit(session, owners=[('coach', coach_id) for coach_id in coach_ids])
+
+
+def _squad_renamed(mapper, connection, target):
+    # 球队名称是订阅条目标题的前缀
+    session = object_session(target)
+    if session is not None and get_history(target, 'name').has_changes():
+        ICalService.invalidate_after_commit(session, [target.id])
+
+
+def _venue_renamed(mapper, connection, target):
+    # 场地名称是比赛条目的地点
+    session = object_session(target)
+    if session is None or not get_history(target, 'name').has_changes():
+        return
+    squad_ids = connection.execute(
+        select(Game.squad_id).where(Game.venue_id == target.id).distinct()
+    ).scalars().all()
+    ICalService.invalidate_after_commit(session, squad_ids)
+
+
+def _membership_changed(kind, owner_attribute):
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            ICalService.invalidate_after_commit(session, owners=[(kind, getattr(target, owner_attribute))])
+    return listener
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Game, _event_name, _game_changed)
+    event.listen(TrainingSession, _event_name, _session_changed)
+event.listen(TrainingPlan, 'after_update', _plan_changed)
+event.listen(TrainingPlan, 'after_insert', _plan_coaches_changed)
+event.listen(TrainingPlan, 'after_delete', _plan_coaches_changed)
+event.listen(Squad, 'after_update', _squad_renamed)
+event.listen(Venue, 'after_update', _venue_renamed)
+for _model, _kind, _owner_attribute in ((Player, 'member', 'user_id'),
+                                        (JuniorPlayer, 'member', 'user_id'),
+                                        (Coach, 'coach', 'id')):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _membership_changed(_kind, _owner_attribute))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_feeds(session):
+    squad_ids = session.info.pop('ical_changed_squads', None)
+    owners = session.info.pop('ical_changed_owners', None)
+    try:
+        if squad_ids:
+            ICalService.invalidate_squads(squad_ids)
+        if owners:
+            ICalService.invalidate_owners(owners)
+    except Exception as e:
+        logger.error("Error invalidating calendar feeds: %s", e)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_changed_feeds(session):
+    session.info.pop('ical_changed_squads', None)
+    session.info.pop('ical_changed_owners', None)
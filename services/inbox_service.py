@@ -0,0 +1,452 @@
+"""
+Inbox service for Simply Rugby.
+This module merges personal messages, notifications and broadcasts into one ordered inbox per user.
+"""
+import heapq
+import itertools
+import logging
+from collections import namedtuple
+from flask import g, has_app_context
+from app import db
+from app.models.message import Message
+from app.models.notification import Notification
+from app.models.broadcast import BroadcastMessage, BroadcastReceipt
+from app.models.user import User
+from app.models.player import Player
+from app.models.junior_player import JuniorPlayer
+from app.models.coach import Coach
+from app.services.unread_counter_service import UnreadCounterService
+from app.utils.pagination import InvalidCursor, encode_cursor, decode_cursor
+from app.utils.upsert import build_upsert
+from app.utils.events import publish_after_commit
+from sqlalchemy import and_, func, literal, or_, select, tuple_, union, update
+from datetime import datetime
+
+
+logger = logging.getLogger(__name__)
+
+
+# Inbox sources; items created at the same time are ordered by rank, higher first
+INBOX_KIND_RANK = {'message': 2, 'notification': 1, 'broadcast': 0}
+
+
+def user_channel(user_id):
+    """Event channel of a single user's inbox."""
+    return f'user:{user_id}'
+
+
+def squad_players_channel(squad_id):
+    """Event channel of a squad's players and junior players, without its coaches."""
+    return f'squad-players:{squad_id}'
+
+
+def audience_channel(audience_type, audience_value=''):
+    """Event channel of a broadcast audience."""
+    return 'all' if audience_type == 'all' else f'{audience_type}:{audience_value}'
+
+
+def fanout_channel():
+    """
+    Event channel of fan-out batches without an audience channel.
+
+    Every inbox stream listens to it; each event names the sender, send time
+    and user ID range of one batch, and a stream only forwards it to users
+    who received a message in that batch.
+    """
+    return 'fanout'
+
+
+class InboxItem(namedtuple('InboxItem', [
+        'kind', 'id', 'sender_id', 'title', 'content', 'message_type', 'created_at', 'is_read'])):
+    """
+    A personal message, notification or broadcast as shown in a user's inbox.
+    """
+    __slots__ = ()
+
+    @property
+    def sort_key(self):
+        return (self.created_at, INBOX_KIND_RANK[self.kind], self.id)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'title': self.title,
+            'content': self.content,
+            'sender_id': self.sender_id,
+            'created_at': self.created_at.isoformat(),
+            'is_read': self.is_read,
+            'message_type': self.message_type
+        }
+
+    @classmethod
+    def from_message(cls, message):
+        return cls('message', message.id, message.sender_id, message.title, message.content,
+                   message.message_type, message.created_at, bool(message.is_read))
+
+    @classmethod
+    def from_notification(cls, notification):
+        return cls('notification', notification.id, notification.sender_id, notification.title,
+                   notification.content, notification.notification_type, notification.timestamp,
+                   bool(notification.is_read))
+
+    @classmethod
+    def from_broadcast(cls, broadcast, is_read):
+        return cls('broadcast', broadcast.id, broadcast.sender_id, broadcast.title, broadcast.content,
+                   broadcast.message_type, broadcast.created_at, bool(is_read))
+
+
+class InboxService:
+    """
+    Service for reading a user's unified inbox.
+
+    The inbox has three sources: Messages sent to the user, Notifications
+    addressed to the user and BroadcastMessages whose audience includes the
+    user. Each source is read as an indexed stream ordered by
+    (created_at, id) and the streams are merged in Python, so a page never
+    reads more than limit + 1 rows per source.
+    """
+
+    KINDS = tuple(INBOX_KIND_RANK)
+
+    @staticmethod
+    def get_audience_keys(user_id):
+        """
+        Get the (audience_type, audience_value) pairs a user belongs to.
+
+        The user's role and squads are loaded once per request.
+
+        Args:
+            user_id (int): User ID
+
+        Returns:
+            list: Pairs matching BroadcastMessage audience columns
+        """
+        request_memo = g.setdefault('broadcast_audience_keys', {}) if has_app_context() else {}
+        if user_id in request_memo:
+            return request_memo[user_id]
+
+        keys = [('all', '')]
+        user_type = db.session.query(User.user_type).filter(User.id == user_id).scalar()
+        if user_type:
+            keys.append(('role', user_type))
+
+        squad_ids = db.session.execute(union(
+            select(Player.squad_id).where(Player.user_id == user_id, Player.squad_id.isnot(None)),
+            select(JuniorPlayer.squad_id).where(JuniorPlayer.user_id == user_id, JuniorPlayer.squad_id.isnot(None)),
+            select(Coach.squad_id).where(Coach.user_id == user_id, Coach.squad_id.isnot(None))
+        )).scalars().all()
+        keys.extend(('squad', str(squad_id)) for squad_id in squad_ids)
+
+        request_memo[user_id] = keys
+        return keys
+
+    @staticmethod
+    def get_player_squad_ids(user_id):
+        """
+        Get the squads a user plays in as a player or junior player.
+
+        Args:
+            user_id (int): User ID
+
+        Returns:
+            list: Squad IDs
+        """
+        return db.session.execute(union(
+            select(Player.squad_id).where(Player.user_id == user_id, Player.squad_id.isnot(None)),
+            select(JuniorPlayer.squad_id).where(JuniorPlayer.user_id == user_id, JuniorPlayer.squad_id.isnot(None))
+        )).scalars().all()
+
+    @staticmethod
+    def broadcast_query(user_id, unread_only=False):
+        """
+        Build a query of broadcasts addressed to a user with their read state.
+
+        Audiences are matched with a row-value IN on the
+        (audience_type, audience_value, created_at) index and read state with
+        a primary-key lookup on the receipts table.
+        """
+        audience = tuple_(BroadcastMessage.audience_type, BroadcastMessage.audience_value).in_(
+            InboxService.get_audience_keys(user_id))
+
+        query = db.session.query(
+            BroadcastMessage,
+            BroadcastReceipt.user_id.isnot(None).label('is_read')
+        ).outerjoin(
+            BroadcastReceipt,
+            and_(BroadcastReceipt.broadcast_id == BroadcastMessage.id, BroadcastReceipt.user_id == user_id)
+        ).filter(audience)
+
+        if unread_only:
+            query = query.filter(BroadcastReceipt.user_id.is_(None))
+        return query
+
+    @staticmethod
+    def after_cursor(created_at_column, id_column, kind, cursor_values):
+        """
+        Build the keyset condition for rows of one kind after a cursor.
+
+        The inbox is ordered by (created_at, kind rank, id), all descending.
+        """
+        last_created_at, last_rank, last_id = cursor_values
+        rank = INBOX_KIND_RANK[kind]
+
+        if rank < last_rank:
+            return created_at_column <= last_created_at
+        if rank > last_rank:
+            return created_at_column < last_created_at
+        return or_(
+            created_at_column < last_created_at,
+            and_(created_at_column == last_created_at, id_column < last_id)
+        )
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decode an inbox cursor into (created_at, kind rank, id).
+
+        Returns:
+            list: Cursor values, or None for an empty cursor
+
+        Raises:
+            InvalidCursor: If cursor is malformed
+        """
+        if not cursor:
+            return None
+        cursor_values = decode_cursor(cursor, types=(datetime, int, int))
+        if cursor_values[1] not in INBOX_KIND_RANK.values():
+            raise InvalidCursor('Invalid pagination cursor')
+        return cursor_values
+
+    @staticmethod
+    def _sources(user_id, unread_only=False, message_types=None, kinds=None, cursor_values=None):
+        """
+        Build one query per requested source with filters applied.
+
+        Returns:
+            dict: {kind: (query, created_at column, id column)}
+        """
+        kinds = kinds or InboxService.KINDS
+        sources = {}
+
+        if 'message' in kinds:
+            query = Message.query.filter(Message.receiver_id == user_id)
+            if unread_only:
+                query = query.filter(Message.is_read.is_(False))
+            if message_types:
+                query = query.filter(Message.message_type.in_(message_types))
+            sources['message'] = (query, Message.created_at, Message.id)
+
+        if 'notification' in kinds:
+            query = Notification.query.filter(Notification.recipient_id == user_id)
+            if unread_only:
+                query = query.filter(Notification.is_read.is_(False))
+            if message_types:
+                query = query.filter(Notification.notification_type.in_(message_types))
+            sources['notification'] = (query, Notification.timestamp, Notification.id)
+
+        if 'broadcast' in kinds:
+            query = InboxService.broadcast_query(user_id, unread_only)
+            if message_types:
+                query = query.filter(BroadcastMessage.message_type.in_(message_types))
+            sources['broadcast'] = (query, BroadcastMessage.created_at, BroadcastMessage.id)
+
+        if cursor_values:
+            sources = {
+                kind: (query.filter(InboxService.after_cursor(created_at, id_column, kind, cursor_values)),
+                       created_at, id_column)
+                for kind, (query, created_at, id_column) in sources.items()
+            }
+        return sources
+
+    @staticmethod
+    def get_page(user_id, unread_only=False, limit=50, cursor=None, message_types=None, kinds=None):
+        """
+        Get one page of a user's inbox.
+
+        Pages use keyset pagination on (created_at, kind, id), so deep pages
+        cost the same as the first and rows arriving mid-scroll never shift
+        later pages.
+
+        Args:
+            user_id (int): User ID
+            unread_only (bool): Whether to get only unread items
+            limit (int): Maximum number of items to return
+            cursor (str, optional): Cursor returned with the previous page
+            message_types (list, optional): Only items of these types
+            kinds (list, optional): Only these sources ('message', 'notification', 'broadcast')
+
+        Returns:
+            tuple: (list of InboxItem, next cursor or None)
+
+        Raises:
+            InvalidCursor: If cursor is malformed
+        """
+        sources = InboxService._sources(
+            user_id, unread_only, message_types, kinds, InboxService.decode_cursor(cursor))
+
+        streams = []
+        for kind, (query, created_at, id_column) in sources.items():
+            rows = query.order_by(created_at.desc(), id_column.desc()).limit(limit + 1).all()
+            if kind == 'message':
+                streams.append(InboxItem.from_message(row) for row in rows)
+            elif kind == 'notification':
+                streams.append(InboxItem.from_notification(row) for row in rows)
+            else:
+                streams.append(InboxItem.from_broadcast(broadcast, is_read) for broadcast, is_read in rows)
+
+        items = list(itertools.islice(
+            heapq.merge(*streams, key=lambda item: item.sort_key, reverse=True),
+            limit + 1
+        ))
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(*items[-1].sort_key)
+
+        return items, next_cursor
+
+    @staticmethod
+    def received_batch(user_id, recipients):
+        """
+        Whether a user received a message in a fan-out batch.
+
+        Args:
+            user_id (int): User ID
+            recipients (dict): Batch description from a fan-out event, with
+                sender_id, created_at and the user ID range (after, through]
+
+        Returns:
+            bool: True if the user is in the range and has the batch's message
+        """
+        after, through = recipients.get('after'), recipients['through']
+        if user_id > through or (after is not None and user_id <= after):
+            return False
+        # 走 (receiver_id, created_at) 索引
+        return db.session.query(Message.query.filter(
+            Message.receiver_id == user_id,
+            Message.created_at == datetime.fromisoformat(recipients['created_at']),
+            Message.sender_id == recipients['sender_id']
+        ).exists()).scalar()
+
+    @staticmethod
+    def get_unread_counts(user_id):
+        """
+        Get a user's unread inbox counts by message type.
+
+        Only personal messages come from the user's unread counters, with a
+        primary-key lookup. Notifications are counted with a GROUP BY on the
+        recipient's unread notification index, and broadcasts with an
+        anti-join against the user's receipts. Broadcasts are stored once
+        per audience, so a per-user counter would have to be fanned out to
+        every recipient.
+
+        Args:
+            user_id (int): User ID
+
+        Returns:
+            dict: {message_type: unread count}
+        """
+        counts = UnreadCounterService.get_counts(user_id)
+
+        notification_counts = db.session.query(
+            Notification.notification_type,
+            func.count(Notification.id)
+        ).filter(
+            Notification.recipient_id == user_id,
+            Notification.is_read.is_(False)
+        ).group_by(Notification.notification_type).all()
+
+        broadcast_counts = InboxService.broadcast_query(user_id, unread_only=True).with_entities(
+            BroadcastMessage.message_type,
+            func.count(BroadcastMessage.id)
+        ).group_by(BroadcastMessage.message_type).all()
+
+        for message_type, count in itertools.chain(notification_counts, broadcast_counts):
+            counts[message_type] = counts.get(message_type, 0) + count
+
+        return counts
+
+    @staticmethod
+    def mark_read(user_id, message_types=None, items=None, before=None):
+        """
+        Mark many inbox items as read at once.
+
+        Messages are counted by type with one grouped query, updated with one
+        UPDATE and their unread counters decremented by those counts with
+        another (or rebuilt if the UPDATE changed a different number of rows);
+        notifications are updated with one UPDATE and broadcasts with one
+        insert-or-ignore INSERT ... SELECT of receipts, all in one
+        transaction. Filters combine; with none given the whole inbox is
+        marked as read.
+
+        Args:
+            user_id (int): User ID
+            message_types (list, optional): Only items of these types
+            items (list, optional): Only these (kind, id) pairs
+            before (str, optional): Only items older than this inbox cursor
+
+        Returns:
+            dict: The user's unread counts by message type, or None on failure
+
+        Raises:
+            InvalidCursor: If before is malformed
+        """
+        cursor_values = InboxService.decode_cursor(before)
+        ids = None
+        if items is not None:
+            ids = {kind: [item_id for item_kind, item_id in items if item_kind == kind] for kind in InboxService.KINDS}
+
+        try:
+            sources = InboxService._sources(
+                user_id, True, message_types,
+                [kind for kind in InboxService.KINDS if ids is None or ids[kind]],
+                cursor_values)
+
+            for kind, (query, created_at, id_column) in sources.items():
+                if ids is not None:
+                    query = query.filter(id_column.in_(ids[kind]))
+
+                if kind == 'broadcast':
+                    receipts = query.with_entities(
+                        BroadcastMessage.id,
+                        literal(user_id),
+                        literal(datetime.utcnow())
+                    )
+                    # 并发标记已读时已存在的回执保持不变
+                    db.session.execute(build_upsert(
+                        db.session, BroadcastReceipt.__table__, ['broadcast_id', 'user_id'],
+                        lambda incoming, table: {'read_at': table.c.read_at},
+                        select=receipts.statement,
+                        columns=['broadcast_id', 'user_id', 'read_at']
+                    ))
+                elif kind == 'message':
+                    counts = dict(query.with_entities(
+                        Message.message_type, func.count(Message.id)
+                    ).group_by(Message.message_type).all())
+                    result = db.session.execute(
+                        update(Message.__table__).where(query.whereclause).values(is_read=True)
+                    )
+                    if result.rowcount == sum(counts.values()):
+                        UnreadCounterService.decrement_counts(user_id, counts)
+                    else:
+                        # 统计与更新之间有消息变化，按消息表重建该用户的计数器
+                        UnreadCounterService.rebuild([user_id])
+                else:
+                    db.session.execute(
+                        update(Notification.__table__).where(query.whereclause).values(is_read=True)
+                    )
+
+            publish_after_commit(db.session, user_channel(user_id), 'read', {
+                'message_types': message_types,
+                'items': [{'kind': kind, 'id': item_id} for kind, item_id in items] if items is not None else None,
+                'before': before
+            })
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error marking inbox items as read: %s", e)
+            return None
+
+        return InboxService.get_unread_counts(user_id)
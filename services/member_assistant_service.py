@@ -2,6 +2,7 @@
 Member Assistant Service for Simply Rugby.
 This module provides functionality for managing games, venues, and scheduling.
 """
+import logging
 from app import db
 from app.models.game import Game
 from app.models.venue import Venue
@@ -12,8 +13,25 @@ from app.models.player import Player
 from app.models.junior_player import JuniorPlayer
 from app.models.coach import Coach
 from app.models.message import Message
-from datetime import datetime, timedelta
-import calendar
+from app.services.calendar_service import CalendarService
+from sqlalchemy import String, cast, literal, null, select, union_all
+from collections import namedtuple
+from datetime import datetime
+
+
+logger = logging.getLogger(__name__)
+
+
+# Lightweight, read-only squad member row; member_type is 'player', 'junior_player' or 'coach'
+SquadMember = namedtuple('SquadMember', [
+    'user_id',
+    'name',
+    'member_type',
+    'member_id',
+    'squad_id',
+    'squad_name',
+    'position'
+])
 
 
 class MemberAssistantService:
@@ -79,7 +97,7 @@ class MemberAssistantService:
             return season
         except Exception as e:
             db.session.rollback()
-            print(f"Error creating season: {str(e)}")
+            logger.error("Error creating season: %s", e)
             return None
     
     @staticmethod
@@ -125,7 +143,7 @@ class MemberAssistantService:
             return venue
         except Exception as e:
             db.session.rollback()
-            print(f"Error creating venue: {str(e)}")
+            logger.error("Error creating venue: %s", e)
             return None
     
     @staticmethod
@@ -193,7 +211,7 @@ class MemberAssistantService:
             return game
         except Exception as e:
             db.session.rollback()
-            print(f"Error creating game: {str(e)}")
+            logger.error("Error creating game: %s", e)
             return None
     
     @staticmethod
@@ -231,7 +249,7 @@ class MemberAssistantService:
             return True
         except Exception as e:
             db.session.rollback()
-            print(f"Error updating game result: {str(e)}")
+            logger.error("Error updating game result: %s", e)
             return False
     
     @staticmethod
@@ -246,45 +264,7 @@ class MemberAssistantService:
         Returns:
             dict: Calendar events by day
         """
-        # Get the first and last day of the month
-        first_day = datetime(year, month, 1).date()
-        
-        # Get the last day of the month
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        # Get all games in this month
-        games = Game.query.filter(
-            Game.match_date >= first_day,
-            Game.match_date <= last_day
-        ).all()
-        
-        # Create a calendar with events
-        cal = calendar.monthcalendar(year, month)
-        events = {}
-        
-        # Add games to the calendar
-        for game in games:
-            day = game.match_date.day
-            if day not in events:
-                events[day] = []
-            
-            events[day].append({
-                'type': 'game',
-                'id': game.id,
-                'title': f"vs {game.opponent}",
-                'location': game.location,
-                'time': game.kickoff_time.strftime('%H:%M') if game.kickoff_time else 'TBD'
-            })
-        
-        return {
-            'calendar': cal,
-            'events': events,
-            'month_name': calendar.month_name[month],
-            'year': year
-        }
+        return CalendarService.get_month(year, month)
     
     @staticmethod
     def get_squads():
@@ -296,6 +276,66 @@ class MemberAssistantService:
         """
         return Squad.query.all()
     
+    @staticmethod
+    def get_squad_member_rows(squad_ids):
+        """
+        Get the players, junior players and coaches of several squads.
+        
+        Members of all three kinds are selected with one UNION ALL joined to
+        Users and Squads, so the roster is always a single query.
+        
+        Args:
+            squad_ids (iterable): Squad IDs
+            
+        Returns:
+            list: SquadMember rows ordered by squad, member type and name
+        """
+        squad_ids = list(squad_ids or [])
+        if not squad_ids:
+            return []
+        
+        members = union_all(
+            select(
+                literal('player').label('member_type'),
+                Player.id.label('member_id'),
+                Player.user_id.label('user_id'),
+                Player.squad_id.label('squad_id'),
+                cast(Player.preferred_positions, String).label('position')
+            ).where(Player.squad_id.in_(squad_ids)),
+            select(
+                literal('junior_player'),
+                JuniorPlayer.id,
+                JuniorPlayer.user_id,
+                JuniorPlayer.squad_id,
+                cast(JuniorPlayer.position, String)
+            ).where(JuniorPlayer.squad_id.in_(squad_ids)),
+            select(
+                literal('coach'),
+                Coach.id,
+                Coach.user_id,
+                Coach.squad_id,
+                cast(null(), String)
+            ).where(Coach.squad_id.in_(squad_ids))
+        ).subquery()
+        
+        rows = db.session.query(
+            User.id,
+            User.name,
+            members.c.member_type,
+            members.c.member_id,
+            members.c.squad_id,
+            Squad.name,
+            members.c.position
+        ).join(
+            members, members.c.user_id == User.id
+        ).join(
+            Squad, Squad.id == members.c.squad_id
+        ).order_by(
+            Squad.name, members.c.squad_id, members.c.member_type, User.name
+        ).all()
+        
+        return [SquadMember(*row) for row in rows]
+    
     @staticmethod
     def get_squad_members(squad_id):
         """
@@ -307,46 +347,23 @@ class MemberAssistantService:
         Returns:
             dict: Dictionary with players and coaches
         """
-        # Get adult players in the squad
-        players = Player.query.filter_by(squad_id=squad_id).all()
-        
-        # Get junior players in the squad
-        junior_players = JuniorPlayer.query.filter_by(squad_id=squad_id).all()
-        
-        # Get user information for each player
         player_users = []
-        for player in players:
-            user = User.query.get(player.user_id)
-            if user:
-                player_users.append({
-                    'id': user.id,
-                    'name': f"{user.first_name} {user.last_name}",
-                    'type': 'Adult Player',
-                    'player_id': player.id
-                })
-                
-        # Get user information for each junior player
-        for junior in junior_players:
-            user = User.query.get(junior.user_id)
-            if user:
-                player_users.append({
-                    'id': user.id,
-                    'name': f"{user.first_name} {user.last_name}",
-                    'type': 'Junior Player',
-                    'player_id': junior.id
-                })
-        
-        # Get coaches associated with the squad
         coaches = []
-        squad_coaches = Coach.query.filter_by(squad_id=squad_id).all()
         
-        for coach in squad_coaches:
-            user = User.query.get(coach.user_id)
-            if user:
+        for member in MemberAssistantService.get_squad_member_rows([squad_id]):
+            if member.member_type == 'coach':
                 coaches.append({
-                    'id': user.id,
-                    'name': f"{user.first_name} {user.last_name}",
-                    'coach_id': coach.id
+                    'id': member.user_id,
+                    'name': member.name,
+                    'coach_id': member.member_id
+                })
+            else:
+                player_users.append({
+                    'id': member.user_id,
+                    'name': member.name,
+                    'type': 'Junior Player' if member.member_type == 'junior_player' else 'Adult Player',
+                    'player_id': member.member_id,
+                    'position': member.position
                 })
         
         return {
@@ -2,23 +2,46 @@
 Notification service for Simply Rugby.
 This module provides functionality for sending and managing notifications to players and coaches.
 """
+import logging
 from app import db
 from app.models.message import Message
+from app.models.broadcast import BroadcastMessage, BroadcastReceipt
+from app.models.notification import Notification
 from app.models.user import User
+from app.models.squad import Squad
 from app.models.member_assistant import MemberAssistant
+from app.services.fanout_service import FanoutService
+from app.services.unread_counter_service import UnreadCounterService
+from app.services.inbox_service import (
+    InboxItem, InboxService, user_channel, audience_channel, squad_players_channel, fanout_channel
+)
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.events import publish_after_commit
+from sqlalchemy import and_, event, insert, or_
+from sqlalchemy.orm import aliased, object_session
 from datetime import datetime
 
 
+logger = logging.getLogger(__name__)
+
+
 class NotificationService:
     """
     Service for managing and sending notifications to users.
     """
     
+    # Maximum number of rows written by one INSERT when receivers are listed explicitly
+    INSERT_BATCH_SIZE = 500
+
     @staticmethod
     def send_notification(sender_id, receiver_ids, content, message_type='announcement', title=None):
         """
         Send a notification to multiple receivers.
         
+        Rows are written with multi-row INSERTs of at most INSERT_BATCH_SIZE
+        receivers, each committed separately together with the receivers'
+        unread counters.
+        
         Args:
             sender_id (int): ID of the sender (MemberAssistant)
             receiver_ids (list): List of receiver user IDs
@@ -30,109 +53,185 @@ class NotificationService:
             bool: Success status
         """
         try:
-            messages = []
-            
-            for receiver_id in receiver_ids:
-                message = Message(
-                    sender_id=sender_id,
-                    receiver_id=receiver_id,
-                    title=title,
-                    content=content,
-                    message_type=message_type,
-                    created_at=datetime.utcnow(),
-                    is_read=False
-                )
-                messages.append(message)
-            
-            db.session.bulk_save_objects(messages)
-            db.session.commit()
+            created_at = datetime.utcnow()
+            receiver_ids = list(dict.fromkeys(receiver_ids))
+            batch_size = NotificationService.INSERT_BATCH_SIZE
+            
+            for start in range(0, len(receiver_ids), batch_size):
+                batch = receiver_ids[start:start + batch_size]
+                rows = [{
+                    'sender_id': sender_id,
+                    'receiver_id': receiver_id,
+                    'title': title,
+                    'content': content,
+                    'message_type': message_type,
+                    'created_at': created_at,
+                    'is_read': False
+                } for receiver_id in batch]
+                db.session.execute(insert(Message.__table__).values(rows))
+                UnreadCounterService.increment(batch, message_type)
+                for receiver_id in batch:
+                    publish_after_commit(db.session, user_channel(receiver_id), 'message', {
+                        'kind': 'message',
+                        'title': title,
+                        'content': content,
+                        'message_type': message_type,
+                        'created_at': created_at.isoformat()
+                    })
+                db.session.commit()
             return True
         except Exception as e:
             db.session.rollback()
-            print(f"Error sending notifications: {str(e)}")
+            logger.error("Error sending notifications: %s", e)
             return False
             
     @staticmethod
-    def send_notification_to_squad(sender_id, squad_id, content, message_type='training', title=None):
+    def queue_notification_to_squad(sender_id, squad_id, content, message_type='training', title=None):
         """
-        Send a notification to all players in a specific squad.
+        Send a notification to a squad on a background thread.
+        
+        Returns:
+            FanoutJob: Job whose progress can be polled
+        """
+        return FanoutService.start_job(
+            audience_channel('squad', squad_id), FanoutService.squad_job_audience(squad_id),
+            sender_id, content, message_type, title, channel=squad_players_channel(squad_id))
+    
+    @staticmethod
+    def queue_notification_to_coaches(sender_id, content, message_type='announcement', title=None):
+        """
+        Send a notification to all coaches on a background thread.
+        
+        Returns:
+            FanoutJob: Job whose progress can be polled
+        """
+        channel = audience_channel('role', 'coach')
+        return FanoutService.start_job(
+            channel, FanoutService.coach_job_audience(),
+            sender_id, content, message_type, title, channel=channel)
+    
+    @staticmethod
+    def queue_notification_to_segment(sender_id, segment, content, message_type='announcement', title=None):
+        """
+        Send a notification to every member of a segment on a background thread.
+        
+        The job stores the segment's filters; they are compiled to one
+        SELECT that feeds the batched INSERT ... SELECT fan-out directly.
+        Segments have no event channel, so every recipient is notified on
+        their own user channel.
         
         Args:
             sender_id (int): ID of the sender (MemberAssistant)
-            squad_id (int): ID of the squad
+            segment (Segment): Audience definition
             content (str): Message content
             message_type (str): Type of message
             title (str, optional): Message title
             
         Returns:
-            bool: Success status
+            FanoutJob: Job whose progress can be polled
         """
-        try:
-            # Find all players in the squad
-            # This query needs to be adjusted based on actual model relationships
-            player_users = db.session.query(User.id).join(
-                User.player).filter_by(squad_id=squad_id).all()
-                
-            junior_player_users = db.session.query(User.id).join(
-                User.junior_player).filter_by(squad_id=squad_id).all()
-            
-            # Combine player IDs from both regular and junior players
-            player_ids = [p[0] for p in player_users] + [p[0] for p in junior_player_users]
-            
-            if not player_ids:
-                return False
-                
-            return NotificationService.send_notification(
-                sender_id, player_ids, content, message_type, title)
-        
-        except Exception as e:
-            print(f"Error sending notifications to squad: {str(e)}")
-            return False
+        return FanoutService.start_job(
+            segment.describe(), FanoutService.segment_job_audience(segment),
+            sender_id, content, message_type, title)
     
     @staticmethod
-    def send_notification_to_coaches(sender_id, content, message_type='announcement', title=None):
+    def send_broadcast(sender_id, audience_type, content, message_type='announcement', title=None, audience_value=''):
         """
-        Send a notification to all coaches.
+        Send a notification to a whole audience as a single broadcast row.
         
         Args:
             sender_id (int): ID of the sender (MemberAssistant)
+            audience_type (str): 'all', 'role' or 'squad'
             content (str): Message content
             message_type (str): Type of message
             title (str, optional): Message title
+            audience_value (str): user_type for 'role', squad ID for 'squad'
             
         Returns:
-            bool: Success status
+            BroadcastMessage: The created broadcast, or None on failure
         """
         try:
-            # Find all coaches
-            coach_users = db.session.query(User.id).join(
-                User.coach).all()
-            
-            coach_ids = [c[0] for c in coach_users]
-            
-            if not coach_ids:
-                return False
-                
-            return NotificationService.send_notification(
-                sender_id, coach_ids, content, message_type, title)
-        
+            broadcast = BroadcastMessage(
+                sender_id=sender_id,
+                audience_type=audience_type,
+                audience_value='' if audience_type == 'all' else str(audience_value),
+                title=title,
+                content=content,
+                message_type=message_type,
+                created_at=datetime.utcnow()
+            )
+            db.session.add(broadcast)
+            db.session.flush()
+            publish_after_commit(
+                db.session, audience_channel(broadcast.audience_type, broadcast.audience_value), 'message',
+                InboxItem.from_broadcast(broadcast, False).to_dict())
+            db.session.commit()
+            return broadcast
         except Exception as e:
-            print(f"Error sending notifications to coaches: {str(e)}")
-            return False
+            db.session.rollback()
+            logger.error("Error sending broadcast: %s", e)
+            return None
+    
+    @staticmethod
+    def get_event_channels(user_id):
+        """
+        Get the event channels carrying live updates for a user's inbox.
+        
+        Args:
+            user_id (int): User ID
+            
+        Returns:
+            list: Channel names for the user, every audience they belong to and fan-out batches
+        """
+        return [user_channel(user_id), fanout_channel()] + [
+            audience_channel(audience_type, audience_value)
+            for audience_type, audience_value in InboxService.get_audience_keys(user_id)
+        ] + [
+            squad_players_channel(squad_id)
+            for squad_id in InboxService.get_player_squad_ids(user_id)
+        ]
     
     @staticmethod
-    def mark_as_read(message_id, user_id):
+    def mark_as_read(message_id, user_id, kind='message'):
         """
         Mark a specific message as read.
         
         Args:
-            message_id (int): ID of the message
+            message_id (int): ID of the message or broadcast
             user_id (int): ID of the user who is marking the message
+            kind (str): 'message', 'notification' or 'broadcast'
             
         Returns:
             bool: Success status
         """
         try:
+            if kind == 'broadcast':
+                row = InboxService.broadcast_query(user_id).filter(
+                    BroadcastMessage.id == message_id
+                ).first()
+                if not row:
+                    return False
+                if not row.is_read:
+                    db.session.add(BroadcastReceipt(broadcast_id=message_id, user_id=user_id))
+                    publish_after_commit(db.session, user_channel(user_id), 'read',
+                                         {'kind': 'broadcast', 'ids': [message_id]})
+                    db.session.commit()
+                return True
+            
+            if kind == 'notification':
+                notification = Notification.query.filter_by(
+                    id=message_id,
+                    recipient_id=user_id
+                ).first()
+                if not notification:
+                    return False
+                if not notification.is_read:
+                    notification.is_read = True
+                    publish_after_commit(db.session, user_channel(user_id), 'read',
+                                         {'kind': 'notification', 'ids': [message_id]})
+                    db.session.commit()
+                return True
+            
             message = Message.query.filter_by(
                 id=message_id, 
                 receiver_id=user_id
@@ -140,40 +239,150 @@ class NotificationService:
             
             if not message:
                 return False
-                
-            message.is_read = True
-            db.session.commit()
+            
+            if not message.is_read:
+                message.is_read = True
+                UnreadCounterService.decrement(user_id, message.message_type)
+                publish_after_commit(db.session, user_channel(user_id), 'read',
+                                     {'kind': 'message', 'ids': [message_id]})
+                db.session.commit()
             return True
             
         except Exception as e:
             db.session.rollback()
-            print(f"Error marking message as read: {str(e)}")
+            logger.error("Error marking message as read: %s", e)
             return False
     
     @staticmethod
-    def get_user_notifications(user_id, unread_only=False, limit=50, offset=0):
+    def mark_many_as_read(user_id, message_type=None, items=None, before=None):
+        """
+        Mark many inbox items as read at once; see InboxService.mark_read.
+        
+        Args:
+            user_id (int): User ID
+            message_type (str, optional): Only items of this type
+            items (list, optional): Only these (kind, id) pairs
+            before (str, optional): Only items older than this inbox cursor
+            
+        Returns:
+            dict: The user's unread counts by message type, or None on failure
+        """
+        return InboxService.mark_read(
+            user_id, [message_type] if message_type else None, items, before)
+    
+    @staticmethod
+    def get_user_notifications(user_id, unread_only=False, limit=50, cursor=None):
         """
         Get notifications for a specific user.
         
+        Messages, notifications and broadcasts are merged into one inbox;
+        see InboxService.get_page.
+        
         Args:
             user_id (int): User ID
             unread_only (bool): Whether to get only unread notifications
             limit (int): Maximum number of notifications to return
-            offset (int): Offset for pagination
+            cursor (str, optional): Cursor returned with the previous page
             
         Returns:
-            list: List of notification objects
+            tuple: (list of InboxItem, next cursor or None)
+            
+        Raises:
+            InvalidCursor: If cursor is malformed
+        """
+        return InboxService.get_page(user_id, unread_only=unread_only, limit=limit, cursor=cursor)
+    
+    @staticmethod
+    def get_recent_feed(limit=50, cursor=None):
         """
-        query = Message.query.filter_by(receiver_id=user_id)
+        Get the most recent Notification rows for the management dashboard.
+        
+        Senders, user recipients and squad recipients are resolved by one
+        joined query, and pages use keyset pagination on (timestamp, id).
         
-        if unread_only:
-            query = query.filter_by(is_read=False)
+        Args:
+            limit (int): Maximum number of notifications to return
+            cursor (str, optional): Cursor returned with the previous page
             
-        notifications = query.order_by(
-            Message.created_at.desc()
-        ).limit(limit).offset(offset).all()
+        Returns:
+            tuple: (list of feed row dicts, next cursor or None)
+            
+        Raises:
+            InvalidCursor: If cursor is malformed
+        """
+        sender = aliased(User)
+        recipient = aliased(User)
+        
+        query = db.session.query(
+            Notification.id,
+            Notification.title,
+            Notification.content,
+            Notification.notification_type,
+            Notification.timestamp,
+            Notification.sender_id,
+            Notification.recipient_type,
+            sender.username,
+            recipient.username,
+            Squad.name
+        ).outerjoin(
+            sender, sender.id == Notification.sender_id
+        ).outerjoin(
+            recipient, recipient.id == Notification.recipient_id
+        ).outerjoin(
+            Squad, Squad.id == Notification.squad_id
+        )
+        
+        if cursor:
+            last_timestamp, last_id = decode_cursor(cursor, types=(datetime, int))
+            query = query.filter(or_(
+                Notification.timestamp < last_timestamp,
+                and_(Notification.timestamp == last_timestamp, Notification.id < last_id)
+            ))
+        
+        rows = query.order_by(
+            Notification.timestamp.desc(), Notification.id.desc()
+        ).limit(limit + 1).all()
+        
+        feed = []
+        for (notification_id, title, content, notification_type, timestamp, sender_id,
+             recipient_type, sender_name, recipient_name, squad_name) in rows[:limit]:
+            if recipient_type == 'user':
+                recipient_name = recipient_name or 'Unknown User'
+            elif recipient_type == 'squad':
+                recipient_name = squad_name or 'Unknown Squad'
+            else:
+                recipient_name = 'All Users'
+            
+            feed.append({
+                'id': notification_id,
+                'title': title,
+                'message': content,
+                'type': notification_type,
+                'created_at': timestamp.isoformat() if timestamp else None,
+                'sender_id': sender_id,
+                'sender_name': sender_name or 'Unknown',
+                'recipient_type': recipient_type,
+                'recipient_name': recipient_name
+            })
+        
+        next_cursor = None
+        if len(rows) > limit and rows[limit - 1].timestamp is not None:
+            next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id)
+        
+        return feed, next_cursor
+    
+    @staticmethod
+    def get_unread_counts(user_id):
+        """
+        Get a user's unread notification counts by message type.
         
-        return notifications
+        Args:
+            user_id (int): User ID
+            
+        Returns:
+            dict: {message_type: unread count}
+        """
+        return InboxService.get_unread_counts(user_id)
     
     @staticmethod
     def get_unread_count(user_id):
@@ -186,7 +395,20 @@ class NotificationService:
         Returns:
             int: Count of unread notifications
         """
-        return Message.query.filter_by(
-            receiver_id=user_id, 
-            is_read=False
-        ).count()
+        return sum(NotificationService.get_unread_counts(user_id).values())
+
+
+@event.listens_for(Notification, 'after_insert')
+def _publish_new_notification(mapper, connection, target):
+    session = object_session(target)
+    if session is None or not target.recipient_id:
+        return
+    publish_after_commit(session, user_channel(target.recipient_id), 'notification', {
+        'kind': 'notification',
+        'id': target.id,
+        'title': target.title,
+        'content': target.content,
+        'sender_id': target.sender_id,
+        'created_at': target.timestamp.isoformat() if target.timestamp else None,
+        'message_type': target.notification_type
+    })
@@ -0,0 +1,105 @@
+"""
+Roster service for Simply Rugby.
+This module builds squad player lists for the coach pages in a fixed number of queries.
+"""
+from collections import namedtuple
+from app import db
+from app.models.squad import Squad
+from app.models.player import Player
+from app.models.user import User
+from app.services.skill_index_service import SkillIndexService
+
+
+# Lightweight, read-only player row used by roster pages
+RosterPlayer = namedtuple('RosterPlayer', [
+    'id',
+    'user_id',
+    'name',
+    'squad_id',
+    'squad_name',
+    'position',
+    'has_health_issues',
+    'injuries',
+    'skills',
+    'user_info'
+])
+
+
+class RosterService:
+    """
+    Service for loading squad rosters.
+    """
+
+    @staticmethod
+    def get_squads(squad_ids):
+        """
+        Get Squad objects for a set of squad IDs, ordered by name.
+
+        Args:
+            squad_ids (iterable): Squad IDs
+
+        Returns:
+            list: List of Squad objects
+        """
+        squad_ids = list(squad_ids or [])
+        if not squad_ids:
+            return []
+        return Squad.query.filter(Squad.id.in_(squad_ids)).order_by(Squad.name).all()
+
+    @staticmethod
+    def get_rosters(squad_ids, include_skills=False):
+        """
+        Get the players of several squads.
+
+        Players, their users and squad names are loaded with one joined
+        query; current skill levels, when requested, with one more. Each row
+        carries its User as user_info, like the Player objects the roster
+        templates were written for.
+
+        Args:
+            squad_ids (iterable): Squad IDs
+            include_skills (bool): Attach current core skill levels to each row
+
+        Returns:
+            dict: {squad_id: [RosterPlayer]} with an entry for every requested squad
+        """
+        squad_ids = list(set(squad_ids or []))
+        rosters = {squad_id: [] for squad_id in squad_ids}
+        if not squad_ids:
+            return rosters
+
+        rows = db.session.query(
+            Player.id,
+            Player.user_id,
+            Player.squad_id,
+            Player.preferred_positions,
+            Player.health_issues,
+            User,
+            Squad.name
+        ).join(
+            User, User.id == Player.user_id
+        ).join(
+            Squad, Squad.id == Player.squad_id
+        ).filter(
+            Player.squad_id.in_(squad_ids)
+        ).order_by(User.name).all()
+
+        skill_map = {}
+        if include_skills:
+            skill_map = SkillIndexService.get_player_skill_map([row[0] for row in rows])
+
+        for player_id, user_id, squad_id, position, health_issues, user, squad_name in rows:
+            rosters[squad_id].append(RosterPlayer(
+                id=player_id,
+                user_id=user_id,
+                name=user.name,
+                squad_id=squad_id,
+                squad_name=squad_name,
+                position=position,
+                has_health_issues=bool(health_issues),
+                injuries=(),  # 暂时跳过伤病查询，因为injuries表不存在
+                skills=skill_map.get(player_id, {}).get('skills', {}),
+                user_info=user
+            ))
+
+        return rosters
@@ -0,0 +1,221 @@
+"""
+Segment service for Simply Rugby.
+This module compiles audience segments for targeted notifications into a single SQL query.
+"""
+from app import db
+from app.models.user import User
+from app.models.player import Player
+from app.models.junior_player import JuniorPlayer
+from app.models.coach import Coach
+from app.models.training_plan import TrainingPlan, TrainingSession, PlayerAttendance
+from sqlalchemy import exists, false, func, or_, select
+from datetime import date, timedelta
+
+
+def _as_list(value):
+    """Treat a single string as a one-item list rather than a list of characters."""
+    if isinstance(value, str):
+        return [value]
+    return list(value or [])
+
+
+class Segment:
+    """
+    An audience definition. Every set filter narrows the audience; within a
+    filter, listed values are alternatives. Squad, member kind, position and
+    consent filters must all match the same player, junior player or coach
+    record.
+    """
+
+    MEMBER_KINDS = ('junior', 'adult')
+    CONSENT_STATES = ('signed', 'missing')
+
+    def __init__(self, roles=None, squad_ids=None, member_kind=None, positions=None,
+                 min_age=None, max_age=None, consent=None, missed_training_days=None):
+        """
+        Args:
+            roles (list or str, optional): User types ('player', 'coach', ...)
+            squad_ids (list or str, optional): Squads the member plays in or coaches
+            member_kind (str, optional): 'junior' or 'adult' players only
+            positions (list or str, optional): Preferred (adult) or registered (junior) positions
+            min_age (int, optional): Minimum age in years, from date of birth
+            max_age (int, optional): Maximum age in years, from date of birth
+            consent (str, optional): Junior consent 'signed' or 'missing'
+            missed_training_days (int, optional): Adult players whose squad trained in
+                this many past days without them being marked present
+
+        Raises:
+            ValueError: If a filter value is invalid
+        """
+        if member_kind is not None and member_kind not in self.MEMBER_KINDS:
+            raise ValueError(f'Invalid member kind: {member_kind}')
+        if consent is not None and consent not in self.CONSENT_STATES:
+            raise ValueError(f'Invalid consent status: {consent}')
+        if min_age is not None and max_age is not None and min_age > max_age:
+            raise ValueError('Minimum age must not be greater than maximum age')
+        if missed_training_days is not None and missed_training_days < 1:
+            raise ValueError('Missed training days must be at least 1')
+
+        self.roles = _as_list(roles)
+        self.squad_ids = [int(squad_id) for squad_id in _as_list(squad_ids)]
+        self.member_kind = member_kind
+        self.positions = _as_list(positions)
+        self.min_age = min_age
+        self.max_age = max_age
+        self.consent = consent
+        self.missed_training_days = missed_training_days
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a segment from request data, ignoring empty values.
+
+        Raises:
+            ValueError: If a filter value is invalid
+        """
+        def optional_int(key):
+            value = data.get(key)
+            return int(value) if value not in (None, '') else None
+
+        try:
+            return cls(
+                roles=data.get('roles'),
+                squad_ids=data.get('squad_ids'),
+                member_kind=data.get('member_kind') or None,
+                positions=data.get('positions'),
+                min_age=optional_int('min_age'),
+                max_age=optional_int('max_age'),
+                consent=data.get('consent') or None,
+                missed_training_days=optional_int('missed_training_days')
+            )
+        except TypeError:
+            raise ValueError('Invalid segment')
+
+    def to_dict(self):
+        """Filter values as accepted by from_dict, with unset filters left out."""
+        return {
+            name: getattr(self, name)
+            for name in ('roles', 'squad_ids', 'member_kind', 'positions', 'min_age', 'max_age',
+                         'consent', 'missed_training_days')
+            if getattr(self, name) not in (None, [])
+        }
+
+    def describe(self):
+        """Short description used for fan-out job progress."""
+        parts = []
+        for name in ('roles', 'squad_ids', 'member_kind', 'positions', 'min_age', 'max_age',
+                     'consent', 'missed_training_days'):
+            value = getattr(self, name)
+            if value not in (None, []):
+                parts.append(f'{name}={value}')
+        return 'segment:' + (','.join(parts) or 'all')
+
+
+class SegmentService:
+    """
+    Service for compiling segments into recipient queries.
+    """
+
+    @staticmethod
+    def _years_ago(years, today):
+        try:
+            return today.replace(year=today.year - years)
+        except ValueError:
+            # 2 月 29 日
+            return today.replace(year=today.year - years, day=28)
+
+    @staticmethod
+    def compile(segment, today=None):
+        """
+        Compile a segment into one SELECT of distinct user IDs.
+
+        Every filter is a condition or correlated EXISTS on Users, so the
+        database evaluates the whole segment and no recipient list is built
+        in Python. Membership filters are combined inside one EXISTS per
+        membership table, so a user only matches through a single record:
+        an adult in squad 1 who is a junior player in squad 2 does not match
+        squad 1 with junior members.
+
+        Args:
+            segment (Segment): Audience definition
+            today (date, optional): Reference date for ages and attendance
+
+        Returns:
+            Select: Query with a single user_id column
+        """
+        today = today or date.today()
+        conditions = []
+
+        if segment.roles:
+            conditions.append(User.user_type.in_(segment.roles))
+
+        # 同一条球员/青少年球员/教练记录需满足全部成员条件
+        adult_conditions = [Player.user_id == User.id]
+        junior_conditions = [JuniorPlayer.user_id == User.id]
+        coach_conditions = [Coach.user_id == User.id]
+        if segment.squad_ids:
+            adult_conditions.append(Player.squad_id.in_(segment.squad_ids))
+            junior_conditions.append(JuniorPlayer.squad_id.in_(segment.squad_ids))
+            coach_conditions.append(Coach.squad_id.in_(segment.squad_ids))
+        if segment.positions:
+            adult_conditions.append(Player.preferred_positions.in_(segment.positions))
+            junior_conditions.append(JuniorPlayer.position.in_(segment.positions))
+        if segment.consent == 'signed':
+            junior_conditions.append(JuniorPlayer.consent_signed.is_(True))
+        elif segment.consent == 'missing':
+            junior_conditions.append(
+                or_(JuniorPlayer.consent_signed.is_(False), JuniorPlayer.consent_signed.is_(None)))
+
+        if segment.squad_ids or segment.member_kind or segment.positions or segment.consent:
+            memberships = []
+            if segment.member_kind != 'junior' and not segment.consent:
+                memberships.append(exists().where(*adult_conditions))
+            if segment.member_kind != 'adult':
+                memberships.append(exists().where(*junior_conditions))
+            if not (segment.member_kind or segment.positions or segment.consent):
+                # 只按球队筛选时也包括该队教练
+                memberships.append(exists().where(*coach_conditions))
+            conditions.append(or_(*memberships) if memberships else false())
+
+        if segment.min_age is not None:
+            conditions.append(User.dob <= SegmentService._years_ago(segment.min_age, today))
+        if segment.max_age is not None:
+            # 未满 max_age + 1 岁
+            conditions.append(User.dob > SegmentService._years_ago(segment.max_age + 1, today))
+
+        if segment.missed_training_days:
+            since = today - timedelta(days=segment.missed_training_days)
+            squad_trained = exists().where(
+                TrainingPlan.squad_id == Player.squad_id,
+                TrainingSession.training_plan_id == TrainingPlan.id,
+                TrainingSession.date >= since,
+                TrainingSession.date < today
+            )
+            attended = exists().where(
+                PlayerAttendance.player_id == Player.id,
+                PlayerAttendance.status == 'present',
+                TrainingSession.id == PlayerAttendance.session_id,
+                TrainingSession.date >= since,
+                TrainingSession.date < today
+            )
+            conditions.append(exists().where(
+                *adult_conditions,
+                squad_trained,
+                ~attended
+            ))
+
+        return select(User.id.label('user_id')).where(*conditions).distinct()
+
+    @staticmethod
+    def count(segment):
+        """
+        Count the members of a segment without sending anything.
+
+        Args:
+            segment (Segment): Audience definition
+
+        Returns:
+            int: Number of recipients
+        """
+        recipients = SegmentService.compile(segment).subquery()
+        return db.session.execute(select(func.count()).select_from(recipients)).scalar()
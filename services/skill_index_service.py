@@ -0,0 +1,256 @@
+"""
+Skill index service for Simply Rugby.
+This module maintains the PlayerSkillLevels table, a materialized index of the
+latest SkillAssessment for every player, skill and sub-skill.
+
+A skill's own level (sub_skill '') is the latest assessment of that skill
+type of any sub-skill, as the per-skill queries it replaced returned.
+"""
+from app import db
+from app.models.skill_assessment import SkillAssessment
+from app.models.player_skill_level import PlayerSkillLevel
+from app.utils.upsert import build_upsert
+from sqlalchemy import event, func, literal, or_, select, union_all
+from sqlalchemy.orm.attributes import get_history
+from datetime import datetime
+
+
+# Columns written into PlayerSkillLevels, in insert order
+_INDEX_COLUMNS = [
+    'player_id', 'junior_player_id', 'skill_type', 'sub_skill',
+    'skill_level', 'assessment_id', 'assessment_date', 'updated_at'
+]
+
+
+class SkillIndexService:
+    """
+    Service for reading and maintaining the current skill level index.
+    """
+
+    @staticmethod
+    def get_player_skill_map(player_ids, skill_types=None):
+        """
+        Get the current skill levels for a set of adult players.
+
+        Args:
+            player_ids (iterable): Player IDs
+            skill_types (list, optional): Restrict to these skill types
+
+        Returns:
+            dict: {player_id: {'skills': {...}, 'sub_skills': {...}, 'last_assessment_date': date}}
+        """
+        return SkillIndexService._skill_map('player_id', player_ids, skill_types)
+
+    @staticmethod
+    def get_junior_skill_map(junior_player_ids, skill_types=None):
+        """
+        Get the current skill levels for a set of junior players.
+
+        Args:
+            junior_player_ids (iterable): JuniorPlayer IDs
+            skill_types (list, optional): Restrict to these skill types
+
+        Returns:
+            dict: Same structure as get_player_skill_map, keyed by junior player ID
+        """
+        return SkillIndexService._skill_map('junior_player_id', junior_player_ids, skill_types)
+
+    @staticmethod
+    def _skill_map(owner_column, owner_ids, skill_types=None):
+        owner_ids = list(set(owner_ids or []))
+        if not owner_ids:
+            return {}
+
+        owner = getattr(PlayerSkillLevel, owner_column)
+        query = db.session.query(
+            owner,
+            PlayerSkillLevel.skill_type,
+            PlayerSkillLevel.sub_skill,
+            PlayerSkillLevel.skill_level,
+            PlayerSkillLevel.assessment_date
+        ).filter(owner.in_(owner_ids))
+
+        if skill_types:
+            query = query.filter(PlayerSkillLevel.skill_type.in_(skill_types))
+
+        skill_map = {}
+        for owner_id, skill_type, sub_skill, level, assessment_date in query.all():
+            entry = skill_map.setdefault(owner_id, {
+                'skills': {},
+                'sub_skills': {},
+                'last_assessment_date': None
+            })
+            if sub_skill:
+                entry['sub_skills'].setdefault(skill_type, {})[sub_skill] = level
+            else:
+                entry['skills'][skill_type] = level
+                if assessment_date and (entry['last_assessment_date'] is None
+                                        or assessment_date > entry['last_assessment_date']):
+                    entry['last_assessment_date'] = assessment_date
+
+        return skill_map
+
+    @staticmethod
+    def refresh_key(connection, owner_column, owner_id, skill_type, sub_skill):
+        """
+        Recompute a single index entry from the assessment history.
+
+        Runs on the given connection so it shares the caller's transaction.
+        The entry is written with an upsert, so concurrent assessments for
+        the same key do not collide on the unique constraint.
+
+        Args:
+            connection: SQLAlchemy connection
+            owner_column (str): 'player_id' or 'junior_player_id'
+            owner_id (int): Player or junior player ID
+            skill_type (str): Skill type
+            sub_skill (str): Sub-skill name, or None/'' for the skill itself
+                (latest assessment of the skill type, any sub-skill)
+        """
+        if owner_id is None or skill_type is None:
+            return
+
+        sub_skill = sub_skill or ''
+        assessments = SkillAssessment.__table__
+        index = PlayerSkillLevel.__table__
+
+        connection.execute(index.delete().where(
+            index.c[owner_column] == owner_id,
+            index.c.skill_type == skill_type,
+            index.c.sub_skill == sub_skill
+        ))
+
+        conditions = [
+            assessments.c[owner_column] == owner_id,
+            assessments.c.skill_type == skill_type
+        ]
+        if sub_skill:
+            conditions.append(assessments.c.sub_skill == sub_skill)
+
+        latest = select(
+            assessments.c.player_id,
+            assessments.c.junior_player_id,
+            assessments.c.skill_type,
+            literal(sub_skill),
+            assessments.c.skill_level,
+            assessments.c.id,
+            assessments.c.assessment_date,
+            literal(datetime.utcnow())
+        ).where(*conditions).order_by(
+            assessments.c.assessment_date.desc(),
+            assessments.c.id.desc()
+        ).limit(1)
+
+        # 删除后再写入：没有评估时条目被移除，有评估时用 upsert 避免并发冲突
+        connection.execute(build_upsert(
+            connection, index, [owner_column, 'skill_type', 'sub_skill'],
+            lambda incoming, table: {
+                column: getattr(incoming, column)
+                for column in _INDEX_COLUMNS
+                if column not in (owner_column, 'skill_type', 'sub_skill')
+            },
+            select=latest,
+            columns=_INDEX_COLUMNS
+        ))
+
+    @staticmethod
+    def rebuild():
+        """
+        Rebuild the whole index from SkillAssessment.
+
+        Returns:
+            int: Number of index rows written
+        """
+        assessments = SkillAssessment.__table__
+        index = PlayerSkillLevel.__table__
+        sub_skill = func.coalesce(assessments.c.sub_skill, '')
+        owner = (assessments.c.player_id, assessments.c.junior_player_id, assessments.c.skill_type)
+        newest_first = (assessments.c.assessment_date.desc(), assessments.c.id.desc())
+
+        ranked = select(
+            assessments.c.player_id,
+            assessments.c.junior_player_id,
+            assessments.c.skill_type,
+            sub_skill.label('sub_skill'),
+            assessments.c.skill_level,
+            assessments.c.id.label('assessment_id'),
+            assessments.c.assessment_date,
+            func.row_number().over(
+                partition_by=owner + (sub_skill,), order_by=newest_first
+            ).label('sub_skill_rank'),
+            func.row_number().over(
+                partition_by=owner, order_by=newest_first
+            ).label('skill_rank')
+        ).where(
+            or_(assessments.c.player_id.isnot(None), assessments.c.junior_player_id.isnot(None))
+        ).subquery()
+
+        def latest(sub_skill_column, *conditions):
+            return select(
+                ranked.c.player_id,
+                ranked.c.junior_player_id,
+                ranked.c.skill_type,
+                sub_skill_column,
+                ranked.c.skill_level,
+                ranked.c.assessment_id,
+                ranked.c.assessment_date,
+                literal(datetime.utcnow())
+            ).where(*conditions)
+
+        # 子技能取该子技能的最新评估；技能本身取该技能类型的最新评估（含子技能）
+        rows = union_all(
+            latest(ranked.c.sub_skill, ranked.c.sub_skill_rank == 1, ranked.c.sub_skill != ''),
+            latest(literal(''), ranked.c.skill_rank == 1)
+        )
+
+        try:
+            db.session.execute(index.delete())
+            db.session.execute(index.insert().from_select(_INDEX_COLUMNS, rows))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return db.session.query(func.count(PlayerSkillLevel.id)).scalar()
+
+
+def _assessment_keys(target, include_previous=False):
+    """Collect the index keys touched by an assessment write."""
+    keys = set()
+    for owner_column in ('player_id', 'junior_player_id'):
+        keys.add((
+            owner_column,
+            getattr(target, owner_column),
+            target.skill_type,
+            target.sub_skill or ''
+        ))
+
+    if include_previous:
+        # 评估被修改时，旧的键也需要重新计算
+        previous = {}
+        for attr in ('player_id', 'junior_player_id', 'skill_type', 'sub_skill'):
+            deleted = get_history(target, attr).deleted
+            previous[attr] = deleted[0] if deleted else getattr(target, attr)
+        for owner_column in ('player_id', 'junior_player_id'):
+            keys.add((
+                owner_column,
+                previous[owner_column],
+                previous['skill_type'],
+                previous['sub_skill'] or ''
+            ))
+
+    # 子技能评估也会改变技能本身的最新等级
+    return keys | {key[:3] + ('',) for key in keys}
+
+
+@event.listens_for(SkillAssessment, 'after_insert')
+@event.listens_for(SkillAssessment, 'after_delete')
+def _refresh_index_on_write(mapper, connection, target):
+    for key in _assessment_keys(target):
+        SkillIndexService.refresh_key(connection, *key)
+
+
+@event.listens_for(SkillAssessment, 'after_update')
+def _refresh_index_on_update(mapper, connection, target):
+    for key in _assessment_keys(target, include_previous=True):
+        SkillIndexService.refresh_key(connection, *key)
@@ -0,0 +1,164 @@
+"""
+Squad skill aggregation service for Simply Rugby.
+This module computes squad level skill statistics from the current skill index.
+"""
+from app import db
+from app.models.squad import Squad
+from app.models.player import Player
+from app.models.player_skill_level import PlayerSkillLevel
+from sqlalchemy import and_, case, func, select
+
+
+class SquadSkillService:
+    """
+    Service for aggregating player skill levels per squad.
+    """
+
+    # The 5 core skills shown on squad radar charts
+    CORE_SKILLS = ['Passing', 'Tackling', 'Kicking', 'Running', 'Teamwork']
+
+    # Skill levels are assessed on a 1-5 scale
+    SKILL_LEVELS = [1, 2, 3, 4, 5]
+
+    @staticmethod
+    def aggregate(squad_ids, skill_types=None, include_players=False):
+        """
+        Get skill statistics for one or more squads.
+
+        Squad totals, mean, min, max and the level distribution for every
+        skill are computed by a single GROUP BY statement over the skill index;
+        the median is derived from the distribution.
+
+        Args:
+            squad_ids (iterable): Squad IDs
+            skill_types (list, optional): Skills to aggregate, defaults to CORE_SKILLS
+            include_players (bool): Also return each player's current levels
+
+        Returns:
+            dict: {squad_id: squad statistics}
+        """
+        squad_ids = sorted(set(squad_ids or []))
+        if not squad_ids:
+            return {}
+
+        skill_types = skill_types or SquadSkillService.CORE_SKILLS
+
+        player_count = select(func.count(Player.id)).where(
+            Player.squad_id == Squad.id
+        ).correlate(Squad).scalar_subquery()
+
+        # Out-of-range levels are clamped into the lowest/highest bucket so the
+        # distribution always counts every assessed player
+        lowest, highest = SquadSkillService.SKILL_LEVELS[0], SquadSkillService.SKILL_LEVELS[-1]
+        clamped_level = case(
+            (PlayerSkillLevel.skill_level < lowest, lowest),
+            (PlayerSkillLevel.skill_level > highest, highest),
+            else_=PlayerSkillLevel.skill_level
+        )
+        distribution_columns = [
+            func.sum(case((clamped_level == level, 1), else_=0)).label(f'level_{level}')
+            for level in SquadSkillService.SKILL_LEVELS
+        ]
+
+        rows = db.session.query(
+            Squad.id,
+            Squad.name,
+            player_count.label('player_count'),
+            PlayerSkillLevel.skill_type,
+            func.count(PlayerSkillLevel.id),
+            func.avg(PlayerSkillLevel.skill_level),
+            func.min(PlayerSkillLevel.skill_level),
+            func.max(PlayerSkillLevel.skill_level),
+            *distribution_columns
+        ).outerjoin(
+            Player, Player.squad_id == Squad.id
+        ).outerjoin(
+            PlayerSkillLevel, and_(
+                PlayerSkillLevel.player_id == Player.id,
+                PlayerSkillLevel.sub_skill == '',
+                PlayerSkillLevel.skill_type.in_(skill_types)
+            )
+        ).filter(
+            Squad.id.in_(squad_ids)
+        ).group_by(
+            Squad.id, Squad.name, PlayerSkillLevel.skill_type
+        ).all()
+
+        results = {}
+        for row in rows:
+            squad_id, squad_name, squad_size, skill_type, assessed, mean, low, high = row[:8]
+            squad = results.setdefault(squad_id, {
+                'squad_id': squad_id,
+                'squad_name': squad_name,
+                'player_count': squad_size or 0,
+                'skills': {}
+            })
+            if skill_type is None:
+                continue
+
+            distribution = {
+                level: int(count or 0)
+                for level, count in zip(SquadSkillService.SKILL_LEVELS, row[8:])
+            }
+            squad['skills'][skill_type] = {
+                'assessed_count': assessed,
+                'mean': round(float(mean), 1) if mean is not None else None,
+                'median': SquadSkillService._median(distribution),
+                'min': low,
+                'max': high,
+                'distribution': distribution
+            }
+
+        for squad in results.values():
+            # Unassessed skills keep the historical default of 1
+            squad['average_skills'] = {
+                skill: squad['skills'][skill]['mean'] if skill in squad['skills'] else 1
+                for skill in skill_types
+            }
+
+        if include_players:
+            SquadSkillService._attach_player_levels(results, squad_ids, skill_types)
+
+        return results
+
+    @staticmethod
+    def _attach_player_levels(results, squad_ids, skill_types):
+        """Add each player's current core skill levels to the squad results."""
+        rows = db.session.query(
+            Player.squad_id,
+            Player.id,
+            PlayerSkillLevel.skill_type,
+            PlayerSkillLevel.skill_level
+        ).join(
+            PlayerSkillLevel, PlayerSkillLevel.player_id == Player.id
+        ).filter(
+            Player.squad_id.in_(squad_ids),
+            PlayerSkillLevel.sub_skill == '',
+            PlayerSkillLevel.skill_type.in_(skill_types)
+        ).all()
+
+        for squad in results.values():
+            squad['players'] = {}
+        for squad_id, player_id, skill_type, level in rows:
+            if squad_id in results:
+                results[squad_id]['players'].setdefault(player_id, {})[skill_type] = level
+
+    @staticmethod
+    def _median(distribution):
+        """Compute the median from a {level: count} histogram."""
+        total = sum(distribution.values())
+        if total == 0:
+            return None
+
+        # Positions of the middle value(s), 0-based
+        middle = [(total - 1) // 2, total // 2]
+        values = []
+        seen = 0
+        for level in sorted(distribution):
+            count = distribution[level]
+            for position in middle:
+                if seen <= position < seen + count:
+                    values.append(level)
+            seen += count
+
+        return round(sum(values) / len(values), 1)
@@ -0,0 +1,135 @@
+"""
+Training schedule service for Simply Rugby.
+This module creates and re-plans the sessions of a training plan from a recurrence rule.
+"""
+import logging
+from app import db
+from app.models.training_plan import TrainingSession, PlayerAttendance
+from app.services.calendar_service import CalendarService
+from app.services.ical_service import ICalService
+from sqlalchemy import bindparam, delete, exists, insert, select, update
+from datetime import datetime, time
+
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingScheduleService:
+    """
+    Service for generating training sessions.
+    """
+
+    # Times used for new sessions when the rule does not set any
+    DEFAULT_START_TIME = time(9, 0)
+    DEFAULT_END_TIME = time(11, 0)
+
+    @staticmethod
+    def sync_plan_sessions(plan, rule):
+        """
+        Make a plan's sessions match a recurrence rule.
+
+        Existing sessions are diffed against the rule instead of being
+        recreated: missing dates are added with one bulk insert, sessions
+        whose times changed are updated in one batch, and future sessions
+        that no longer match are removed unless they are completed or have
+        attendance recorded.
+
+        Pending changes to the plan itself are committed in the same
+        transaction, so a new or edited plan is never saved without its
+        sessions; on failure both are rolled back.
+
+        Args:
+            plan (TrainingPlan): Plan to schedule
+            rule (RecurrenceRule): Recurrence rule
+
+        Returns:
+            dict: Counts of created, updated, removed and kept sessions, or None on failure
+        """
+        table = TrainingSession.__table__
+        try:
+            existing = db.session.query(
+                TrainingSession.id,
+                TrainingSession.date,
+                TrainingSession.start_time,
+                TrainingSession.end_time,
+                TrainingSession.status
+            ).filter(TrainingSession.training_plan_id == plan.id).all()
+
+            sessions_by_date = {}
+            for session in existing:
+                sessions_by_date.setdefault(session.date, []).append(session)
+
+            desired = {occurrence.date: occurrence for occurrence in rule}
+
+            new_rows = []
+            time_changes = []
+            for session_date, occurrence in desired.items():
+                sessions = sessions_by_date.get(session_date)
+                if not sessions:
+                    new_rows.append({
+                        'training_plan_id': plan.id,
+                        'date': session_date,
+                        'start_time': occurrence.start_time or TrainingScheduleService.DEFAULT_START_TIME,
+                        'end_time': occurrence.end_time or TrainingScheduleService.DEFAULT_END_TIME
+                    })
+                    continue
+                if occurrence.start_time is None and occurrence.end_time is None:
+                    continue
+                for session in sessions:
+                    start_time = occurrence.start_time or session.start_time
+                    end_time = occurrence.end_time or session.end_time
+                    if session.status != 'completed' and (start_time, end_time) != (session.start_time, session.end_time):
+                        time_changes.append({'_id': session.id, '_start': start_time, '_end': end_time})
+
+            today = datetime.now().date()
+            stale_ids = [
+                session.id
+                for session_date, sessions in sessions_by_date.items()
+                if session_date not in desired and session_date >= today
+                for session in sessions
+                if session.status != 'completed'
+            ]
+
+            if new_rows:
+                db.session.execute(insert(table).values(new_rows))
+
+            if time_changes:
+                db.session.execute(
+                    update(table).where(table.c.id == bindparam('_id')).values(
+                        start_time=bindparam('_start'),
+                        end_time=bindparam('_end')
+                    ),
+                    time_changes
+                )
+
+            removed = 0
+            if stale_ids:
+                attendance = PlayerAttendance.__table__
+                result = db.session.execute(
+                    delete(table).where(
+                        table.c.id.in_(stale_ids),
+                        ~exists(select(attendance.c.id).where(attendance.c.session_id == table.c.id))
+                    )
+                )
+                removed = result.rowcount
+
+            # 批量语句不触发 ORM 事件，手动让日历和订阅缓存失效；
+            # 计划本身的修改（标题、球队）由 ORM 钩子处理
+            changed_ids = set(stale_ids) | {change['_id'] for change in time_changes}
+            changed_dates = {row['date'] for row in new_rows}
+            changed_dates.update(session.date for session in existing if session.id in changed_ids)
+            CalendarService.invalidate_after_commit(db.session, changed_dates)
+            if new_rows or time_changes or removed:
+                ICalService.invalidate_after_commit(db.session, [plan.squad_id])
+
+            db.session.commit()
+            return {
+                'created': len(new_rows),
+                'updated': len(time_changes),
+                'removed': removed,
+                'kept': len(existing) - len(time_changes) - removed
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error generating training sessions: %s", e)
+            return None
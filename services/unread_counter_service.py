@@ -0,0 +1,186 @@
+"""
+Unread counter service for Simply Rugby.
+This module maintains the per-user unread personal message counters used by the inbox badge.
+"""
+from app import db
+from app.models.message import Message
+from app.models.unread_counter import UnreadCounter
+from app.utils.upsert import build_upsert
+from sqlalchemy import case, delete, func, literal, select, true, update
+from datetime import datetime
+
+
+class UnreadCounterService:
+    """
+    Service for reading and updating unread message counters.
+
+    Write methods only add statements to the current session; callers
+    commit them together with the messages they describe.
+    """
+
+    @staticmethod
+    def _increment_statement(values=None, select=None):
+        """Build an upsert adding incoming unread_count to existing counters."""
+        return build_upsert(
+            db.session, UnreadCounter.__table__, ['user_id', 'message_type'],
+            lambda incoming, table: {
+                'unread_count': table.c.unread_count + incoming.unread_count,
+                'updated_at': incoming.updated_at
+            },
+            values=values,
+            select=select,
+            columns=['user_id', 'message_type', 'unread_count', 'updated_at']
+        )
+
+    @staticmethod
+    def increment(user_ids, message_type, amount=1):
+        """
+        Add unread messages of one type for many users.
+
+        Args:
+            user_ids (iterable): Receiver user IDs
+            message_type (str): Type of the new messages
+            amount (int): Number of new messages per user
+        """
+        now = datetime.utcnow()
+        rows = [{
+            'user_id': user_id,
+            'message_type': message_type,
+            'unread_count': amount,
+            'updated_at': now
+        } for user_id in user_ids]
+        if rows:
+            db.session.execute(UnreadCounterService._increment_statement(values=rows))
+
+    @staticmethod
+    def increment_from_select(user_ids, message_type):
+        """
+        Add one unread message of one type for every user selected by a query.
+
+        Args:
+            user_ids (Select): Query with a single column of distinct user IDs
+            message_type (str): Type of the new messages
+        """
+        recipients = user_ids.subquery()
+        # SQLite 要求 INSERT ... SELECT ... ON CONFLICT 的 SELECT 带 WHERE，否则无法解析
+        rows = select(
+            recipients.c[0],
+            literal(message_type),
+            literal(1),
+            literal(datetime.utcnow())
+        ).where(true())
+        db.session.execute(UnreadCounterService._increment_statement(select=rows))
+
+    @staticmethod
+    def decrement(user_id, message_type, amount=1):
+        """
+        Remove unread messages of one type for a user, never going below zero.
+
+        Args:
+            user_id (int): User ID
+            message_type (str): Type of the messages that were read
+            amount (int): Number of messages that were read
+        """
+        db.session.execute(update(UnreadCounter.__table__).where(
+            UnreadCounter.user_id == user_id,
+            UnreadCounter.message_type == message_type
+        ).values(
+            unread_count=case(
+                (UnreadCounter.unread_count > amount, UnreadCounter.unread_count - amount),
+                else_=0
+            ),
+            updated_at=datetime.utcnow()
+        ))
+
+    @staticmethod
+    def decrement_counts(user_id, counts):
+        """
+        Remove unread messages of several types for a user with one UPDATE,
+        never going below zero.
+
+        Args:
+            user_id (int): User ID
+            counts (dict): {message_type: number of messages that were read}
+        """
+        if not counts:
+            return
+        amount = case(counts, value=UnreadCounter.message_type, else_=0)
+        db.session.execute(update(UnreadCounter.__table__).where(
+            UnreadCounter.user_id == user_id,
+            UnreadCounter.message_type.in_(list(counts))
+        ).values(
+            unread_count=case(
+                (UnreadCounter.unread_count > amount, UnreadCounter.unread_count - amount),
+                else_=0
+            ),
+            updated_at=datetime.utcnow()
+        ))
+
+    @staticmethod
+    def get_counts(user_id):
+        """
+        Get a user's unread message counts.
+
+        Args:
+            user_id (int): User ID
+
+        Returns:
+            dict: {message_type: unread count}, omitting zero counts
+        """
+        rows = db.session.query(
+            UnreadCounter.message_type,
+            UnreadCounter.unread_count
+        ).filter(
+            UnreadCounter.user_id == user_id,
+            UnreadCounter.unread_count > 0
+        ).all()
+        return {message_type: count for message_type, count in rows}
+
+    @staticmethod
+    def rebuild(user_ids=None):
+        """
+        Recompute counters from the Messages table in the current transaction.
+
+        Args:
+            user_ids (list, optional): Only rebuild these users
+
+        Returns:
+            int: Number of counters written
+        """
+        clear = delete(UnreadCounter.__table__)
+        unread = select(
+            Message.receiver_id,
+            Message.message_type,
+            func.count(Message.id),
+            literal(datetime.utcnow())
+        ).where(Message.is_read.is_(False))
+
+        if user_ids is not None:
+            clear = clear.where(UnreadCounter.user_id.in_(user_ids))
+            unread = unread.where(Message.receiver_id.in_(user_ids))
+
+        db.session.execute(clear)
+        result = db.session.execute(UnreadCounter.__table__.insert().from_select(
+            ['user_id', 'message_type', 'unread_count', 'updated_at'],
+            unread.group_by(Message.receiver_id, Message.message_type)
+        ))
+        return max(result.rowcount, 0)
+
+    @staticmethod
+    def reconcile(user_ids=None):
+        """
+        Rebuild counters from the Messages table and commit.
+
+        Args:
+            user_ids (list, optional): Only reconcile these users
+
+        Returns:
+            int: Number of counters written
+        """
+        try:
+            count = UnreadCounterService.rebuild(user_ids)
+            db.session.commit()
+            return count
+        except Exception:
+            db.session.rollback()
+            raise
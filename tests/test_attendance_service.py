@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from datetime import date
+from app.models.player import Player
+from app.models.training_plan import PlayerAttendance, TrainingSession
+from app.services.attendance_service import AttendanceService
+
+
+def _session_with_player(db, make_user, make_squad, make_training_session):
+    squad = make_squad()
+    player = Player(user_id=make_user('player').id, squad_id=squad.id)
+    db.session.add(player)
+    db.session.commit()
+    session = make_training_session(make_user('coach'), squad, date(2024, 3, 5))
+    return session, player
+
+
+def test_concurrent_first_registers_keep_one_row(db, make_user, make_squad, make_training_session, monkeypatch):
+    session, player = _session_with_player(db, make_user, make_squad, make_training_session)
+    # Both requests loaded the register before either of them saved it
+    monkeypatch.setattr(AttendanceService, 'get_attendance_map', staticmethod(lambda session_id: {}))
+
+    AttendanceService.record_register(session.id, [{'player_id': player.id, 'status': 'present'}])
+    AttendanceService.record_register(session.id, [{'player_id': player.id, 'status': 'absent'}])
+
+    rows = PlayerAttendance.query.filter_by(session_id=session.id).all()
+    assert [(row.player_id, row.status) for row in rows] == [(player.id, 'absent')]
+
+
+def test_session_status_is_saved_with_the_register(db, make_user, make_squad, make_training_session):
+    session, player = _session_with_player(db, make_user, make_squad, make_training_session)
+
+    result = AttendanceService.record_register(
+        session.id, [{'player_id': player.id, 'status': 'present'}], session_status='completed')
+
+    assert result == {'inserted': 1, 'updated': 0, 'unchanged': 0}
+    assert db.session.get(TrainingSession, session.id).status == 'completed'
+
+
+def test_invalid_session_status_is_rejected(db, make_user, make_squad, make_training_session):
+    session, player = _session_with_player(db, make_user, make_squad, make_training_session)
+
+    with pytest.raises(ValueError):
+        AttendanceService.record_register(
+            session.id, [{'player_id': player.id, 'status': 'present'}], session_status='finished')
+
+    assert PlayerAttendance.query.filter_by(session_id=session.id).count() == 0
@@ -0,0 +1,18 @@
+from app.utils.cache import TTLCache, bump_versions, get_versions
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache('test_ttl_cache')
+    cache.set('live', 1)
+    cache.set('expired', 2, ttl=0)
+
+    assert cache.get('live') == 1
+    assert cache.get('expired') is None
+
+
+def test_bumped_versions_change_only_their_fields():
+    before = get_versions(['test:a', 'test:b'])
+    bump_versions(['test:a'])
+
+    assert get_versions(['test:a', 'test:b']) == (before[0] + 1, before[1])
+    assert get_versions([]) == ()
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from datetime import date
+from app.models.training_plan import TrainingPlan
+from app.services.calendar_service import CalendarService
+
+DAY = date(2024, 3, 5)
+
+
+def _training_titles(grid):
+    return [(item['title'], item['squad_name']) for item in grid['events'][DAY.day]]
+
+
+def test_get_month_returns_a_copy_of_the_cached_grid(db, make_user, make_squad, make_training_session):
+    make_training_session(make_user('coach'), make_squad(), DAY)
+
+    grid = CalendarService.get_month(DAY.year, DAY.month)
+    grid['events'][DAY.day].clear()
+
+    assert len(CalendarService.get_month(DAY.year, DAY.month)['events'][DAY.day]) == 1
+
+
+def test_renaming_a_plan_or_squad_rebuilds_the_month(db, make_user, make_squad, make_training_session):
+    squad = make_squad('Colts')
+    session = make_training_session(make_user('coach'), squad, DAY, title='Scrums')
+    assert _training_titles(CalendarService.get_month(DAY.year, DAY.month)) == [('Scrums', 'Colts')]
+
+    db.session.get(TrainingPlan, session.training_plan_id).title = 'Lineouts'
+    db.session.commit()
+    assert _training_titles(CalendarService.get_month(DAY.year, DAY.month)) == [('Lineouts', 'Colts')]
+
+    squad.name = 'Under 18s'
+    db.session.commit()
+    assert _training_titles(CalendarService.get_month(DAY.year, DAY.month)) == [('Lineouts', 'Under 18s')]
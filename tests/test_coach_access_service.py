@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from app.models.coach import Coach
+from app.services.coach_access_service import CoachAccessService
+
+
+def test_access_cache_is_invalidated_after_commit(db, make_user, make_squad):
+    squad = make_squad()
+    coach_user = make_user('coach')
+    assert CoachAccessService.get_accessible_squad_ids(coach_user.id) == frozenset()
+
+    db.session.add(Coach(user_id=coach_user.id, squad_id=squad.id))
+    db.session.flush()
+
+    # A flushed but uncommitted change does not touch the cache
+    assert CoachAccessService.get_accessible_squad_ids(coach_user.id) == frozenset()
+
+    db.session.commit()
+
+    assert CoachAccessService.get_accessible_squad_ids(coach_user.id) == {squad.id}
+
+
+def test_rolled_back_change_keeps_cached_access(db, make_user, make_squad):
+    squad = make_squad()
+    coach_user = make_user('coach')
+    db.session.add(Coach(user_id=coach_user.id, squad_id=squad.id))
+    db.session.commit()
+    assert CoachAccessService.get_accessible_squad_ids(coach_user.id) == {squad.id}
+
+    coach = Coach.query.filter_by(user_id=coach_user.id).one()
+    coach.squad_id = None
+    db.session.flush()
+    db.session.rollback()
+
+    assert 'coach_access_changed_users' not in db.session.info
+    assert CoachAccessService.get_accessible_squad_ids(coach_user.id) == {squad.id}
+
+
+def test_moving_a_coach_invalidates_both_owners(db, make_user, make_squad):
+    squad = make_squad()
+    old_user, new_user = make_user('coach'), make_user('coach')
+    coach = Coach(user_id=old_user.id, squad_id=squad.id)
+    db.session.add(coach)
+    db.session.commit()
+    assert CoachAccessService.get_accessible_squad_ids(old_user.id) == {squad.id}
+    assert CoachAccessService.get_accessible_squad_ids(new_user.id) == frozenset()
+
+    coach.user_id = new_user.id
+    db.session.commit()
+
+    assert CoachAccessService.get_accessible_squad_ids(old_user.id) == frozenset()
+    assert CoachAccessService.get_accessible_squad_ids(new_user.id) == {squad.id}
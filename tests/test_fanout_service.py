@@ -0,0 +1,99 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+import uuid
+from datetime import datetime, timedelta
+from app.models.fanout_job import FanoutJob
+from app.models.message import Message
+from app.models.player import Player
+from app.services.fanout_service import FanoutService
+from app.services.inbox_service import InboxService, fanout_channel
+from app.services.unread_counter_service import UnreadCounterService
+
+
+def _squad_job(db, make_user, make_squad, players=3, **fields):
+    squad = make_squad()
+    user_ids = []
+    for _ in range(players):
+        user = make_user('player')
+        db.session.add(Player(user_id=user.id, squad_id=squad.id))
+        user_ids.append(user.id)
+    job = FanoutJob(
+        id=uuid.uuid4().hex,
+        description=f'squad:{squad.id}',
+        audience=FanoutService.squad_job_audience(squad.id),
+        sender_id=1,
+        content='Training moved to 7pm',
+        message_type='training',
+        channel=fields.pop('channel', f'squad-players:{squad.id}'),
+        **fields
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id, sorted(user_ids)
+
+
+def test_failed_job_resumes_after_last_delivered_recipient(db, make_user, make_squad, monkeypatch):
+    job_id, user_ids = _squad_job(db, make_user, make_squad)
+    monkeypatch.setattr(FanoutService, 'CHUNK_SIZE', 1)
+
+    increment = UnreadCounterService.increment_from_select
+    calls = []
+
+    def failing_increment(user_ids, message_type):
+        calls.append(message_type)
+        if len(calls) == 2:
+            raise RuntimeError('database went away')
+        return increment(user_ids, message_type)
+
+    monkeypatch.setattr(UnreadCounterService, 'increment_from_select', staticmethod(failing_increment))
+    assert FanoutService.run_job(job_id) is False
+
+    # Progress is read back from the database, as another worker would
+    db.session.expire_all()
+    job = FanoutService.get_job(job_id)
+    assert (job.status, job.written, job.last_user_id) == ('failed', 1, user_ids[0])
+
+    monkeypatch.setattr(UnreadCounterService, 'increment_from_select', staticmethod(increment))
+    assert FanoutService.claim_job(job_id)
+    assert FanoutService.run_job(job_id) is True
+
+    receivers = sorted(db.session.execute(db.select(Message.receiver_id)).scalars())
+    assert receivers == user_ids
+    assert FanoutService.get_job(job_id).written == 3
+
+
+def test_only_stalled_running_jobs_can_be_claimed(db, make_user, make_squad):
+    stale_id, _ = _squad_job(db, make_user, make_squad, status='running',
+                             updated_at=datetime.utcnow() - timedelta(hours=1))
+    fresh_id, _ = _squad_job(db, make_user, make_squad, status='running')
+
+    assert FanoutService.claim_job(stale_id, failed=False)
+    assert not FanoutService.claim_job(stale_id, failed=False)
+    assert not FanoutService.claim_job(fresh_id)
+    assert FanoutService.job_status(FanoutService.get_job(fresh_id))['stalled'] is False
+
+
+class RecordingBus:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, channel, event_type, data):
+        self.events.append((channel, event_type, data))
+
+
+def test_job_without_channel_publishes_one_event_per_batch(db, make_user, make_squad, monkeypatch):
+    job_id, user_ids = _squad_job(db, make_user, make_squad, channel=None)
+    outsider = make_user('player')
+    bus = RecordingBus()
+    monkeypatch.setattr('app.services.fanout_service.get_event_bus', lambda: bus)
+    monkeypatch.setattr(FanoutService, 'CHUNK_SIZE', 2)
+
+    assert FanoutService.run_job(job_id) is True
+
+    assert [channel for channel, _, _ in bus.events] == [fanout_channel()] * 2
+    first, second = (data['recipients'] for _, _, data in bus.events)
+    assert [InboxService.received_batch(user_id, first) for user_id in user_ids] == [True, True, False]
+    assert [InboxService.received_batch(user_id, second) for user_id in user_ids] == [False, False, True]
+    assert not InboxService.received_batch(outsider.id, second)
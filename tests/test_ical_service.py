@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from app.models.player import Player
+from app.services.ical_service import ICalService
+
+
+def _feed_status(client, token):
+    return client.get(f'/calendar/feeds/{token}.ics').status_code
+
+
+def test_rotated_token_stops_working(db, client, login, make_user, make_squad):
+    user = make_user('player')
+    db.session.add(Player(user_id=user.id, squad_id=make_squad().id))
+    db.session.commit()
+    old_token = ICalService.make_token('member', user.id, user)
+    assert _feed_status(client, old_token) == 200
+
+    login(user)
+    response = client.post('/api/calendar/feeds/rotate')
+    assert response.status_code == 200
+    new_url = response.get_json()['feeds'][0]['url']
+
+    assert _feed_status(client, old_token) == 404
+    assert client.get(new_url).status_code == 200
+
+
+def test_squad_token_stops_working_when_player_leaves(db, client, make_user, make_squad):
+    user = make_user('player')
+    squad = make_squad()
+    player = Player(user_id=user.id, squad_id=squad.id)
+    db.session.add(player)
+    db.session.commit()
+    token = ICalService.make_token('squad', squad.id, user)
+    assert _feed_status(client, token) == 200
+
+    player.squad_id = make_squad().id
+    db.session.commit()
+
+    assert _feed_status(client, token) == 404
+
+
+def test_token_for_another_users_feed_is_rejected(db, client, make_user):
+    owner, other = make_user('player'), make_user('player')
+    assert _feed_status(client, ICalService.make_token('member', owner.id, other)) == 404
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from datetime import datetime
+from app.models.message import Message
+from app.services.inbox_service import InboxService
+from app.services.unread_counter_service import UnreadCounterService
+from app.utils.pagination import InvalidCursor, encode_cursor
+
+
+def test_decode_cursor_accepts_inbox_cursor():
+    created_at = datetime(2026, 3, 1, 18, 30)
+    assert InboxService.decode_cursor(encode_cursor(created_at, 2, 15)) == [created_at, 2, 15]
+
+
+@pytest.mark.parametrize('values', [
+    (datetime(2026, 3, 1), 2, 'abc'),
+    (datetime(2026, 3, 1), 2, None),
+    (datetime(2026, 3, 1), 2, 1.5),
+    (datetime(2026, 3, 1), 5, 15),
+])
+def test_decode_cursor_rejects_invalid_values(values):
+    with pytest.raises(InvalidCursor):
+        InboxService.decode_cursor(encode_cursor(*values))
+
+
+def test_mark_read_decrements_counters_of_every_type(db, make_user):
+    user = make_user('player')
+    for message_type in ('match', 'match', 'training', 'personal'):
+        db.session.add(Message(sender_id=1, receiver_id=user.id, content='Hello', message_type=message_type))
+    UnreadCounterService.rebuild([user.id])
+    db.session.commit()
+
+    counts = InboxService.mark_read(user.id, message_types=['match', 'training'])
+
+    assert counts == {'personal': 1}
+    assert UnreadCounterService.get_counts(user.id) == {'personal': 1}
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+import queue
+from app.utils.log import DroppingQueueHandler
+from app.utils.metrics import MetricsRegistry, MultiProcessWriter, clear_multiprocess_dir, registry
+
+PREVIOUS = {
+    'jobs_total': {'type': 'counter', 'help': 'Jobs.', 'labelnames': [], 'values': [[[], 7]]},
+    'workers_busy': {'type': 'gauge', 'help': 'Busy.', 'labelnames': [], 'values': [[[], 3]]},
+}
+
+
+def test_reused_pid_keeps_counters_of_exited_process(tmp_path):
+    (tmp_path / f'metrics_{os.getpid()}.json').write_text(json.dumps(PREVIOUS))
+    writer = MultiProcessWriter(str(tmp_path), interval=5)
+
+    writer.flush(force=True)
+
+    retired = list(tmp_path.glob('exited_*.json'))
+    assert len(retired) == 1
+    assert set(json.loads(retired[0].read_text())) == {'jobs_total'}
+    merged = MetricsRegistry.merge(writer.read_all())
+    assert merged['jobs_total']['values'][()] == 7
+    assert 'workers_busy' not in merged
+
+
+def test_clear_multiprocess_dir_removes_snapshots(tmp_path, monkeypatch):
+    for name in ('metrics_1.json', 'exited_2_abcd1234.json', 'metrics_3.json.tmp', 'keep.txt'):
+        (tmp_path / name).write_text('{}')
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+
+    assert clear_multiprocess_dir() == 3
+    assert [path.name for path in tmp_path.iterdir()] == ['keep.txt']
+
+
+def _exported_drops():
+    return registry.snapshot()['log_records_dropped_total']['values'][0][1]
+
+
+def test_dropped_log_records_are_exported():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    root = logging.getLogger()
+    before = _exported_drops()
+    root.addHandler(handler)
+    try:
+        for _ in range(3):
+            handler.handle(logging.LogRecord('test', logging.INFO, __file__, 0, 'message', (), None))
+        after = _exported_drops()
+    finally:
+        root.removeHandler(handler)
+
+    assert after - before == 2
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from datetime import datetime, timedelta
+from app.models.notification import Notification
+from app.services.notification_service import NotificationService
+from app.utils.pagination import InvalidCursor, encode_cursor
+
+
+def test_recent_feed_pages_with_cursor(db, make_user):
+    sender = make_user('member_assistant')
+    recipient = make_user('player')
+    start = datetime(2026, 3, 1, 12, 0)
+    for minutes in range(5):
+        db.session.add(Notification(sender_id=sender.id, recipient_id=recipient.id, title=f'N{minutes}',
+                                    content='Hello', timestamp=start + timedelta(minutes=minutes)))
+    db.session.commit()
+
+    first, cursor = NotificationService.get_recent_feed(limit=3)
+    second, last_cursor = NotificationService.get_recent_feed(limit=3, cursor=cursor)
+
+    assert [row['title'] for row in first + second] == ['N4', 'N3', 'N2', 'N1', 'N0']
+    assert last_cursor is None
+
+
+@pytest.mark.parametrize('values', [
+    (datetime(2026, 3, 1), 'abc'),
+    (datetime(2026, 3, 1), None),
+    ('2026-03-01T00:00:00', 1),
+])
+def test_recent_feed_rejects_invalid_cursor(db, values):
+    with pytest.raises(InvalidCursor):
+        NotificationService.get_recent_feed(cursor=encode_cursor(*values))
@@ -0,0 +1,27 @@
+import pytest
+from datetime import date, datetime
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_round_trip_keeps_dates_and_datetimes():
+    values = [datetime(2026, 3, 1, 18, 30), date(2026, 3, 1), 42]
+    assert decode_cursor(encode_cursor(*values), types=(datetime, date, int)) == values
+
+
+@pytest.mark.parametrize('token', ['', '!!!', encode_cursor(1)])
+def test_malformed_or_wrong_size_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, size=2)
+
+
+@pytest.mark.parametrize('values', [
+    (datetime(2026, 3, 1), 'abc'),
+    (datetime(2026, 3, 1), 1.5),
+    (datetime(2026, 3, 1), True),
+    (datetime(2026, 3, 1), None),
+    (date(2026, 3, 1), 7),
+    ('2026-03-01T00:00:00', 7),
+])
+def test_values_of_the_wrong_type_are_rejected(values):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(*values), types=(datetime, int))
@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.utils.query_counter import QueryBudgetExceeded, init_query_counter, query_budget
+
+
+@pytest.fixture
+def engine():
+    return create_engine('sqlite://')
+
+
+@pytest.fixture
+def counted_app(engine):
+    app = Flask(__name__)
+    app.config.update(TESTING=True, QUERY_BUDGET_STRICT=True)
+    init_query_counter(app)
+
+    def run_queries(count):
+        with engine.connect() as conn:
+            for _ in range(count):
+                conn.execute(text('SELECT 1'))
+        return 'ok'
+
+    @app.route('/within')
+    @query_budget(2)
+    def within_budget():
+        return run_queries(2)
+
+    @app.route('/over')
+    @query_budget(2)
+    def over_budget():
+        return run_queries(3)
+
+    return app
+
+
+def test_request_within_budget_reports_query_count(counted_app):
+    response = counted_app.test_client().get('/within')
+    assert response.headers['X-Query-Count'] == '2'
+
+
+def test_strict_mode_raises_when_budget_is_exceeded(counted_app):
+    with pytest.raises(QueryBudgetExceeded, match='ran 3 queries, budget is 2'):
+        counted_app.test_client().get('/over')
+
+
+def test_failed_statement_does_not_leave_a_timer(engine):
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text('SELECT * FROM missing_table'))
+        assert not conn.info.get('query_start_times')
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from app.models.coach import Coach
+from app.models.player import Player
+from app.models.squad import Squad
+from app.services.roster_service import RosterService
+
+
+def _squad_with_player(db, make_user):
+    squad = Squad(name='Under 18s')
+    db.session.add(squad)
+    db.session.commit()
+    player_user = make_user('player', name='Sam Jones')
+    player = Player(user_id=player_user.id, squad_id=squad.id)
+    db.session.add(player)
+    db.session.commit()
+    return squad, player_user
+
+
+def test_roster_rows_carry_user_info(db, make_user):
+    squad, player_user = _squad_with_player(db, make_user)
+
+    players = RosterService.get_rosters([squad.id])[squad.id]
+
+    assert [player.name for player in players] == ['Sam Jones']
+    assert players[0].user_info.id == player_user.id
+    assert players[0].user_info.name == 'Sam Jones'
+
+
+def test_skill_assessment_renders_roster(db, client, login, make_user):
+    squad, _ = _squad_with_player(db, make_user)
+    coach_user = make_user('coach')
+    db.session.add(Coach(user_id=coach_user.id, squad_id=squad.id))
+    db.session.commit()
+    login(coach_user)
+
+    response = client.get('/coach/skill-assessment')
+
+    assert response.status_code == 200
+    assert b'Sam Jones' in response.data
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from app.models.coach import Coach
+from app.services.squad_skill_service import SquadSkillService
+
+
+def test_batch_squad_skills_only_aggregates_accessible_squads(db, client, login, make_user, make_squad, monkeypatch):
+    own, other = make_squad(), make_squad()
+    coach_user = make_user('coach')
+    db.session.add(Coach(user_id=coach_user.id, squad_id=own.id))
+    db.session.commit()
+    login(coach_user)
+
+    aggregated = []
+    aggregate = SquadSkillService.aggregate
+
+    def recording_aggregate(squad_ids, **kwargs):
+        aggregated.append(list(squad_ids))
+        return aggregate(squad_ids, **kwargs)
+
+    monkeypatch.setattr(SquadSkillService, 'aggregate', staticmethod(recording_aggregate))
+
+    response = client.get('/coach/api/squad-skills', query_string={'ids': f'{own.id},{other.id},9999'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert aggregated == [[own.id]]
+    assert [squad['squad_id'] for squad in data['squads']] == [own.id]
+    # Squads of other coaches look the same as squads that do not exist
+    assert data['missing_ids'] == [other.id, 9999]
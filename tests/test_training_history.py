@@ -0,0 +1,21 @@
+from app.utils.pagination import encode_cursor
+
+
+def test_hand_made_cursor_is_rejected(client, login, make_user):
+    login(make_user('coach'))
+
+    response = client.get('/coach/api/training-history', query_string={
+        'before': encode_cursor('2024-01-01', 'x')
+    })
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_per_page_is_at_least_one(client, login, make_user):
+    login(make_user('coach'))
+
+    response = client.get('/coach/api/training-history', query_string={'per_page': 0})
+
+    assert response.status_code == 200
+    assert response.get_json()['sessions'] == []
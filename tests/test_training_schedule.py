@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from datetime import date
+from app.models.training_plan import TrainingPlan
+from app.services.ical_service import ICalService
+
+
+@pytest.mark.parametrize('limit', [-5, 0])
+def test_preview_limit_is_at_least_one(client, login, make_user, limit):
+    login(make_user('coach'))
+
+    response = client.get('/coach/api/training-plan/preview', query_string={
+        'start_date': '2024/01/01',
+        'end_date': '2024/03/31',
+        'frequency': 'weekly',
+        'limit': limit
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['sessions']) == 1
+    assert data['has_more'] is True
+
+
+def test_renaming_a_plan_rebuilds_the_squad_feed(db, make_user, make_squad, make_training_session):
+    squad = make_squad()
+    session = make_training_session(make_user('coach'), squad, date.today(), title='Scrums')
+    assert 'Training: Scrums' in ICalService.get_feed('squad', squad.id).body
+
+    plan = db.session.get(TrainingPlan, session.training_plan_id)
+    plan.title = 'Lineouts'
+    db.session.commit()
+
+    body = ICalService.get_feed('squad', squad.id).body
+    assert 'Training: Lineouts' in body
+    assert 'Scrums' not in body
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip('app.models', reason='application models are not available')
+
+from sqlalchemy import select
+from app.models.user import User
+from app.services.unread_counter_service import UnreadCounterService
+
+
+def test_increment_from_select_upserts(db, make_user):
+    users = [make_user('player'), make_user('player')]
+
+    # The second call updates the rows inserted by the first through ON CONFLICT
+    for _ in range(2):
+        UnreadCounterService.increment_from_select(select(User.id), 'training')
+        db.session.commit()
+
+    for user in users:
+        assert UnreadCounterService.get_counts(user.id) == {'training': 2}
+
+
+def test_decrement_stops_at_zero(db, make_user):
+    user = make_user('player')
+    UnreadCounterService.increment([user.id], 'match', amount=2)
+    db.session.commit()
+
+    UnreadCounterService.decrement(user.id, 'match', amount=5)
+    db.session.commit()
+
+    assert UnreadCounterService.get_counts(user.id) == {}
+
+
+def test_decrement_counts_updates_each_type(db, make_user):
+    user = make_user('player')
+    UnreadCounterService.increment([user.id], 'match', amount=3)
+    UnreadCounterService.increment([user.id], 'training', amount=1)
+    UnreadCounterService.increment([user.id], 'personal', amount=2)
+    db.session.commit()
+
+    UnreadCounterService.decrement_counts(user.id, {'match': 1, 'training': 4})
+    db.session.commit()
+
+    assert UnreadCounterService.get_counts(user.id) == {'match': 2, 'personal': 2}
@@ -0,0 +1,144 @@
+"""
+Small in-process caches shared by the services, and the version counters
+used to invalidate them across workers.
+"""
+import threading
+import time
+from flask import current_app, has_app_context
+
+
+# All named caches, so hit/miss statistics can be reported in one place
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Versions bumped after every committed change and made part of cache keys, so a
+# change makes older entries unreachable. With EVENT_BUS_URL set they live in a
+# Redis hash shared by all workers; otherwise they are per process and other
+# workers serve their cached entries until those expire.
+_VERSIONS_KEY = 'simply_rugby:cache_versions'
+_versions = {}
+_versions_lock = threading.Lock()
+_redis = None
+_redis_lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache whose entries expire after a number of seconds.
+
+    Entries live in the memory of a single worker process, so keep TTLs short
+    for data that other workers may change.
+    """
+
+    def __init__(self, name, ttl=60, max_entries=10000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = threading.Lock()
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        if entry is not None:
+            with self._lock:
+                self._data.pop(key, None)
+        return default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._evict_expired()
+            if len(self._data) >= self.max_entries:
+                # 仍然太满时丢弃最早写入的条目
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, expires_at)
+
+    def delete(self, key):
+        """Drop a single entry."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_caches():
+    """Return a snapshot of all named caches."""
+    with _registry_lock:
+        return dict(_registry)
+
+
+def _shared_versions():
+    """Return the Redis client holding shared versions, or None when versions are per process."""
+    global _redis
+    url = current_app.config.get('EVENT_BUS_URL') if has_app_context() else None
+    if not url:
+        return None
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                try:
+                    import redis
+                except ImportError:
+                    raise RuntimeError('EVENT_BUS_URL is set but the redis package is not installed')
+                _redis = redis.Redis.from_url(url)
+    return _redis
+
+
+def get_versions(fields):
+    """
+    Read the current version of each field.
+
+    Args:
+        fields (list): Version names, e.g. 'squad:3'
+
+    Returns:
+        tuple: Versions in the same order, 0 for fields never bumped
+    """
+    if not fields:
+        return ()
+    shared = _shared_versions()
+    if shared is not None:
+        return tuple(int(value or 0) for value in shared.hmget(_VERSIONS_KEY, fields))
+    with _versions_lock:
+        return tuple(_versions.get(field, 0) for field in fields)
+
+
+def bump_versions(fields):
+    """Increment the version of each field, invalidating cache entries keyed by it."""
+    fields = list(fields)
+    if not fields:
+        return
+    shared = _shared_versions()
+    if shared is not None:
+        pipeline = shared.pipeline(transaction=False)
+        for field in fields:
+            pipeline.hincrby(_VERSIONS_KEY, field, 1)
+        pipeline.execute()
+        return
+    with _versions_lock:
+        for field in fields:
+            _versions[field] = _versions.get(field, 0) + 1
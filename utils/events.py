@@ -0,0 +1,174 @@
+"""
+Publish/subscribe event bus for live updates.
+
+Events are published to named channels ('user:5', 'squad:3',
+'squad-players:3', 'role:coach', 'all') and read by listeners with a
+last-seen event ID, so a reconnecting client can resume from where it
+stopped. The in-process bus only reaches listeners in the same worker; set
+EVENT_BUS_URL to a redis:// URL to share events between workers.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from flask import current_app
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+Event = namedtuple('Event', ['id', 'channel', 'type', 'data'])
+
+
+class InProcessEventBus:
+    """
+    Event bus keeping recent events in a ring buffer in this process.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self._events = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def publish(self, channel, event_type, data):
+        """Publish an event and wake up waiting listeners."""
+        with self._condition:
+            self._events.append(Event(str(next(self._ids)), channel, event_type, data))
+            self._condition.notify_all()
+
+    def listen(self, channels, last_event_id=None, timeout=15):
+        """
+        Wait for events on any of the channels newer than last_event_id.
+
+        Args:
+            channels (iterable): Channel names
+            last_event_id (str, optional): ID of the last event the caller saw
+            timeout (float): Seconds to wait when nothing is pending
+
+        Returns:
+            list: Events in publish order, empty on timeout
+        """
+        channels = set(channels)
+        try:
+            last = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last = None
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            newest = int(self._events[-1].id) if self._events else 0
+            if last is None or last > newest:
+                # 新连接（或进程重启前的事件 ID）只接收之后发布的事件
+                last = newest
+            while True:
+                pending = [item for item in self._events if int(item.id) > last and item.channel in channels]
+                remaining = deadline - time.monotonic()
+                if pending or remaining <= 0:
+                    return pending
+                self._condition.wait(remaining)
+
+    def last_event_id(self):
+        with self._condition:
+            return self._events[-1].id if self._events else None
+
+
+class RedisEventBus:
+    """
+    Event bus backed by a capped Redis stream, shared by all workers.
+
+    Requires the redis package.
+    """
+
+    def __init__(self, url, stream='simply_rugby:events', buffer_size=1000):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('EVENT_BUS_URL is set but the redis package is not installed')
+
+        self._redis = redis.Redis.from_url(url)
+        self._stream = stream
+        self._buffer_size = buffer_size
+
+    def publish(self, channel, event_type, data):
+        self._redis.xadd(self._stream, {
+            'channel': channel,
+            'type': event_type,
+            'data': json.dumps(data)
+        }, maxlen=self._buffer_size, approximate=True)
+
+    def listen(self, channels, last_event_id=None, timeout=15):
+        channels = set(channels)
+        start = last_event_id or self.last_event_id() or '0-0'
+        deadline = time.monotonic() + timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            response = self._redis.xread({self._stream: start}, block=max(int(remaining * 1000), 1))
+            if not response:
+                return []
+
+            pending = []
+            for event_id, fields in response[0][1]:
+                event_id = event_id.decode()
+                start = event_id
+                channel = fields[b'channel'].decode()
+                if channel in channels:
+                    pending.append(Event(event_id, channel, fields[b'type'].decode(), json.loads(fields[b'data'])))
+            if pending:
+                return pending
+
+    def last_event_id(self):
+        entries = self._redis.xrevrange(self._stream, count=1)
+        return entries[0][0].decode() if entries else None
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """Return the application's event bus, creating it on first use."""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                url = current_app.config.get('EVENT_BUS_URL')
+                buffer_size = current_app.config.get('EVENT_BUS_BUFFER_SIZE', 1000)
+                if url:
+                    _bus = RedisEventBus(url, buffer_size=buffer_size)
+                else:
+                    _bus = InProcessEventBus(buffer_size=buffer_size)
+    return _bus
+
+
+def publish_after_commit(session, channel, event_type, data):
+    """
+    Publish an event once the session's current transaction commits.
+
+    Events queued in a transaction that is rolled back are dropped.
+    """
+    session.info.setdefault('pending_events', []).append((channel, event_type, data))
+
+
+@sa_event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending:
+        return
+    bus = get_event_bus()
+    for channel, event_type, data in pending:
+        try:
+            bus.publish(channel, event_type, data)
+        except Exception as e:
+            logger.error("Error publishing event: %s", e)
+
+
+@sa_event.listens_for(Session, 'after_rollback')
+def _drop_pending_events(session):
+    session.info.pop('pending_events', None)
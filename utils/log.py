@@ -0,0 +1,204 @@
+"""
+Asynchronous structured logging.
+
+Log calls on the request path only put the record on a bounded in-memory
+queue; a background listener thread formats it as one JSON object per line
+and writes it out, so request latency does not depend on stdout. When the
+queue is full new records are dropped instead of blocking; the number
+dropped is exported as log_records_dropped_total by utils/metrics.py.
+
+Modules log through the standard library:
+
+    logger = logging.getLogger(__name__)
+    logger.error("Error creating game: %s", e)
+    logger.debug("Form submitted", extra={'fields': sorted(request.form)})
+
+Keys passed in extra become fields of the JSON record.
+
+Configuration:
+    LOG_LEVEL: Root level (default INFO, DEBUG when app.debug)
+    LOG_LEVELS: {logger name: level} overrides, e.g. {'sqlalchemy.engine': 'WARNING'}
+    LOG_DEBUG_SAMPLE_RATE: Share of DEBUG records kept, 0.0 to 1.0 (default 1.0);
+        a record can override it with extra={'sample_rate': ...}
+    LOG_QUEUE_SIZE: Records buffered before dropping (default 10000)
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from flask import has_request_context, request
+
+
+# Attributes every LogRecord has; anything else was passed in extra
+_RECORD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key != 'sample_rate':
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the current request to records on the calling thread, before they
+    are queued and the request context is gone.
+    """
+
+    def filter(self, record):
+        if has_request_context() and not hasattr(record, 'path'):
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps only a share of DEBUG records.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = getattr(record, 'sample_rate', self.rate)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that drops records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 只在调用线程里合并参数和异常文本，JSON 格式化留给监听线程
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # 队列满时等待监听线程腾出位置，保证停止时不丢失已排队的记录
+        self.queue.put(self._sentinel)
+
+
+def _start_listener(log_queue):
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = _QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def init_logging(app):
+    """
+    Route all logging of this process through the background queue.
+
+    Call once from create_app; later calls reconfigure levels and sampling.
+    """
+    log_queue = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000))
+
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(DebugSamplingFilter(app.config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, DroppingQueueHandler):
+            # 重新配置时保留计数，导出的计数器不会回退
+            handler.dropped += existing.dropped
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config.get('LOG_LEVEL') or ('DEBUG' if app.debug else 'INFO'))
+
+    for name, level in (app.config.get('LOG_LEVELS') or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    # Flask 的默认 handler 会同步写 stderr，交给根 logger 统一处理
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+        _start_listener(log_queue)
+
+    app.extensions['log_handler'] = handler
+
+
+def dropped_records():
+    """Return the number of log records this process dropped because the queue was full."""
+    return sum(handler.dropped for handler in logging.getLogger().handlers
+               if isinstance(handler, DroppingQueueHandler))
+
+
+def _restart_after_fork():
+    # 子进程不会继承监听线程（如 gunicorn --preload）
+    global _listener
+    # 父进程丢弃的记录已由父进程计数
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            handler.dropped = 0
+    if _listener is not None:
+        log_queue = _listener.queue
+        _listener = None
+        _start_listener(log_queue)
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
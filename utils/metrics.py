@@ -0,0 +1,445 @@
+"""
+Prometheus-compatible request, database and cache metrics.
+
+Metrics live in a per-process registry. Each metric has its own lock, held
+only while a value is updated. With gunicorn, set PROMETHEUS_MULTIPROC_DIR
+to a directory shared by the workers: each worker writes a snapshot there
+at most every METRICS_FLUSH_INTERVAL seconds, and /metrics sums the
+snapshots of all workers. Gauges of workers that have exited are skipped;
+their counters keep counting until the directory is cleared. A worker that
+gets the PID of an exited one first moves that snapshot aside, so its
+counters are not overwritten.
+
+The directory must be emptied when the master starts, or counters of the
+previous run are added forever. Call clear_multiprocess_dir from the
+gunicorn config:
+
+    def on_starting(server):
+        from app.utils.metrics import clear_multiprocess_dir
+        clear_multiprocess_dir()
+
+Configuration:
+    METRICS_ENABLED: Collect request metrics (default True)
+    METRICS_TOKEN: Bearer token required by /metrics (default None, open;
+        required by the production config)
+    METRICS_FLUSH_INTERVAL: Seconds between worker snapshots (default 5)
+    PROMETHEUS_MULTIPROC_DIR: Snapshot directory (config or environment)
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+from flask import current_app, g, request
+from app.utils.cache import get_caches
+from app.utils.log import dropped_records
+from app.utils.query_counter import get_query_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """
+    A named metric with values per label combination.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Return {labels: value} with labels as tuples."""
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class CollectedCounter(Gauge):
+    """A counter whose value is copied from elsewhere when a snapshot is taken."""
+    type = 'counter'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        with self._lock:
+            # 每个桶单独计数，输出时再累加；最后两项是 sum 和 count
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 3)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of one process and renders them in text format.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Add a callable run before every snapshot, used to refresh gauges."""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """
+        Return the current values of all metrics as a JSON-serializable dict.
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error("Error collecting metrics: %s", e)
+
+        data = {}
+        for metric in self._metrics:
+            entry = {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'values': [[list(labels), value] for labels, value in metric.snapshot().items()]
+            }
+            if metric.type == 'histogram':
+                entry['buckets'] = list(metric.buckets)
+            data[metric.name] = entry
+        return data
+
+    @staticmethod
+    def merge(snapshots):
+        """
+        Combine snapshots of several processes.
+
+        Counters and histograms are summed; gauges are summed over the
+        processes included.
+        """
+        merged = {}
+        for snapshot in snapshots:
+            for name, entry in snapshot.items():
+                target = merged.setdefault(name, dict(entry, values={}))
+                for labels, value in entry['values']:
+                    key = tuple(labels)
+                    if key not in target['values']:
+                        target['values'][key] = list(value) if isinstance(value, list) else value
+                    elif isinstance(value, list):
+                        target['values'][key] = [a + b for a, b in zip(target['values'][key], value)]
+                    else:
+                        target['values'][key] += value
+        return merged
+
+    @staticmethod
+    def render(merged):
+        """Render merged snapshots in the Prometheus text exposition format."""
+        lines = []
+        for name, entry in merged.items():
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            labelnames = entry['labelnames']
+
+            for labels, value in sorted(entry['values'].items()):
+                if entry['type'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(entry['buckets'] + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labelnames, labels, ("le", le))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-2])}')
+                lines.append(f'{name}_count{_format_labels(labelnames, labels)} {value[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total', 'HTTP requests handled.', ('blueprint', 'endpoint', 'method', 'status')))
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency in seconds.', ('blueprint', 'endpoint')))
+REQUEST_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', 'SQL queries run per HTTP request.', ('blueprint', 'endpoint'),
+    buckets=QUERY_COUNT_BUCKETS))
+DB_POOL = registry.register(Gauge(
+    'db_pool_connections', 'Database pool connections by state.', ('state',)))
+CACHE_HITS = registry.register(CollectedCounter(
+    'cache_hits_total', 'Cache hits since the process started.', ('cache',)))
+CACHE_MISSES = registry.register(CollectedCounter(
+    'cache_misses_total', 'Cache misses since the process started.', ('cache',)))
+CACHE_ENTRIES = registry.register(Gauge(
+    'cache_entries', 'Entries currently held by each cache.', ('cache',)))
+
+
+def _collect_caches():
+    for name, cache in get_caches().items():
+        CACHE_HITS.set((name,), cache.hits)
+        CACHE_MISSES.set((name,), cache.misses)
+        CACHE_ENTRIES.set((name,), len(cache))
+
+
+registry.add_collector(_collect_caches)
+
+LOG_DROPPED = registry.register(CollectedCounter(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full.'))
+
+
+def _collect_log_drops():
+    LOG_DROPPED.set((), dropped_records())
+
+
+registry.add_collector(_collect_log_drops)
+
+
+# Apps whose connection pools are reported, with their Flask-SQLAlchemy
+# extension; weak so that metrics do not keep discarded apps alive
+_pool_sources = weakref.WeakKeyDictionary()
+_POOL_STATES = (('size', 'size'), ('checked_in', 'checkedin'),
+                ('checked_out', 'checkedout'), ('overflow', 'overflow'))
+
+
+def _collect_pool():
+    # 同一进程中有多个应用时汇总它们的连接池
+    totals = {}
+    for app, db in list(_pool_sources.items()):
+        with app.app_context():
+            pool = db.engine.pool
+        for state, reader in _POOL_STATES:
+            if hasattr(pool, reader):
+                totals[state] = totals.get(state, 0) + getattr(pool, reader)()
+    for state, value in totals.items():
+        DB_POOL.set((state,), value)
+
+
+registry.add_collector(_collect_pool)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiProcessWriter:
+    """
+    Writes this process's snapshot to the shared metrics directory.
+
+    Live workers write metrics_<pid>.json. Snapshots of exited workers whose
+    PID is reused are kept, without gauges, as exited_<pid>_<id>.json.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self._last_flush = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = now
+            os.makedirs(self.directory, exist_ok=True)
+            pid = os.getpid()
+            path = os.path.join(self.directory, f'metrics_{pid}.json')
+            if self._pid != pid:
+                # 首次写入（包括 fork 之后）时，同名快照属于已退出的旧进程
+                self._retire(path, pid)
+                self._pid = pid
+            with open(path + '.tmp', 'w') as output:
+                json.dump(registry.snapshot(), output)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.error("Error writing metrics snapshot: %s", e)
+        finally:
+            self._lock.release()
+
+    def _retire(self, path, pid):
+        """Keep the counters of an exited process that had the same PID."""
+        try:
+            with open(path) as source:
+                snapshot = json.load(source)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error("Error reading metrics snapshot %s: %s", path, e)
+            return
+        counters = {name: entry for name, entry in snapshot.items() if entry['type'] != 'gauge'}
+        retired = os.path.join(self.directory, f'exited_{pid}_{uuid.uuid4().hex[:8]}.json')
+        with open(retired + '.tmp', 'w') as output:
+            json.dump(counters, output)
+        os.replace(retired + '.tmp', retired)
+        os.remove(path)
+
+    def read_all(self):
+        """Return the snapshots of all processes, without gauges of exited ones."""
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+                with open(path) as source:
+                    snapshot = json.load(source)
+            except (OSError, ValueError):
+                continue
+            if pid != os.getpid() and not _pid_alive(pid):
+                snapshot = {name: entry for name, entry in snapshot.items() if entry['type'] != 'gauge'}
+            snapshots.append(snapshot)
+        for path in glob.glob(os.path.join(self.directory, 'exited_*.json')):
+            try:
+                with open(path) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def clear_multiprocess_dir(directory=None):
+    """
+    Remove all worker snapshots from the multi-process metrics directory.
+
+    Call it once when the server master starts, before any worker runs.
+
+    Args:
+        directory (str, optional): Snapshot directory; defaults to the
+            PROMETHEUS_MULTIPROC_DIR environment variable
+
+    Returns:
+        int: Number of files removed
+    """
+    directory = directory or os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return 0
+    removed = 0
+    for pattern in ('metrics_*.json', 'exited_*.json', '*.json.tmp'):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+    return removed
+
+
+def collect():
+    """Return the metrics of this process, or of all workers in multi-process mode."""
+    writer = current_app.extensions.get('metrics_writer')
+    if writer is None:
+        return MetricsRegistry.render(MetricsRegistry.merge([registry.snapshot()]))
+    writer.flush(force=True)
+    return MetricsRegistry.render(MetricsRegistry.merge(writer.read_all()))
+
+
+def init_metrics(app, db):
+    """
+    Record request metrics for app.
+
+    Must be called after init_query_counter so query counts are still
+    available when the response is recorded.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    directory = app.config.get('PROMETHEUS_MULTIPROC_DIR') or os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    writer = None
+    if directory:
+        writer = MultiProcessWriter(directory, app.config.get('METRICS_FLUSH_INTERVAL', 5))
+        app.extensions['metrics_writer'] = writer
+
+    _pool_sources[app] = db
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started_at = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started_at = g.pop('metrics_started_at', None)
+        if started_at is None:
+            return response
+
+        labels = (request.blueprint or '', request.endpoint or 'unmatched')
+        REQUESTS.inc(labels + (request.method, str(response.status_code)))
+        REQUEST_LATENCY.observe(labels, time.perf_counter() - started_at)
+        stats = get_query_stats()
+        if stats is not None:
+            REQUEST_QUERIES.observe(labels, stats.count)
+
+        if writer is not None:
+            writer.flush()
+        return response
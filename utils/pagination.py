@@ -0,0 +1,67 @@
+"""
+Helpers for keyset (cursor) pagination.
+
+A cursor is an opaque, URL-safe token holding the sort key of the last row on
+the previous page. Clients pass it back unchanged to get the next page.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(*values):
+    """
+    Encode sort key values into an opaque cursor token.
+
+    Dates and datetimes are supported in addition to JSON types.
+    """
+    encoded = []
+    for value in values:
+        if isinstance(value, datetime):
+            encoded.append({'dt': value.isoformat()})
+        elif isinstance(value, date):
+            encoded.append({'d': value.isoformat()})
+        else:
+            encoded.append(value)
+    raw = json.dumps(encoded, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size=None, types=None):
+    """
+    Decode a cursor token back into a list of sort key values.
+
+    Args:
+        token (str): Token produced by encode_cursor
+        size (int, optional): Expected number of values
+        types (tuple, optional): Expected type of each value; types are matched
+            exactly, so a bool is not accepted as an int nor a datetime as a date
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        encoded = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = []
+        for value in encoded:
+            if isinstance(value, dict) and 'dt' in value:
+                values.append(datetime.fromisoformat(value['dt']))
+            elif isinstance(value, dict) and 'd' in value:
+                values.append(date.fromisoformat(value['d']))
+            else:
+                values.append(value)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('Invalid pagination cursor')
+
+    if types is not None:
+        size = len(types)
+    if size is not None and len(values) != size:
+        raise InvalidCursor('Invalid pagination cursor')
+    if types is not None and any(type(value) is not expected for value, expected in zip(values, types)):
+        raise InvalidCursor('Invalid pagination cursor')
+    return values
@@ -0,0 +1,233 @@
+"""
+Opt-in per-request profiler.
+
+A request is profiled when it carries the configured token in the
+X-Profile-Token header or the _profile_token query parameter. The profile
+is written to PROFILER_DIR and a summary with the top functions, SQL time
+and template render time is logged and returned in the Server-Timing and
+X-Profile-Id headers.
+
+Modes (X-Profile-Mode header or _profile_mode parameter):
+    sample (default): Samples the request thread's stack and writes
+        collapsed stacks (<id>.collapsed) for flamegraph.pl or speedscope
+    cprofile: Runs cProfile and writes pstats data (<id>.prof)
+
+Configuration:
+    PROFILER_TOKEN: Secret enabling the profiler; when unset no hooks are installed
+    PROFILER_DIR: Output directory (default <instance path>/profiles)
+    PROFILER_SAMPLE_INTERVAL: Seconds between stack samples (default 0.005)
+    PROFILER_TOP_FUNCTIONS: Functions listed in the summary (default 15)
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import current_app, g, request, template_rendered, before_render_template
+from app.utils.query_counter import get_query_stats
+
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}'
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack from a background thread.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the samples in collapsed-stack format."""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+    def top_functions(self, limit):
+        """Return (function, inclusive samples, self samples) for the busiest functions."""
+        inclusive = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            for name in set(frames):
+                inclusive[name] += count
+            own[frames[-1]] += count
+        return [(name, count, own[name]) for name, count in inclusive.most_common(limit)]
+
+
+class RequestProfile:
+    """
+    Profile of one request.
+    """
+
+    def __init__(self, mode, interval):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.template_time = 0.0
+        self._template_starts = []
+        self._profiler = None
+        self._sampler = None
+        self._started_at = time.perf_counter()
+        self.total_time = None
+
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), interval)
+            self._sampler.start()
+
+    def stop(self):
+        if self.total_time is not None:
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+        else:
+            self._sampler.stop()
+        self.total_time = time.perf_counter() - self._started_at
+
+    def top_functions(self, limit):
+        """Return the busiest functions as summary dicts."""
+        if self._profiler is not None:
+            stats = pstats.Stats(self._profiler, stream=io.StringIO()).sort_stats('cumulative')
+            rows = []
+            for (filename, line, name), (_, calls, own_time, cumulative, _) in stats.stats.items():
+                rows.append({
+                    'function': f'{os.path.basename(filename)}:{name}:{line}',
+                    'calls': calls,
+                    'cumulative_ms': round(cumulative * 1000, 2),
+                    'own_ms': round(own_time * 1000, 2)
+                })
+            rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+            return rows[:limit]
+
+        return [{
+            'function': name,
+            'samples': count,
+            'own_samples': own
+        } for name, count, own in self._sampler.top_functions(limit)]
+
+    def save(self, directory):
+        """Write the profile to directory and return the file path."""
+        os.makedirs(directory, exist_ok=True)
+        if self._profiler is not None:
+            path = os.path.join(directory, f'{self.id}.prof')
+            self._profiler.dump_stats(path)
+        else:
+            path = os.path.join(directory, f'{self.id}.collapsed')
+            with open(path, 'w') as output:
+                output.write(self._sampler.collapsed())
+        return path
+
+
+def _requested_mode(app):
+    token = app.config.get('PROFILER_TOKEN')
+    supplied = request.headers.get('X-Profile-Token') or request.args.get('_profile_token')
+    if not supplied or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return None
+    mode = request.headers.get('X-Profile-Mode') or request.args.get('_profile_mode') or 'sample'
+    return mode if mode in PROFILE_MODES else 'sample'
+
+
+def init_profiler(app):
+    """Install the profiler hooks if PROFILER_TOKEN is set."""
+    if not app.config.get('PROFILER_TOKEN'):
+        return
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode(app)
+        if mode:
+            g.request_profile = RequestProfile(mode, app.config.get('PROFILER_SAMPLE_INTERVAL', 0.005))
+
+    def _template_started(sender, template, context, **extra):
+        profile = g.get('request_profile')
+        if profile is not None:
+            profile._template_starts.append(time.perf_counter())
+
+    def _template_finished(sender, template, context, **extra):
+        profile = g.get('request_profile')
+        if profile is not None and profile._template_starts:
+            profile.template_time += time.perf_counter() - profile._template_starts.pop()
+
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+
+        profile.stop()
+        query_stats = get_query_stats()
+        sql_time = query_stats.duration if query_stats is not None else None
+
+        directory = app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+        summary = {
+            'event': 'request_profile',
+            'profile_id': profile.id,
+            'mode': profile.mode,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'total_ms': round(profile.total_time * 1000, 1),
+            'sql_ms': round(sql_time * 1000, 1) if sql_time is not None else None,
+            'sql_queries': query_stats.count if query_stats is not None else None,
+            'template_ms': round(profile.template_time * 1000, 1),
+            'top_functions': profile.top_functions(app.config.get('PROFILER_TOP_FUNCTIONS', 15))
+        }
+
+        try:
+            summary['file'] = profile.save(directory)
+            with open(os.path.join(directory, f'{profile.id}.json'), 'w') as output:
+                json.dump(summary, output, indent=2)
+        except OSError as e:
+            current_app.logger.warning("Error saving request profile %s: %s", profile.id, e)
+
+        current_app.logger.info("Request profile %s for %s", profile.id, request.endpoint, extra=summary)
+
+        timings = [f"total;dur={summary['total_ms']}", f"template;dur={summary['template_ms']}"]
+        if sql_time is not None:
+            timings.append(f"sql;dur={summary['sql_ms']}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        response.headers['X-Profile-Id'] = profile.id
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # 视图抛出异常时 after_request 不会执行，这里停止采样线程
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.stop()
@@ -0,0 +1,150 @@
+"""
+Per-request SQL query counting and N+1 detection.
+
+Every statement run while handling a request is counted and timed from
+SQLAlchemy engine events. Statements that differ only in their parameters
+share a shape; a shape repeated more than QUERY_REPEAT_THRESHOLD times in
+one request is reported as a likely N+1 pattern.
+
+Configuration:
+    SQL_QUERY_COUNTER: Enable counting (default True)
+    QUERY_REPEAT_THRESHOLD: Repeats of one shape before it is flagged (default 5)
+    QUERY_BUDGET_DEFAULT: Query budget for views without @query_budget (default None)
+    QUERY_BUDGET_STRICT: Raise QueryBudgetExceeded instead of logging (default False)
+"""
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+_VALUES_LIST = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more queries than its budget."""
+
+
+class QueryStats:
+    """
+    Queries run while handling one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Return (shape, count) pairs run more than threshold times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+def statement_shape(statement):
+    """Normalize a statement so that calls differing only in parameters match."""
+    statement = _VALUES_LIST.sub('(?)', _PARAMETER_LIST.sub('(?)', statement))
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+def query_budget(max_queries):
+    """
+    Set the maximum number of queries a view may run per request.
+
+    Example:
+        @bp.route('/players')
+        @query_budget(10)
+        def players_overview():
+            ...
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_stats():
+    """Return the current request's QueryStats, or None outside a counted request."""
+    return g.get('query_stats') if has_app_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_times')
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    stats = get_query_stats()
+    if stats is not None:
+        stats.record(statement, duration)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _clear_query_timer(context):
+    # 执行失败时 after_cursor_execute 不会触发，丢弃未结束的计时
+    if context.connection is not None:
+        context.connection.info.pop('query_start_times', None)
+
+
+def _budget_for_request(app):
+    view = app.view_functions.get(request.endpoint) if request.endpoint else None
+    budget = getattr(view, 'query_budget', None)
+    return budget if budget is not None else app.config.get('QUERY_BUDGET_DEFAULT')
+
+
+def init_query_counter(app):
+    """Count queries for every request handled by app."""
+    if not app.config.get('SQL_QUERY_COUNTER', True):
+        return
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+
+        threshold = current_app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+        repeated = stats.repeated(threshold)
+        budget = _budget_for_request(current_app)
+        over_budget = budget is not None and stats.count > budget
+
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers['X-Query-Time-Ms'] = f'{stats.duration * 1000:.1f}'
+        if repeated:
+            response.headers['X-Query-Repeated'] = str(len(repeated))
+
+        if repeated or over_budget:
+            current_app.logger.warning("SQL query report for %s", request.endpoint, extra={
+                'event': 'sql_query_report',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'query_count': stats.count,
+                'query_time_ms': round(stats.duration * 1000, 1),
+                'budget': budget,
+                'repeated': [{'count': count, 'statement': shape} for shape, count in repeated]
+            })
+
+        if over_budget and current_app.config.get('QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(
+                f'{request.endpoint} ran {stats.count} queries, budget is {budget}')
+
+        return response
@@ -0,0 +1,154 @@
+"""
+RRULE-style recurrence rules for training schedules.
+
+A rule describes when sessions happen (frequency, interval, weekdays,
+excluded dates and session times) and expands lazily into occurrences.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+
+# A single expanded session; start_time/end_time are None when the rule does not set them
+Occurrence = namedtuple('Occurrence', ['date', 'start_time', 'end_time'])
+
+WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+
+class RecurrenceRule:
+    """
+    A recurrence rule modelled on iCalendar RRULE.
+
+    Supported parts are FREQ (daily, weekly, monthly), INTERVAL, BYDAY
+    (weekdays, for daily and weekly rules), EXDATE and per-weekday times.
+    Monthly rules repeat on the start date's day of the month and, like
+    RRULE, skip months that do not have that day.
+    """
+
+    FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+    # Hard limit so a malformed rule can never expand forever
+    MAX_OCCURRENCES = 2000
+
+    def __init__(self, start_date, end_date, freq='weekly', interval=1, weekdays=None,
+                 exclude_dates=None, start_time=None, end_time=None, times=None):
+        """
+        Args:
+            start_date (date): First possible session date
+            end_date (date): Last possible session date (inclusive)
+            freq (str): 'daily', 'weekly' or 'monthly'
+            interval (int): Repeat every N days/weeks/months
+            weekdays (iterable, optional): Weekday numbers (0=Monday) or RRULE codes ('MO')
+            exclude_dates (iterable, optional): Dates to skip
+            start_time (time, optional): Default session start time
+            end_time (time, optional): Default session end time
+            times (dict, optional): {weekday: (start_time, end_time)} overrides
+        """
+        if freq not in self.FREQUENCIES:
+            raise ValueError(f'Unsupported frequency: {freq}')
+        if interval < 1:
+            raise ValueError('Interval must be at least 1')
+        if end_date < start_date:
+            raise ValueError('End date must not be before start date')
+
+        self.start_date = start_date
+        self.end_date = end_date
+        self.freq = freq
+        self.interval = interval
+        self.weekdays = sorted({self._weekday_number(day) for day in weekdays}) if weekdays else None
+        self.exclude_dates = set(exclude_dates or [])
+        self.start_time = start_time
+        self.end_time = end_time
+        self.times = {self._weekday_number(day): value for day, value in (times or {}).items()}
+
+    @classmethod
+    def from_plan_frequency(cls, frequency, start_date, end_date, **kwargs):
+        """
+        Build a rule from a TrainingPlan frequency ('weekly', 'biweekly', 'monthly').
+        """
+        if frequency == 'weekly':
+            return cls(start_date, end_date, freq='weekly', interval=1, **kwargs)
+        if frequency == 'biweekly':
+            return cls(start_date, end_date, freq='weekly', interval=2, **kwargs)
+        if frequency == 'monthly':
+            return cls(start_date, end_date, freq='monthly', interval=1, **kwargs)
+        raise ValueError(f'Unsupported plan frequency: {frequency}')
+
+    @staticmethod
+    def _weekday_number(day):
+        if isinstance(day, int) and 0 <= day <= 6:
+            return day
+        code = str(day).strip().upper()[:2]
+        if code not in WEEKDAY_CODES:
+            raise ValueError(f'Invalid weekday: {day}')
+        return WEEKDAY_CODES.index(code)
+
+    def __iter__(self):
+        count = 0
+        for day in self._candidate_dates():
+            if day > self.end_date or count >= self.MAX_OCCURRENCES:
+                return
+            if day < self.start_date or day in self.exclude_dates:
+                continue
+            start_time, end_time = self.times.get(day.weekday(), (self.start_time, self.end_time))
+            count += 1
+            yield Occurrence(day, start_time, end_time)
+
+    def _candidate_dates(self):
+        """Yield candidate dates in ascending order, possibly past end_date."""
+        if self.freq == 'monthly':
+            month_index = 0
+            while True:
+                total = self.start_date.month - 1 + month_index
+                year = self.start_date.year + total // 12
+                month = total % 12 + 1
+                if year > self.end_date.year:
+                    return
+                try:
+                    yield self.start_date.replace(year=year, month=month)
+                except ValueError:
+                    # 该月没有这一天（例如 31 号），按 RRULE 规则跳过
+                    pass
+                month_index += self.interval
+
+        elif self.freq == 'daily':
+            day = self.start_date
+            while day <= self.end_date:
+                if self.weekdays is None or day.weekday() in self.weekdays:
+                    yield day
+                day += timedelta(days=self.interval)
+
+        else:
+            weekdays = self.weekdays if self.weekdays is not None else [self.start_date.weekday()]
+            week_start = self.start_date - timedelta(days=self.start_date.weekday())
+            while week_start <= self.end_date:
+                for weekday in weekdays:
+                    yield week_start + timedelta(days=weekday)
+                week_start += timedelta(weeks=self.interval)
+
+    def preview(self, limit=50):
+        """
+        Expand at most limit occurrences.
+
+        Returns:
+            tuple: (list of Occurrence, whether more occurrences follow)
+        """
+        occurrences = []
+        for occurrence in self:
+            if len(occurrences) == limit:
+                return occurrences, True
+            occurrences.append(occurrence)
+        return occurrences, False
+
+
+def parse_time(value):
+    """Parse 'HH:MM' into a time, returning None for empty values."""
+    if not value:
+        return None
+    return datetime.strptime(value.strip(), '%H:%M').time()
+
+
+def parse_dates(value, date_format='%Y/%m/%d'):
+    """Parse a comma separated list of dates."""
+    if not value:
+        return []
+    return [datetime.strptime(part.strip(), date_format).date() for part in value.split(',') if part.strip()]
@@ -0,0 +1,63 @@
+"""
+Dialect-aware INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE helper.
+"""
+
+# Dialects build_upsert can target
+UPSERT_DIALECTS = ('mysql', 'postgresql', 'sqlite')
+
+
+def _dialect_name(session):
+    bind = session if hasattr(session, 'dialect') else session.get_bind()
+    return bind.dialect.name
+
+
+def supports_upsert(session):
+    """Return True if build_upsert supports the session's database."""
+    return _dialect_name(session) in UPSERT_DIALECTS
+
+
+
+def build_upsert(session, table, index_elements, update, values=None, select=None, columns=None):
+    """
+    Build a multi-row upsert statement for the session's database.
+
+    Args:
+        session: SQLAlchemy session or connection (used to pick the dialect)
+        table: Table to insert into
+        index_elements (list): Column names of the unique key that detects conflicts
+        update (callable): Receives the incoming-row proxy (``inserted`` on MySQL,
+            ``excluded`` elsewhere) and the table, returns {column: expression}
+        values (list, optional): Rows as dicts for a multi-row VALUES insert
+        select (Select, optional): SELECT feeding an INSERT ... SELECT
+        columns (list, optional): Target column names for ``select``
+
+    Returns:
+        Insert: Executable statement
+
+    Raises:
+        NotImplementedError: If the database dialect has no upsert support;
+            check supports_upsert first to fall back to the ORM
+    """
+    dialect = _dialect_name(session)
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upsert is not supported for {dialect}')
+
+    statement = insert(table)
+    if select is not None:
+        statement = statement.from_select(columns, select)
+    else:
+        statement = statement.values(values)
+
+    if dialect == 'mysql':
+        return statement.on_duplicate_key_update(update(statement.inserted, table))
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_=update(statement.excluded, table)
+    )